@@ -0,0 +1,143 @@
+"""
+Redis memory per resting order — BOOK_LAYOUT=hash vs BOOK_LAYOUT=level.
+
+    python benchmarks/book_memory.py                        # 10k, 100k, 1M orders
+    python benchmarks/book_memory.py --sizes 10000,50000 --levels 50
+
+Needs a running Redis: the numbers come from the server itself.
+
+WHAT IS MEASURED
+─────────────────
+For each layout and book size, a scratch symbol's book is filled with
+resting limit orders through book.queue_add_to_book — the same writes
+every engine mode makes — and then:
+
+  keys        keys the book added (DBSIZE before/after)
+  B/order     INFO used_memory growth per order: everything, allocator
+              overhead included
+  zset B      MEMORY USAGE of book:bids + book:asks per order — the
+              part both layouts share
+  record B    the rest: order:<id> hashes, or the level hashes
+  encoding    OBJECT ENCODING of one level hash (level layout): a
+              "listpack" level is one flat allocation, a "hashtable"
+              one pays per field. Past hash-max-listpack-entries orders
+              per level (128 by default) Redis converts it.
+
+BOOK_LAYOUT is read once at import, so each (layout, size) runs in a
+child process with it set in the environment. Orders are spread over
+--levels ticks per side around a mid of 100, three traders, sizes
+drawn like the producers' — fixed seed, so runs are comparable. L2
+depth keys aren't written: they cost the same in both layouts.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+
+sys.path.insert(0, ".")
+
+from src.config import BOOK_LAYOUT, get_async_redis, keys_for
+from src.consumer.book import clear_book, queue_add_to_book
+from src.models import Order, OrderType, Side, next_id, to_lots
+
+SCRATCH_SYMBOL = "BENCHMEM"
+LAYOUTS = ("hash", "level")
+TRADERS = ["market-maker", "trend-follower", "noise-trader"]
+MID_TICKS = 10_000
+
+
+def sample_book(n: int, levels: int, seed: int = 0) -> list[Order]:
+    """n resting orders, bids just below MID_TICKS and asks just above."""
+    rng = random.Random(seed)
+    orders = []
+    for i in range(n):
+        side = rng.choice([Side.BID, Side.ASK])
+        offset = rng.randint(1, levels)
+        orders.append(Order(
+            order_id=   next_id(),
+            trader_id=  rng.choice(TRADERS),
+            side=       side,
+            order_type= OrderType.LIMIT,
+            price=      MID_TICKS - offset if side == Side.BID else MID_TICKS + offset,
+            qty=        to_lots(rng.uniform(2.5, 15.0)),
+            timestamp=  1_700_000_000 + i * 0.001,
+            symbol=     SCRATCH_SYMBOL,
+        ))
+    return orders
+
+
+async def measure(n: int, levels: int) -> dict:
+    """Fill the scratch book with this process's BOOK_LAYOUT, report, clean up."""
+    r = get_async_redis()
+    keys = keys_for(SCRATCH_SYMBOL)
+    try:
+        await clear_book(r, SCRATCH_SYMBOL)
+        keys_before = await r.dbsize()
+        used_before = (await r.info("memory"))["used_memory"]
+
+        orders = sample_book(n, levels)
+        for i in range(0, n, 10_000):
+            pipe = r.pipeline(transaction=False)
+            for order in orders[i:i + 10_000]:
+                queue_add_to_book(pipe, order)
+            await pipe.execute()
+
+        used = (await r.info("memory"))["used_memory"] - used_before
+        zsets = sum([await r.memory_usage(k, samples=0) or 0 for k in (keys.bids, keys.asks)])
+        encoding = "-"
+        if BOOK_LAYOUT == "level":
+            sample = orders[0]
+            encoding = (await r.object("encoding", keys.level_orders(sample.side.value, sample.price))).decode()
+        return {
+            "layout":   BOOK_LAYOUT,
+            "orders":   n,
+            "keys":     await r.dbsize() - keys_before,
+            "B/order":  used / n,
+            "zset B":   zsets / n,
+            "record B": (used - zsets) / n,
+            "encoding": encoding,
+        }
+    finally:
+        await clear_book(r, SCRATCH_SYMBOL)
+        await r.aclose()
+
+
+def run_child(layout: str, n: int, levels: int) -> dict:
+    out = subprocess.run(
+        [sys.executable, __file__, "--child", str(n), "--levels", str(levels)],
+        env={**os.environ, "BOOK_LAYOUT": layout},
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="10000,100000,1000000",
+                        help="comma-separated book sizes (resting orders)")
+    parser.add_argument("--levels", type=int, default=200, help="price levels per side")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        print(json.dumps(asyncio.run(measure(args.child, args.levels))))
+        return
+
+    print(f"{args.levels} levels per side\n")
+    print(f"{'layout':8}{'orders':>10}{'keys':>10}{'B/order':>10}{'zset B':>10}{'record B':>10}  encoding")
+    for n in map(int, args.sizes.split(",")):
+        rows = {layout: run_child(layout, n, args.levels) for layout in LAYOUTS}
+        for row in rows.values():
+            print(f"{row['layout']:8}{row['orders']:>10}{row['keys']:>10}{row['B/order']:>10.1f}"
+                  f"{row['zset B']:>10.1f}{row['record B']:>10.1f}  {row['encoding']}")
+        print(f"{'ratio':8}{'':>10}{'':>10}{rows['level']['B/order'] / rows['hash']['B/order']:>10.2f}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""
+Matching-engine benchmark — seeded producer flow replayed at full speed.
+
+    python benchmarks/matching.py                     # in-process LocalBook, no Redis
+    python benchmarks/matching.py --backend redis     # engine.match_order on a local Redis
+    python benchmarks/matching.py -n 200000 --seed 7
+
+HOW THE FLOW IS MADE
+─────────────────────
+The real MarketMaker, TrendFollower and NoiseTrader generate it, each
+with its own seeded random.Random, on a virtual clock: every producer
+fires at its own interval, as in run_producers.py, but no time passes
+and nothing is sent. ReplayMarket stands in for Redis — it holds the
+mid price, hands out order ids and timestamps, and records every
+message (orders, and the market maker's REPLACE requotes) in the
+order it was sent. Same seed → same flow →
+same trades, so two runs differ only in how fast the engine is (the
+digest printed with the flow proves it's the same one).
+
+The mid follows the noise trader's GBM alone; trades don't feed back
+into it, because the engine isn't in the loop while the flow is made.
+
+WHAT IS MEASURED
+─────────────────
+  orders/s     flow entries (orders + REPLACEs) per wall-clock second
+  trades/s     fills produced per wall-clock second
+  p50/p99/p999 latency of applying one entry, grouped by how many
+               orders were resting when it arrived — the numbers that
+               move when the hot path regresses from O(levels) to
+               O(orders)
+
+Backends:
+  memory   LocalBook.apply + draining its projection changes — what
+           the memory engine does per entry, minus the Redis commit
+  redis    engine.apply_message against a scratch symbol's keys; a
+           shadow LocalBook tracks depth so measuring it costs no
+           round-trips
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import heapq
+import itertools
+import random
+import sys
+import time
+import zlib
+
+sys.path.insert(0, ".")
+
+from src.config import INITIAL_MID_PRICE, get_async_redis, keys_for
+from src.consumer.book import clear_book
+from src.consumer.engine import apply_message
+from src.consumer.local_book import LocalBook
+from src.models import CancelReplace, Message, Order, OrderType, Side, Trade
+from src.producers.base import BaseProducer
+from src.producers.market_maker import MarketMaker
+from src.producers.noise_trader import NoiseTrader
+from src.producers.trend_follower import TrendFollower
+
+BENCH_SYMBOL = "BENCH"
+
+
+# ── Flow generation ──────────────────────────────────────────────
+
+class ReplayMarket:
+    """Everything a producer would otherwise get from Redis or the clock."""
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.mid    = INITIAL_MID_PRICE
+        self.clock  = 0.0
+        self.events: list[Message] = []
+        self._ids   = itertools.count(1)
+        self._seq   = 0
+
+    def new_order(
+        self,
+        trader_id: str,
+        side: Side,
+        qty: int,
+        price: int | None,
+        order_type: OrderType,
+    ) -> Order:
+        # Strictly increasing timestamps keep time priority well-defined
+        # when two orders are created in the same virtual instant.
+        self._seq += 1
+        return Order(
+            order_id=  next(self._ids),
+            trader_id= trader_id,
+            side=      side,
+            order_type=order_type,
+            price=     price,
+            qty=       qty,
+            timestamp= self.clock + self._seq * 1e-6,
+            symbol=    self.symbol,
+        )
+
+
+class Replayed:
+    """Mixin: route a producer's side effects into a ReplayMarket."""
+
+    market: ReplayMarket
+
+    async def get_mid_price(self) -> float:
+        return self.market.mid
+
+    async def set_mid_price(self, mid: float) -> None:
+        self.market.mid = mid
+
+    def make_order(self, side, qty, price=None, order_type=OrderType.LIMIT) -> Order:
+        return self.market.new_order(self.trader_id, side, qty, price, order_type)
+
+    async def send(self, order: Message) -> None:
+        self.market.events.append(order)
+
+    async def send_many(self, orders: list[Message]) -> None:
+        self.market.events.extend(orders)
+
+
+def replayed(producer_cls: type[BaseProducer], market: ReplayMarket, seed: int, **kwargs):
+    cls = type(f"Replayed{producer_cls.__name__}", (Replayed, producer_cls), {})
+    producer = cls(symbol=market.symbol, rng=random.Random(seed), **kwargs)
+    producer.market = market
+    return producer
+
+
+async def generate_flow(n: int, seed: int, symbol: str = BENCH_SYMBOL) -> list[Message]:
+    """The first n events the three producers emit on a virtual clock."""
+    market = ReplayMarket(symbol)
+    producers = [
+        replayed(MarketMaker,   market, seed * 3 + 1),
+        replayed(TrendFollower, market, seed * 3 + 2),
+        replayed(NoiseTrader,   market, seed * 3 + 3),
+    ]
+    # (next fire time, tiebreak, producer) — same cadence as run() would give
+    due = [(0.0, i, p) for i, p in enumerate(producers)]
+    while len(market.events) < n:
+        t, i, producer = heapq.heappop(due)
+        market.clock = t
+        await producer.send_many(await producer.generate_orders(await producer.get_mid_price()))
+        heapq.heappush(due, (t + producer.interval, i, producer))
+    return market.events[:n]
+
+
+def flow_digest(events: list[Message]) -> str:
+    crc = 0
+    for event in events:
+        crc = zlib.crc32(repr(event).encode(), crc)
+    return f"{crc:08x}"
+
+
+# ── Backends ─────────────────────────────────────────────────────
+
+class MemoryBackend:
+    name = "memory"
+
+    def __init__(self, symbol: str):
+        self.book = LocalBook(symbol)
+
+    def depth(self) -> int:
+        return len(self.book)
+
+    async def apply(self, message: Message) -> list[Trade]:
+        trades = self.book.apply(message)
+        self.book.drain_changes()
+        self.book.drain_levels()
+        return trades
+
+    async def close(self) -> None:
+        pass
+
+
+class RedisBackend:
+    name = "redis"
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.r      = get_async_redis()
+        self.shadow = LocalBook(symbol)
+
+    def depth(self) -> int:
+        return len(self.shadow)
+
+    async def apply(self, message: Message) -> list[Trade]:
+        return await apply_message(self.r, message)
+
+    def follow(self, message: Message) -> None:
+        """Apply an entry to the shadow book (outside the timed region)."""
+        self.shadow.apply(message)
+        self.shadow.drain_changes()
+        self.shadow.drain_levels()
+
+    async def reset(self) -> None:
+        """Delete the scratch symbol's book, depth and order records."""
+        keys = keys_for(self.symbol)
+        await clear_book(self.r, self.symbol)
+        await self.r.delete(keys.mid, keys.trades)
+
+    async def close(self) -> None:
+        await self.reset()
+        await self.r.aclose()
+
+
+# ── Replay + report ──────────────────────────────────────────────
+
+def depth_bucket(depth: int) -> int:
+    """0, 10, 100, 1000, ... — the decade the resting-order count falls in."""
+    return 0 if depth < 10 else 10 ** (len(str(depth)) - 1)
+
+
+def percentile(sorted_ns: list[int], q: float) -> float:
+    """Nearest-rank percentile, in microseconds."""
+    return sorted_ns[min(len(sorted_ns) - 1, int(q * len(sorted_ns)))] / 1000
+
+
+async def replay(events: list[Message], backend) -> tuple[float, int, dict[int, list[int]]]:
+    """Push every entry through the backend; returns (seconds, trades, latencies by depth)."""
+    by_depth: dict[int, list[int]] = {}
+    follow = getattr(backend, "follow", None)
+    trades = 0
+    clock = time.perf_counter_ns
+
+    start = clock()
+    for event in events:
+        depth = backend.depth()
+        t0 = clock()
+        fills = await backend.apply(event)
+        by_depth.setdefault(depth_bucket(depth), []).append(clock() - t0)
+        trades += len(fills)
+        if follow:
+            follow(event)
+    elapsed = (clock() - start) / 1e9
+    return elapsed, trades, by_depth
+
+
+def report(backend, elapsed: float, trades: int, by_depth: dict[int, list[int]], events: int) -> None:
+    print(
+        f"{backend.name:8} {events / elapsed:>12,.0f} orders/s {trades / elapsed:>10,.0f} trades/s"
+        f"   ({trades} trades, {backend.depth()} resting at the end)\n"
+    )
+    print(f"{'depth':>12}{'entries':>10}{'p50 µs':>10}{'p99 µs':>10}{'p999 µs':>10}")
+    for bucket in sorted(by_depth):
+        ns = sorted(by_depth[bucket])
+        label = f"{bucket}–{max(9, bucket * 10 - 1)}"
+        print(
+            f"{label:>12}{len(ns):>10}"
+            + "".join(f"{percentile(ns, q):>10.1f}" for q in (0.50, 0.99, 0.999))
+        )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", type=int, default=100_000, help="flow events to replay")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--backend", choices=("memory", "redis"), default="memory")
+    parser.add_argument("--symbol", default=BENCH_SYMBOL,
+                        help="scratch symbol for the redis backend (its keys are wiped)")
+    args = parser.parse_args()
+
+    events = await generate_flow(args.n, args.seed, args.symbol)
+    replaces = sum(isinstance(e, CancelReplace) for e in events)
+    print(
+        f"flow: {len(events)} events ({len(events) - replaces} orders, {replaces} replaces), "
+        f"seed {args.seed}, digest {flow_digest(events)}\n"
+    )
+
+    backend = MemoryBackend(args.symbol) if args.backend == "memory" else RedisBackend(args.symbol)
+    if isinstance(backend, RedisBackend):
+        await backend.reset()
+    try:
+        elapsed, trades, by_depth = await replay(events, backend)
+        report(backend, elapsed, trades, by_depth, len(events))
+    finally:
+        await backend.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
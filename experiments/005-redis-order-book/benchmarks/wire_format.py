@@ -0,0 +1,129 @@
+"""
+Text vs packed stream encoding — size and decode cost per order.
+
+    python benchmarks/wire_format.py             # offline: bytes + CPU time
+    python benchmarks/wire_format.py --redis     # also MEMORY USAGE of a real stream
+
+WHAT IS MEASURED
+─────────────────
+  payload    field names + values as stored in the stream entry
+  XADD bytes the full RESP command sent over the socket
+             (redis-py's own pack_command, so framing is included)
+  encode     Order → XADD fields      (to_stream_dict / to_packed_dict)
+  decode     XREADGROUP fields → Order (from_stream_dict, both paths)
+  memory     with --redis: MEMORY USAGE of a stream holding N entries,
+             divided by N. Streams store entries in listpacks and
+             skip field names that match the stream's master entry,
+             so expect a smaller gap here than in the payload column.
+
+Orders are drawn from the same distributions the producers use
+(prices around 100 on the 0.01 tick grid, 0.1-lot quantities, ~15%
+market orders), with a fixed seed so runs are comparable.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import timeit
+
+sys.path.insert(0, ".")
+
+import redis
+
+from src.config import get_sync_redis
+from src.models import Order, OrderType, Side, next_id, to_lots, to_ticks
+
+TRADERS = ["market-maker", "trend-follower", "noise-trader"]
+SCRATCH_STREAM = "bench:wire"
+
+
+def sample_orders(n: int, seed: int = 0) -> list[Order]:
+    rng = random.Random(seed)
+    orders = []
+    for i in range(n):
+        market = rng.random() < 0.15
+        orders.append(Order(
+            order_id=  next_id(),
+            trader_id= rng.choice(TRADERS),
+            side=      rng.choice([Side.BID, Side.ASK]),
+            order_type=OrderType.MARKET if market else OrderType.LIMIT,
+            price=     None if market else to_ticks(100 * rng.uniform(0.98, 1.02)),
+            qty=       to_lots(rng.uniform(2.5, 15.0)),
+            timestamp= 1_700_000_000 + i * 0.001,
+        ))
+    return orders
+
+
+def as_reply(fields: dict) -> dict[bytes, bytes]:
+    """What redis-py hands back from XREADGROUP: bytes keys and values."""
+    return {
+        (k if isinstance(k, bytes) else k.encode()): (v if isinstance(v, bytes) else v.encode())
+        for k, v in fields.items()
+    }
+
+
+def payload_bytes(fields: dict[bytes, bytes]) -> int:
+    return sum(len(k) + len(v) for k, v in fields.items())
+
+
+def xadd_bytes(conn: redis.Connection, fields: dict[bytes, bytes]) -> int:
+    args = [part for kv in fields.items() for part in kv]
+    return sum(map(len, conn.pack_command("XADD", "orders:stream", "*", *args)))
+
+
+def per_op_ns(fn, items: list, repeat: int = 5) -> float:
+    """Best-of-repeat nanoseconds per item for fn applied across items."""
+    best = min(timeit.repeat(lambda: [fn(x) for x in items], number=1, repeat=repeat))
+    return best / len(items) * 1e9
+
+
+def stream_memory(replies: list[dict[bytes, bytes]]) -> float:
+    """MEMORY USAGE of a scratch stream holding every reply, per entry."""
+    r = get_sync_redis()
+    r.delete(SCRATCH_STREAM)
+    pipe = r.pipeline(transaction=False)
+    for fields in replies:
+        pipe.xadd(SCRATCH_STREAM, fields)
+    pipe.execute()
+    used = r.memory_usage(SCRATCH_STREAM, samples=0)
+    r.delete(SCRATCH_STREAM)
+    return used / len(replies)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", type=int, default=20_000, help="orders to encode")
+    parser.add_argument("--redis", action="store_true",
+                        help="also measure MEMORY USAGE against a running Redis")
+    args = parser.parse_args()
+
+    orders = sample_orders(args.n)
+    conn   = redis.Connection()
+    rows   = {}
+
+    for name, encode in (("text", Order.to_stream_dict), ("packed", Order.to_packed_dict)):
+        replies = [as_reply(encode(o)) for o in orders]
+        assert [Order.from_stream_dict(f) for f in replies] == orders, f"{name} round-trip"
+        rows[name] = {
+            "payload B":  sum(map(payload_bytes, replies)) / len(replies),
+            "XADD B":     sum(xadd_bytes(conn, f) for f in replies) / len(replies),
+            "encode ns":  per_op_ns(encode, orders),
+            "decode ns":  per_op_ns(Order.from_stream_dict, replies),
+        }
+        if args.redis:
+            rows[name]["memory B"] = stream_memory(replies)
+
+    columns = list(rows["text"])
+    print(f"{args.n} orders\n")
+    print(f"{'':8}" + "".join(f"{c:>12}" for c in columns))
+    for name, row in rows.items():
+        print(f"{name:8}" + "".join(f"{row[c]:>12.1f}" for c in columns))
+    print(f"{'ratio':8}" + "".join(
+        f"{rows['packed'][c] / rows['text'][c]:>12.2f}" for c in columns
+    ))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,17 +2,96 @@
 Entry point for the matching engine.
 
 Run this first, then run_producers.py in a second terminal.
+
+    python run_consumer.py               # one engine
+    python run_consumer.py --workers 4   # four engines in the same group
+    python run_consumer.py --symbols AAPL,MSFT,TSLA --workers 2 --shard
+                                         # two engines, symbols split between them
+
+WHY PROCESSES, NOT TASKS?
+──────────────────────────
+Matching is CPU work — one asyncio loop can only use one core. Each
+worker is a separate OS process with its own event loop and its own
+consumer name in the 'book-engine' group, so Redis splits the stream
+between them and each entry goes to exactly one worker.
+
+Several workers may only share one book if matching is atomic, so
+--workers > 1 requires ENGINE_MODE=lua. (memory mode keeps a private
+book per process; redis mode reads and writes in separate steps.)
+If a worker dies, the survivors' XAUTOCLAIM loops adopt its pending
+entries — no restart needed.
+
+--shard splits the symbols between the workers instead (see
+src/consumer/router.py). Each worker then owns its books outright, so
+any ENGINE_MODE works — but a dead worker's symbols stop trading
+until it is restarted, since nobody else reads its streams.
 """
 
+import argparse
 import asyncio
+import multiprocessing
 import sys
 
 sys.path.insert(0, ".")
 
+from src.config import CONSUMER_NAME, ENGINE_MODE, SYMBOLS
 from src.consumer.engine import run_engine
+from src.consumer.router import symbols_for_shard
+
+
+def run_worker(consumer: str, symbols: list[str]) -> None:
+    try:
+        asyncio.run(run_engine(consumer=consumer, symbols=symbols))
+    except KeyboardInterrupt:
+        pass
+
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the matching engine.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="engine processes to run in the consumer group")
+    parser.add_argument("--symbols", default=",".join(SYMBOLS),
+                        help="comma-separated symbols to trade (default: $SYMBOLS)")
+    parser.add_argument("--shard", action="store_true",
+                        help="give each worker its own subset of the symbols")
+    args = parser.parse_args()
+    symbols = args.symbols.split(",")
+
+    if args.workers <= 1:
+        try:
+            asyncio.run(run_engine(symbols=symbols))
+        except KeyboardInterrupt:
+            print("\n[engine] Shutting down.")
+        sys.exit(0)
+
+    if args.shard:
+        assignments = [symbols_for_shard(symbols, i, args.workers) for i in range(args.workers)]
+        for i, owned in enumerate(assignments):
+            print(f"[engine] worker {i}: {', '.join(owned) or '(no symbols, not started)'}")
+    elif ENGINE_MODE != "lua":
+        sys.exit(
+            f"[engine] --workers {args.workers} needs ENGINE_MODE=lua "
+            f"(got {ENGINE_MODE!r}): only Lua matching is safe with several "
+            f"engines on one book. Use --shard to split symbols instead."
+        )
+    else:
+        assignments = [symbols] * args.workers
+
+    workers = [
+        multiprocessing.Process(
+            target=run_worker,
+            args=(f"{CONSUMER_NAME}-{i}", owned),
+            name=f"engine-{i}",
+        )
+        for i, owned in enumerate(assignments)
+        if owned
+    ]
+    for w in workers:
+        w.start()
     try:
-        asyncio.run(run_engine())
+        for w in workers:
+            w.join()
     except KeyboardInterrupt:
-        print("\n[engine] Shutting down.")
\ No newline at end of file
+        for w in workers:
+            w.join()
+        print("\n[engine] Shutting down.")
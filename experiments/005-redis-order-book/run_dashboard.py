@@ -2,16 +2,24 @@
 Entry point for the terminal dashboard.
 
 Run this in a third terminal alongside run_consumer.py
-and run_producers.py.
+and run_producers.py. One dashboard shows one symbol:
+
+    python run_dashboard.py --symbol AAPL
 """
 
+import argparse
 import sys
 sys.path.insert(0, ".")
 
+from src.config import DEFAULT_SYMBOL
 from src.dashboard.view import run_dashboard
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Live order book view.")
+    parser.add_argument("--symbol", default=DEFAULT_SYMBOL)
+    args = parser.parse_args()
+
     try:
-        run_dashboard()
+        run_dashboard(args.symbol)
     except KeyboardInterrupt:
         print("\n[dashboard] Closed.")
\ No newline at end of file
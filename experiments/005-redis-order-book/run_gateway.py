@@ -0,0 +1,33 @@
+"""
+Entry point for the market-data gateway.
+
+Run it next to the engine; any number of viewers can then follow the
+book over Server-Sent Events without touching Redis themselves:
+
+    python run_gateway.py                        # symbols from $SYMBOLS
+    python run_gateway.py --symbols SIM,AAPL --port 8081
+    curl -N 'localhost:8081/events?symbol=SIM'
+
+See src/gateway/ for how slow clients are conflated instead of queued.
+"""
+
+import argparse
+import asyncio
+import sys
+
+sys.path.insert(0, ".")
+
+from src.config import GATEWAY_HOST, GATEWAY_PORT, SYMBOLS
+from src.gateway.server import serve
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SSE market-data gateway.")
+    parser.add_argument("--symbols", default=",".join(SYMBOLS))
+    parser.add_argument("--host", default=GATEWAY_HOST)
+    parser.add_argument("--port", type=int, default=GATEWAY_PORT)
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args.symbols.split(","), args.host, args.port))
+    except KeyboardInterrupt:
+        print("\n[gateway] Stopped.")
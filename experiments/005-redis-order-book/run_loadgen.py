@@ -0,0 +1,79 @@
+"""
+Load generator — push the engine to its saturation point.
+
+    python run_loadgen.py --rate 5000 --duration 30
+    python run_loadgen.py --rate 20000 --processes 8 --traders 4000 --symbols AAPL,MSFT
+
+Run the engine first (run_consumer.py). Unlike run_producers.py, the
+order rate here doesn't depend on how fast anything responds: orders
+are sent on a fixed schedule, split across --processes worker
+processes (src/producers/loadgen.py explains why, and how latency is
+measured without coordinated omission).
+
+Raise --rate until either number below stops keeping up:
+
+  achieved rate  falls short of --rate → the generator (or Redis) is
+                 saturated; add processes, or you've found Redis's limit
+  engine lag     stream_lag in metrics:engine:<consumer> keeps growing
+                 → the engine is saturated; that rate is its ceiling
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+
+sys.path.insert(0, ".")
+
+from src.config import SYMBOLS
+from src.metrics import Histogram
+from src.producers.loadgen import run_worker
+
+
+def report(results: list, rate: float) -> None:
+    sent = sum(r.sent for r in results)
+    elapsed = max(r.elapsed for r in results)
+    corrected = Histogram("corrected_us", "")
+    service = Histogram("service_us", "")
+    for result in results:
+        corrected.merge(result.corrected)
+        service.merge(result.service)
+
+    print(f"\n[loadgen] {sent} orders in {elapsed:.1f}s — {sent / elapsed:,.0f}/s "
+          f"(target {rate:,.0f}/s)")
+    print(f"[loadgen] worst batch behind schedule: {max(r.max_behind for r in results) * 1000:.1f} ms\n")
+    print(f"{'XADD latency µs':22}{'p50':>10}{'p99':>10}{'p99.9':>10}{'max':>10}")
+    for label, h in (("from intended send", corrected), ("from actual send", service)):
+        print(f"{label:22}" + "".join(
+            f"{h.percentile(q):>10}" for q in (0.5, 0.99, 0.999)
+        ) + f"{h.max:>10}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Open-loop order load generator.")
+    parser.add_argument("--rate", type=float, default=5000, help="aggregate orders/sec")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to run")
+    parser.add_argument("--processes", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--traders", type=int, default=2000, help="simulated traders in total")
+    parser.add_argument("--batch", type=int, default=256, help="max XADDs per pipeline")
+    parser.add_argument("--symbols", default=",".join(SYMBOLS),
+                        help="comma-separated symbols to trade (default: $SYMBOLS)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    symbols = args.symbols.split(",")
+    n = args.processes
+    jobs = [
+        (args.rate / n, args.duration, max(1, args.traders // n), symbols,
+         args.batch, worker, args.seed)
+        for worker in range(n)
+    ]
+    print(f"[loadgen] {args.rate:,.0f} orders/s for {args.duration:g}s: "
+          f"{n} processes × {jobs[0][2]} traders on {', '.join(symbols)}")
+
+    try:
+        with multiprocessing.Pool(n) as pool:
+            results = pool.map(run_worker, jobs)
+    except KeyboardInterrupt:
+        sys.exit("\n[loadgen] Interrupted.")
+    report(results, args.rate)
@@ -16,36 +16,53 @@ and sleep-heavy workloads. If we were doing CPU-heavy work (e.g.
 running a neural net to generate orders), we'd use ProcessPoolExecutor
 instead. But for network I/O + sleeps, asyncio is ideal.
 
+SYMBOLS
+────────
+One set of producers per symbol in $SYMBOLS (or --symbols), each with
+its own GBM mid price. They all share one event loop — and one
+MidPriceCache, so the mids reach every producer over a single pub/sub
+connection instead of a GET per producer per cycle.
+
+CONNECTIONS
+────────────
+They also share one Redis client over a pool of PRODUCER_POOL_SIZE
+connections (config.get_pooled_async_redis) instead of opening one
+each: with three producers per symbol, ten symbols would otherwise be
+thirty sockets that sit idle between cycles. Socket count is the pool
+size plus the mid cache's subscriber connection, whatever the number
+of symbols.
+
 SHUTDOWN
 ─────────
 Ctrl+C raises KeyboardInterrupt → we cancel all tasks →
-each producer catches CancelledError and closes its Redis connection.
+each producer catches CancelledError and stops; then we close the
+shared pool (the mid cache closes its subscriber connection itself).
 """
 
+import argparse
 import asyncio
 import sys
 
 sys.path.insert(0, ".")
 
-from src.config import BIDS_KEY, ASKS_KEY, MID_PRICE_KEY, get_async_redis
+from src.config import (
+    HIREDIS_AVAILABLE, PRODUCER_POOL_SIZE, SYMBOLS, get_pooled_async_redis, keys_for,
+)
+from src.consumer.book import clear_book
 from src.producers.market_maker import MarketMaker
+from src.producers.mid_cache import MidPriceCache
 from src.producers.trend_follower import TrendFollower
 from src.producers.noise_trader import NoiseTrader
 
 
-async def main():
-    # Fresh start — clear the book and reset mid price
-    r = get_async_redis()
-    await r.delete(BIDS_KEY, ASKS_KEY, MID_PRICE_KEY)
-    await r.aclose()
-    print("[producers] Book cleared, starting producers...\n")
-
-    producers = [
+def producers_for(symbol: str) -> list:
+    return [
         MarketMaker(
             trader_id="market-maker",
             spread_bps=50.0,
             base_qty=8.0,
             interval=0.4,
+            symbol=symbol,
         ),
         TrendFollower(
             trader_id="trend-follower",
@@ -53,6 +70,7 @@ async def main():
             threshold=0.0015,
             base_qty=12.0,
             interval=1.2,
+            symbol=symbol,
         ),
         NoiseTrader(
             trader_id="noise-trader",
@@ -60,10 +78,31 @@ async def main():
             sigma=0.002,
             base_qty=5.0,
             interval=0.6,
+            symbol=symbol,
         ),
     ]
 
-    tasks = [asyncio.create_task(p.run()) for p in producers]
+
+async def main(symbols: list[str]):
+    # Fresh start — clear each book and reset its mid price
+    r = get_pooled_async_redis(PRODUCER_POOL_SIZE)
+    for symbol in symbols:
+        await clear_book(r, symbol)
+        await r.delete(keys_for(symbol).mid)
+    parser = "hiredis" if HIREDIS_AVAILABLE else "pure-Python (pip install hiredis)"
+    print(f"[producers] Books cleared for {', '.join(symbols)}, starting producers...")
+    print(f"[producers] {PRODUCER_POOL_SIZE} shared connections, {parser} reply parser\n")
+
+    mids = MidPriceCache(symbols)
+    tasks = [asyncio.create_task(mids.run())]
+    await mids.ready.wait()
+
+    producers = [p for symbol in symbols for p in producers_for(symbol)]
+    for p in producers:
+        p.r = r
+        p.mids = mids
+
+    tasks += [asyncio.create_task(p.run()) for p in producers]
 
     try:
         await asyncio.gather(*tasks)
@@ -74,11 +113,17 @@ async def main():
         for t in tasks:
             t.cancel()
         await asyncio.gather(*tasks, return_exceptions=True)
+        await r.aclose(close_connection_pool=True)
         print("[producers] Done.")
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the simulated traders.")
+    parser.add_argument("--symbols", default=",".join(SYMBOLS),
+                        help="comma-separated symbols to trade (default: $SYMBOLS)")
+    args = parser.parse_args()
+
     try:
-        asyncio.run(main())
+        asyncio.run(main(args.symbols.split(",")))
     except KeyboardInterrupt:
         pass
\ No newline at end of file
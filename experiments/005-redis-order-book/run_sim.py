@@ -0,0 +1,60 @@
+"""
+Entry point for the discrete-event simulation — hours of market in seconds.
+
+    python run_sim.py                            # one simulated hour of $SYMBOLS
+    python run_sim.py --hours 8 --seed 3 --symbols SIM,AAPL
+    python run_sim.py --hours 1 --tape trades.csv
+
+No Redis needed: the real producers trade against the in-process
+matching engine on a virtual clock (src/sim/). The same --seed and
+--hours always print the same digest.
+"""
+
+import argparse
+import asyncio
+import csv
+import sys
+import time
+
+sys.path.insert(0, ".")
+
+from src.config import SYMBOLS
+from src.models import from_lots, from_ticks
+from src.sim.clock import VirtualClockLoop
+from src.sim.market import SimMarket, simulate
+
+
+def report(market: SimMarket, hours: float, elapsed: float) -> None:
+    print(f"\n[sim] {hours:g}h simulated in {elapsed:.2f}s ({hours * 3600 / elapsed:,.0f}× real time)\n")
+    print(f"{'symbol':8}{'messages':>10}{'trades':>9}{'volume':>12}{'low':>10}{'high':>10}{'last':>10}{'resting':>9}")
+    for symbol, s in market.stats.items():
+        prices = [f"{from_ticks(p):.2f}" if p is not None else "-" for p in (s.low, s.high, s.last)]
+        print(f"{symbol:8}{s.messages:>10}{s.trades:>9}{from_lots(s.volume):>12,.1f}"
+              + "".join(f"{p:>10}" for p in prices) + f"{len(market.books[symbol]):>9}")
+    print(f"\n[sim] tape digest {market.digest()}")
+
+
+def write_tape(market: SimMarket, path: str) -> None:
+    with open(path, "w", newline="") as f:
+        out = csv.writer(f)
+        out.writerow(["time", "symbol", "price", "qty", "buyer", "seller"])
+        for t in market.tape:
+            out.writerow([f"{t.timestamp:.6f}", t.symbol, from_ticks(t.price), from_lots(t.qty), t.buyer_id, t.seller_id])
+    print(f"[sim] {len(market.tape)} trades written to {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate the market on a virtual clock.")
+    parser.add_argument("--symbols", default=",".join(SYMBOLS))
+    parser.add_argument("--hours", type=float, default=1.0, help="simulated time")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tape", help="write every trade to this CSV file")
+    args = parser.parse_args()
+
+    market = SimMarket(args.symbols.split(","), keep_tape=args.tape is not None)
+    started = time.perf_counter()
+    with asyncio.Runner(loop_factory=VirtualClockLoop) as runner:
+        runner.run(simulate(market, args.hours * 3600, args.seed))
+    report(market, args.hours, time.perf_counter() - started)
+    if args.tape:
+        write_tape(market, args.tape)
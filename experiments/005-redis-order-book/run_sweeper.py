@@ -0,0 +1,50 @@
+"""
+Entry point for the background sweeper.
+
+Run it next to the engine; it reconciles the books with the order
+records a few thousand entries per second and logs what it reclaimed:
+
+    python run_sweeper.py                        # symbols from $SYMBOLS, every 60s
+    python run_sweeper.py --symbols SIM --rate 500 --interval 300
+    python run_sweeper.py --once                 # one pass, print the report, exit
+
+See src/consumer/sweeper.py for what counts as stale and why it's safe
+to run while the engine is matching.
+"""
+
+import argparse
+import asyncio
+import sys
+from dataclasses import asdict
+
+sys.path.insert(0, ".")
+
+from src.config import SWEEP_INTERVAL, SWEEP_RATE, SYMBOLS, get_async_redis
+from src.consumer.sweeper import Sweeper, sweep_forever
+
+
+async def sweep_once(symbols: list[str], rate: int) -> None:
+    r = get_async_redis()
+    try:
+        report = await Sweeper(r, symbols, rate).sweep()
+        print("[sweeper]", "  ".join(f"{k}={v}" for k, v in asdict(report).items()))
+    finally:
+        await r.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reclaim stale book entries and orphan order records.")
+    parser.add_argument("--symbols", default=",".join(SYMBOLS))
+    parser.add_argument("--rate", type=int, default=SWEEP_RATE, help="entries examined per second, at most")
+    parser.add_argument("--interval", type=float, default=SWEEP_INTERVAL, help="seconds between passes")
+    parser.add_argument("--once", action="store_true", help="one pass, then exit")
+    args = parser.parse_args()
+
+    symbols = args.symbols.split(",")
+    try:
+        if args.once:
+            asyncio.run(sweep_once(symbols, args.rate))
+        else:
+            asyncio.run(sweep_forever(symbols, args.interval, args.rate))
+    except KeyboardInterrupt:
+        print("\n[sweeper] Stopped.")
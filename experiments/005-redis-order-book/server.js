@@ -59,6 +59,12 @@ const MID_KEY       = "book:mid";
 const TRADES_CHANNEL= "trades:channel";
 const BOOK_DEPTH    = 15;
 
+// ── Fixed point (mirror src/config.py) ───────────────────────────
+// Redis holds prices in ticks and quantities in lots — integers.
+// Divide once here; the browser only ever sees plain decimals.
+const PRICE_SCALE = 100;   // ticks per unit of price
+const QTY_SCALE   = 10;    // lots per unit of quantity
+
 // ── 1. HTTP server — serves index.html ───────────────────────────
 //
 // Node's built-in http module. No Express.
@@ -137,7 +143,7 @@ async function getBookSnapshot() {
     for (let i = 0; i < raw.length; i += 2) {
       result.push({
         orderId: raw[i],
-        price:   parseFloat(raw[i + 1]),
+        price:   parseInt(raw[i + 1], 10) / PRICE_SCALE,
       });
     }
     return result;
@@ -172,13 +178,13 @@ subClient.on("message", (channel, message) => {
 
   try {
     // The Python engine publishes: json.dumps(trade.to_hash_dict())
-    // which is a dict with string values (price, qty as strings)
+    // which is a dict with string values (price in ticks, qty in lots)
     const raw = JSON.parse(message);
     const trade = {
       type:      "trade",
       tradeId:   raw.trade_id,
-      price:     parseFloat(raw.price),
-      qty:       parseFloat(raw.qty),
+      price:     parseInt(raw.price, 10) / PRICE_SCALE,
+      qty:       parseInt(raw.qty, 10) / QTY_SCALE,
       buyer:     raw.buyer_id,
       seller:    raw.seller_id,
       timestamp: parseFloat(raw.timestamp),
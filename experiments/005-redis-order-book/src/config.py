@@ -11,14 +11,37 @@ KEY NAMING CONVENTION: namespace:descriptor
   orders:stream   — the main event stream
   book:bids       — sorted set, bids side of the book
   book:asks       — sorted set, asks side of the book
+  order:<id>      — hash per resting order (BOOK_LAYOUT=hash)
+  book:orders:<side>:<price> — hash per price level (BOOK_LAYOUT=level)
+  book:depth:bids — hash, price → total resting qty (L2 depth)
+  book:levels:bids— sorted set of the non-empty price levels (same for asks)
+  md:stream       — stream, sequenced market-by-price events (0-<seq> IDs)
   book:mid        — string, current mid price
-  trades:latest   — hash, recent trades for display
+  mid:channel     — pub/sub channel, every new mid price as it is SET
+  trades:tape     — capped stream, recent trades for display
   trades:channel  — pub/sub channel for live fill notifications
+  metrics:engine:<consumer> — hash, latest metrics of one engine process
+  commit:engine:<consumer>  — string, token of that engine's last trade commit
+
+PER-SYMBOL NAMESPACES
+  Every key above belongs to one instrument. The default symbol keeps
+  the bare names (so single-symbol tools keep working); any other
+  symbol gets its own copy with the symbol appended:
+    orders:stream:AAPL  book:bids:AAPL  book:asks:AAPL  book:mid:AAPL ...
+  (level hashes put it before the level: book:orders:AAPL:bid:10050;
+  order:<id> has no symbol — ids are unique across symbols anyway.)
+  Always go through keys_for(symbol) rather than the bare constants
+  when the code handles more than one symbol.
 """
 
 import os
+import socket
+from dataclasses import dataclass
+from functools import lru_cache
+
 import redis.asyncio as aioredis
 import redis as syncredis
+from redis.utils import HIREDIS_AVAILABLE
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -30,21 +53,194 @@ REDIS_DB   = int(os.getenv("REDIS_DB",   "0"))
 # ── Key names ────────────────────────────────────────────────────
 STREAM_KEY        = "orders:stream"
 CONSUMER_GROUP    = "book-engine"        # our consumer group name
-CONSUMER_NAME     = "consumer-1"         # this consumer's identity within the group
+# This consumer's identity within the group. Must be unique per engine
+# process — two processes sharing a name would share one PEL.
+CONSUMER_NAME     = os.getenv("CONSUMER_NAME", f"engine-{socket.gethostname()}-{os.getpid()}")
 
 BIDS_KEY          = "book:bids"          # Sorted Set: score=price, member=order_id
 ASKS_KEY          = "book:asks"          # Sorted Set: score=price, member=order_id
 ORDER_DATA_PREFIX = "order:"             # Hash per order: "order:{order_id}"
+ORDERS_KEY        = "book:orders"        # + ":<side>:<price>": Hash per level, order_id → record
+
+# L2 aggregates, one pair per side (see consumer/depth.py)
+BID_DEPTH_KEY     = "book:depth:bids"    # Hash: price → total qty at that price
+ASK_DEPTH_KEY     = "book:depth:asks"
+BID_LEVELS_KEY    = "book:levels:bids"   # Sorted Set: score=price, member=price
+ASK_LEVELS_KEY    = "book:levels:asks"
+MD_STREAM_KEY     = "md:stream"          # Stream: sequenced level/trade/mid events
 
 MID_PRICE_KEY     = "book:mid"           # String: current mid-market price
-TRADES_KEY        = "trades:latest"      # Hash: recent fills keyed by trade_id
+TRADES_KEY        = "trades:tape"        # Stream: recent fills, capped at MAX_TRADES_STORED
 TRADES_CHANNEL    = "trades:channel"     # Pub/Sub channel
+MID_CHANNEL       = "mid:channel"        # Pub/Sub: each new book:mid value
+
+# ── Symbols ──────────────────────────────────────────────────────
+DEFAULT_SYMBOL = "SIM"                   # uses the bare key names above
+SYMBOLS        = os.getenv("SYMBOLS", DEFAULT_SYMBOL).split(",")
+
+
+@dataclass(frozen=True)
+class SymbolKeys:
+    """Every Redis key/channel for one instrument."""
+    symbol: str
+    stream: str
+    bids: str
+    asks: str
+    bid_depth: str
+    ask_depth: str
+    bid_levels: str
+    ask_levels: str
+    orders: str
+    md: str
+    mid: str
+    mid_channel: str
+    trades: str
+    trades_channel: str
+
+    def book(self, side: str) -> str:
+        """Sorted set for a side ("bid" / "ask")."""
+        return self.bids if side == "bid" else self.asks
+
+    def depth(self, side: str) -> str:
+        """price → total qty hash for a side."""
+        return self.bid_depth if side == "bid" else self.ask_depth
+
+    def levels(self, side: str) -> str:
+        """Sorted set of a side's non-empty price levels."""
+        return self.bid_levels if side == "bid" else self.ask_levels
+
+    def level_orders(self, side: str, price: int) -> str:
+        """One price level's order records (BOOK_LAYOUT=level)."""
+        return f"{self.orders}:{side}:{price}"
+
+
+@lru_cache(maxsize=None)
+def keys_for(symbol: str = DEFAULT_SYMBOL) -> SymbolKeys:
+    if symbol == DEFAULT_SYMBOL:
+        return SymbolKeys(symbol, STREAM_KEY, BIDS_KEY, ASKS_KEY,
+                          BID_DEPTH_KEY, ASK_DEPTH_KEY, BID_LEVELS_KEY, ASK_LEVELS_KEY,
+                          ORDERS_KEY, MD_STREAM_KEY, MID_PRICE_KEY, MID_CHANNEL, TRADES_KEY, TRADES_CHANNEL)
+    return SymbolKeys(
+        symbol=         symbol,
+        stream=         f"{STREAM_KEY}:{symbol}",
+        bids=           f"{BIDS_KEY}:{symbol}",
+        asks=           f"{ASKS_KEY}:{symbol}",
+        bid_depth=      f"{BID_DEPTH_KEY}:{symbol}",
+        ask_depth=      f"{ASK_DEPTH_KEY}:{symbol}",
+        bid_levels=     f"{BID_LEVELS_KEY}:{symbol}",
+        ask_levels=     f"{ASK_LEVELS_KEY}:{symbol}",
+        orders=         f"{ORDERS_KEY}:{symbol}",
+        md=             f"{MD_STREAM_KEY}:{symbol}",
+        mid=            f"{MID_PRICE_KEY}:{symbol}",
+        mid_channel=    f"{MID_CHANNEL}:{symbol}",
+        trades=         f"{TRADES_KEY}:{symbol}",
+        trades_channel= f"{TRADES_CHANNEL}:{symbol}",
+    )
+
 
 # ── Simulator constants ──────────────────────────────────────────
 INITIAL_MID_PRICE  = 100.0   # starting mid-market price
 MAX_BOOK_DEPTH     = 20      # max price levels to keep per side
-MAX_TRADES_STORED  = 50      # max recent trades to keep in the hash
+MAX_TRADES_STORED  = 50      # MAXLEN ~ for the trade tape stream
 STREAM_MAX_LEN     = 10_000  # MAXLEN for the stream (ring buffer)
+MD_STREAM_MAX_LEN  = 10_000  # MAXLEN ~ for md:stream: how far behind a client can resume
+MD_BLOCK_MS        = 5_000   # longest md:stream XREAD block before checking for a reset
+
+# ── Engine ───────────────────────────────────────────────────────
+# "redis"  — match by querying the sorted sets/hashes directly (original)
+# "memory" — match against an in-process book; Redis is a write-behind copy
+# "lua"    — match atomically inside Redis with one EVALSHA per order
+ENGINE_MODE = os.getenv("ENGINE_MODE", "redis")
+
+# Batch mode: read up to ENGINE_BATCH_MAX entries per XREADGROUP and commit
+# each batch with one pipeline + one XACK. 0 = process orders one by one.
+# The actual read size adapts between MIN and MAX to the group's lag.
+ENGINE_BATCH_MAX = int(os.getenv("ENGINE_BATCH_MAX", "0"))
+ENGINE_BATCH_MIN = int(os.getenv("ENGINE_BATCH_MIN", "10"))
+# Pipelined batch mode (consumer/pipeline.py): read, match and commit run as
+# separate tasks with up to ENGINE_PIPELINE_DEPTH batches queued between
+# each pair; one commit takes up to PIPELINE_COALESCE queued batches.
+# 0 = off. Needs ENGINE_BATCH_MAX > 0.
+ENGINE_PIPELINE_DEPTH = int(os.getenv("ENGINE_PIPELINE_DEPTH", "0"))
+PIPELINE_COALESCE     = 8
+
+# Failover: PEL entries idle this long are taken over via XAUTOCLAIM
+CLAIM_MIN_IDLE_MS = int(os.getenv("CLAIM_MIN_IDLE_MS", "30000"))
+CLAIM_INTERVAL    = 5.0     # seconds between full PEL sweeps
+CLAIM_BATCH       = 100     # entries claimed per XAUTOCLAIM call
+
+# Lua / redis mode: each trade commit also SETs COMMIT_KEY_PREFIX:<consumer>
+# to a fresh token, so a retry can tell whether the failed attempt landed
+COMMIT_KEY_PREFIX = "commit:engine"
+
+# Redis mode: resting orders fetched per page when looking for crossable orders
+CROSSABLE_PAGE_SIZE = 32
+
+# ── Snapshot + journal (memory mode) ─────────────────────────────
+# Each symbol's book is written to <ENGINE_STATE_DIR>/<symbol>.snapshot
+# every SNAPSHOT_INTERVAL seconds; every applied entry is appended to
+# <symbol>.journal in between (see consumer/persistence.py).
+ENGINE_STATE_DIR  = os.getenv("ENGINE_STATE_DIR", "state")
+SNAPSHOT_INTERVAL = float(os.getenv("SNAPSHOT_INTERVAL", "30"))
+JOURNAL_FSYNC     = os.getenv("JOURNAL_FSYNC", "0") == "1"   # fsync every append
+
+# ── Metrics + logs (see src/metrics.py) ──────────────────────────
+# Every METRICS_INTERVAL seconds each engine writes its counters and
+# latency percentiles to <METRICS_DIR>/<consumer>.prom (Prometheus
+# textfile format) and to the hash METRICS_KEY_PREFIX:<consumer>.
+METRICS_KEY_PREFIX = "metrics:engine"
+METRICS_DIR        = os.getenv("METRICS_DIR", "metrics")
+METRICS_INTERVAL   = float(os.getenv("METRICS_INTERVAL", "5"))
+# Per-order log lines: keep the 1st and then every Nth of each kind
+LOG_SAMPLE_EVERY   = int(os.getenv("LOG_SAMPLE_EVERY", "100"))
+
+# ── On-demand profiler (see src/profiler.py) ─────────────────────
+# kill -USR1 <engine pid>, or PUBLISH PROFILE_CHANNEL[:<consumer>] <seconds>,
+# samples the engine for PROFILE_SECONDS and writes flame-graph input
+# to PROFILE_DIR/<consumer>-<time>.*.folded.
+PROFILE_CHANNEL = "profile:engine"
+PROFILE_DIR     = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_SECONDS = float(os.getenv("PROFILE_SECONDS", "10"))
+PROFILE_HZ      = int(os.getenv("PROFILE_HZ", "100"))         # samples per second while on
+
+# ── Sweeper (see consumer/sweeper.py) ────────────────────────────
+SWEEP_RATE     = int(os.getenv("SWEEP_RATE", "2000"))        # book members + records examined per second, at most
+SWEEP_BATCH    = 200                                         # ZSCAN / SCAN COUNT per call
+SWEEP_INTERVAL = float(os.getenv("SWEEP_INTERVAL", "60"))    # seconds between full passes
+
+# ── Market-data gateway (see src/gateway/) ───────────────────────
+GATEWAY_HOST         = os.getenv("GATEWAY_HOST", "127.0.0.1")
+GATEWAY_PORT         = int(os.getenv("GATEWAY_PORT", "8081"))   # server.js has 8080
+GATEWAY_INTERVAL     = float(os.getenv("GATEWAY_INTERVAL", "0.1"))  # min seconds between pushes to one client
+GATEWAY_DEPTH        = 10      # default levels per side in a book push (?depth= overrides)
+GATEWAY_MAX_DEPTH    = 50      # largest ?depth= accepted; anything outside 1..this is a 400
+GATEWAY_TRADE_BUFFER = 100     # trades held per client between pushes; older ones are skipped
+GATEWAY_KEEPALIVE    = 15.0    # seconds of silence before an SSE comment line
+
+# ── Wire format ──────────────────────────────────────────────────
+# How producers encode orders on the stream:
+# "text"   — one string field per Order attribute (readable in redis-cli)
+# "packed" — one binary field holding a fixed struct (models.Order.to_packed)
+# The engine decodes both, so producers and engines can switch independently.
+WIRE_FORMAT = os.getenv("WIRE_FORMAT", "text")
+
+# ── Producers ────────────────────────────────────────────────────
+# Every producer in one run_producers.py process shares one client
+# over a pool of at most this many connections (get_pooled_async_redis).
+PRODUCER_POOL_SIZE = int(os.getenv("PRODUCER_POOL_SIZE", "4"))
+
+# ── Book layout in Redis (see consumer/book.py: ORDER RECORDS) ───
+# "hash"  — one order:<id> hash per resting order (readable in redis-cli)
+# "level" — one hash per price level, field order_id → "qty|timestamp|trader"
+# Engines and tools must agree: switch only with an empty book.
+BOOK_LAYOUT = os.getenv("BOOK_LAYOUT", "hash")
+
+# ── Fixed point ──────────────────────────────────────────────────
+# Prices and quantities are integers everywhere below the producers'
+# strategy math: ticks and lots (models.to_ticks / to_lots). Only the
+# mid is a plain float — it's a reference price, not a book level.
+PRICE_SCALE = 100   # ticks per unit of price (tick = 0.01)
+QTY_SCALE   = 10    # lots per unit of quantity (lot = 0.1)
 
 # ── Connection factories ─────────────────────────────────────────
 def get_async_redis() -> aioredis.Redis:
@@ -63,6 +259,29 @@ def get_async_redis() -> aioredis.Redis:
         decode_responses=False,
     )
 
+def get_pooled_async_redis(max_connections: int = PRODUCER_POOL_SIZE) -> aioredis.Redis:
+    """
+    One async client for many tasks, over a BlockingConnectionPool.
+
+    get_async_redis() per task means one socket per task. Here every
+    command (or pipeline) borrows a connection for its round trip and
+    hands it back, so a dozen producers that mostly sleep share a few
+    sockets. When all max_connections are busy the next command waits
+    for one instead of opening another (the "blocking" part).
+
+    Replies are parsed by hiredis (C) when it's installed — redis-py
+    picks it by itself; HIREDIS_AVAILABLE says which parser is in use.
+    Close with `await r.aclose(close_connection_pool=True)`.
+    """
+    pool = aioredis.BlockingConnectionPool(
+        host=REDIS_HOST,
+        port=REDIS_PORT,
+        db=REDIS_DB,
+        max_connections=max_connections,
+        decode_responses=False,
+    )
+    return aioredis.Redis(connection_pool=pool)
+
 def get_sync_redis() -> syncredis.Redis:
     """
     Sync Redis client for the dashboard (Rich runs in sync context).
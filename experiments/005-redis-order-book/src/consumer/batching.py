@@ -0,0 +1,78 @@
+"""
+Adaptive batch sizing for the engine's XREADGROUP reads.
+
+WHY NOT ALWAYS READ THE MAXIMUM?
+─────────────────────────────────
+XREADGROUP COUNT 500 returns fewer entries if fewer are waiting, so a
+big COUNT never blocks for longer. The cost is latency, not waiting:
+in batch mode nothing in a batch is committed (or XACKed) until the
+whole batch has been matched. A 500-order batch means the first order
+in it waits for the other 499.
+
+So the batch size follows the backlog:
+
+  quiet market, lag ≈ 0   → small batches, each order commits quickly
+  burst, lag in the 1000s → big batches, round-trips amortized over
+                            hundreds of orders, engine catches up
+
+WHERE LAG COMES FROM
+─────────────────────
+XINFO GROUPS reports, per consumer group, `lag` — the number of stream
+entries not yet delivered to the group (Redis 7.0+). That's exactly
+"how far behind are we". It costs a round-trip, so we only ask after a
+read came back full (a full read is the only hint there may be more).
+On older Redis `lag` is missing; we fall back to doubling the size on
+every full read.
+"""
+
+from __future__ import annotations
+
+import redis.asyncio as aioredis
+
+from src.config import CONSUMER_GROUP
+
+
+class AdaptiveBatchSize:
+    def __init__(self, minimum: int, maximum: int):
+        if not 1 <= minimum <= maximum:
+            raise ValueError(f"need 1 <= minimum <= maximum, got {minimum}, {maximum}")
+        self.minimum = minimum
+        self.maximum = maximum
+        self.size    = minimum
+
+    def observe_read(self, n: int) -> bool:
+        """
+        Record how many entries the last read returned.
+
+        Returns True if the read was full — the caller should then
+        fetch the group lag and pass it to observe_lag().
+        A short read means the backlog is drained: decay toward minimum.
+        """
+        if n >= self.size:
+            return True
+        self.size = max(self.minimum, self.size // 2)
+        return False
+
+    def observe_lag(self, lag: int | None) -> None:
+        """Size the next read to the backlog (or double if lag is unknown)."""
+        if lag is None:
+            self.size = min(self.maximum, self.size * 2)
+        else:
+            self.size = min(self.maximum, max(self.minimum, lag))
+
+
+async def group_lag(r: aioredis.Redis, streams: list[str]) -> int | None:
+    """
+    Entries not yet delivered to our consumer group, summed over the
+    given streams. None if Redis can't tell for any of them.
+    """
+    total = 0
+    for stream in streams:
+        lag = None
+        for group in await r.xinfo_groups(stream):
+            if group["name"] == CONSUMER_GROUP.encode():
+                lag = group.get("lag")
+        if lag is None:
+            return None
+        total += int(lag)
+    return total
@@ -12,7 +12,8 @@ DATA MODEL SUMMARY
     consumer reads here. Think of it like Kafka but built into Redis.
 
   Sorted Sets (book:bids, book:asks)
-    The live order book. Score = price. This is the key insight:
+    The live order book. Score = price in ticks — an integer, so the
+    score a double holds is exact. This is the key insight:
     Redis Sorted Sets are ordered by score, so ZRANGEBYSCORE and
     ZREVRANGEBYSCORE give you a slice of the book instantly, with
     no sorting on our end.
@@ -20,14 +21,54 @@ DATA MODEL SUMMARY
     Bids:  highest price = best bid → read with ZREVRANGEBYSCORE
     Asks:  lowest price  = best ask → read with ZRANGEBYSCORE
 
-  Hashes (order:{id}, trades:latest)
-    Full order/trade data. The Sorted Set only stores (price, order_id).
-    To reconstruct an order we look up order:{id} in the hash.
+  Hashes (order:{id}, or one per price level — see ORDER RECORDS)
+    Full order data. The Sorted Set only stores (price, order_id).
+    To reconstruct an order we look up its record by id.
     This is the Redis equivalent of a "foreign key" join.
 
-  String (book:mid)
+  Capped Stream (trades:tape)
+    Recent fills, oldest first. Each entry's fields are the trade's
+    fields. XADD MAXLEN trims as it appends; XREVRANGE reads newest
+    first.
+
+  Hash + Sorted Set per side (book:depth:*, book:levels:*)
+    L2 aggregates: total qty per price level. See consumer/depth.py.
+
+  String (book:mid) + Pub/Sub (mid:channel)
     Just the current mid price. INCRBYFLOAT would work too, but
-    a plain SET/GET is clearest for a single float.
+    a plain SET/GET is clearest for a single float. Every SET is
+    paired with a PUBLISH of the same value (queue_mid), so readers
+    can keep a local copy instead of GETting it — see
+    producers/mid_cache.py.
+
+ORDER RECORDS
+──────────────
+BOOK_LAYOUT picks where the rest of a resting order lives:
+
+  hash   order:<id>            one hash per order, every field by name
+  level  book:orders:<side>:<price>
+                               one hash per price level:
+                               field = order_id, value = "qty|ts|trader"
+
+A Redis key is not free: the keyspace entry, the key string and the
+value object come to ~70 bytes before any data, and every order:<id>
+hash repeats the field names "order_id", "trader_id", "timestamp"...
+A million resting orders means a million keys of that.
+
+A level hash is one key per price — a few hundred, however deep the
+book. Side, price, symbol and order type are already in the key (only
+LIMIT orders rest), so a record is just what's left. A level with up
+to 128 orders (hash-max-listpack-entries) stays a listpack: one flat
+allocation, no per-field pointers. A partial fill rewrites one field
+in place (HSET level id record); the last HDEL removes the key.
+
+The cost is that a record can only be found with its price and side
+in hand. Every path here has them — matching walks levels, the memory
+engine holds the Order — and a bare order id (a cancel) gets them
+from ZSCORE on the book. benchmarks/book_memory.py measures both.
+
+Lua sees the layout through ORDER_RECORD_LUA: order_get/put/set_qty/
+del and level_queue, with the same signatures either way.
 """
 
 from __future__ import annotations
@@ -36,18 +77,20 @@ import redis.asyncio as aioredis
 import redis as syncredis
 
 from src.config import (
-    ASKS_KEY, BIDS_KEY, MAX_BOOK_DEPTH, MAX_TRADES_STORED,
-    MID_PRICE_KEY, ORDER_DATA_PREFIX, STREAM_KEY, STREAM_MAX_LEN,
-    TRADES_KEY,
+    BOOK_LAYOUT, DEFAULT_SYMBOL, MAX_BOOK_DEPTH, MAX_TRADES_STORED, ORDER_DATA_PREFIX,
+    STREAM_MAX_LEN, WIRE_FORMAT, keys_for,
 )
-from src.models import Order, Trade
+from src.consumer.depth import LEVEL_DELTA_LUA, execute_pipeline, queue_level_delta
+from src.consumer.market_data import queue_md_event
+from src.consumer.local_book import BookChange, ChangeKind
+from src.models import Message, Order, OrderType, Side, Trade, from_ticks
 
 
 # ── Stream operations ────────────────────────────────────────────
 
-async def publish_order(r: aioredis.Redis, order: Order) -> str:
+async def publish_order(r: aioredis.Redis, order: Message) -> str:
     """
-    Write one order to the stream.
+    Write one order (or CANCEL / REPLACE message) to the stream.
 
     XADD orders:stream MAXLEN ~ 10000 * field value [field value ...]
          ^key           ^trim   ^approx ^auto-id
@@ -60,20 +103,37 @@ async def publish_order(r: aioredis.Redis, order: Order) -> str:
     MAXLEN ~ 10000: the '~' means "approximately" — Redis won't trim on
     every single write (that's expensive), it'll do it in chunks. Keeps
     the stream from growing unbounded without hurting write performance.
+
+    WIRE_FORMAT=packed writes the order as one binary field instead of
+    one string field per attribute (see models.Order.to_packed).
     """
     stream_id = await r.xadd(
-        STREAM_KEY,
-        order.to_stream_dict(),
+        keys_for(order.symbol).stream,
+        stream_fields(order),
         maxlen=STREAM_MAX_LEN,
         approximate=True,
     )
     return stream_id.decode()
 
 
+def queue_publish_order(pipe: aioredis.client.Pipeline, order: Message) -> None:
+    """publish_order's XADD, queued on a pipeline (load generator, send_many)."""
+    pipe.xadd(keys_for(order.symbol).stream, stream_fields(order),
+              maxlen=STREAM_MAX_LEN, approximate=True)
+
+
+def stream_fields(message: Message) -> dict:
+    """XADD fields per WIRE_FORMAT. CancelReplace has no packed layout."""
+    if WIRE_FORMAT == "packed" and isinstance(message, Order):
+        return message.to_packed_dict()
+    return message.to_stream_dict()
+
+
 async def read_orders_simple(
     r: aioredis.Redis,
     last_id: str = "0",
     count: int = 100,
+    symbol: str = DEFAULT_SYMBOL,
 ) -> tuple[list[tuple[str, Order]], str]:
     """
     Read new orders from the stream (simple XREAD, no consumer group).
@@ -92,7 +152,7 @@ async def read_orders_simple(
     next time to get only new messages (like an offset in Kafka).
     """
     response = await r.xread(
-        {STREAM_KEY: last_id},
+        {keys_for(symbol).stream: last_id},
         count=count,
         block=0,      # block=0 means "wait forever for a message"
     )
@@ -112,15 +172,112 @@ async def read_orders_simple(
     return orders, new_cursor
 
 
+# ── Order records (BOOK_LAYOUT) ──────────────────────────────────
+#
+# Lua has no imports (see depth.LEVEL_DELTA_LUA), so both layouts
+# define the same five functions and the scripts below call those.
+# `base` is record_base(symbol); qty comes back as the stored string.
+#   order_get(base, side, price, id)           → qty, trader, ts | nil
+#   order_put(base, side, price, id, qty, trader, ts, symbol)
+#   order_set_qty(base, side, price, id, qty, trader, ts)
+#   order_del(base, side, price, id)
+#   level_queue(base, side, price, book)       → {id, trader, qty, ts} per order
+
+_HASH_RECORD_LUA = """
+local function order_get(base, side, price, id)
+  local h = redis.call("HMGET", base .. id, "qty", "trader_id", "timestamp")
+  if not h[1] then return nil end
+  return h[1], h[2], h[3]
+end
+local function order_put(base, side, price, id, qty, trader, ts, symbol)
+  redis.call("HSET", base .. id,
+             "order_id", id, "trader_id", trader, "side", side,
+             "order_type", "limit", "price", price, "qty", qty,
+             "timestamp", ts, "symbol", symbol)
+end
+local function order_set_qty(base, side, price, id, qty, trader, ts)
+  redis.call("HSET", base .. id, "qty", qty)
+end
+local function order_del(base, side, price, id)
+  redis.call("DEL", base .. id)
+end
+local function level_queue(base, side, price, book)
+  local queue = {}
+  for _, id in ipairs(redis.call("ZRANGEBYSCORE", book, price, price)) do
+    local qty, trader, ts = order_get(base, side, price, id)
+    if qty then
+      table.insert(queue, {id = id, trader = trader, qty = tonumber(qty), ts = ts})
+    end
+  end
+  return queue
+end
+"""
+
+_LEVEL_RECORD_LUA = """
+local function order_get(base, side, price, id)
+  local record = redis.call("HGET", base .. ":" .. side .. ":" .. price, id)
+  if not record then return nil end
+  local qty, ts, trader = string.match(record, "^(%d+)|([^|]*)|(.*)$")
+  return qty, trader, ts
+end
+local function order_put(base, side, price, id, qty, trader, ts, symbol)
+  redis.call("HSET", base .. ":" .. side .. ":" .. price, id, qty .. "|" .. ts .. "|" .. trader)
+end
+local function order_set_qty(base, side, price, id, qty, trader, ts)
+  redis.call("HSET", base .. ":" .. side .. ":" .. price, id, qty .. "|" .. ts .. "|" .. trader)
+end
+local function order_del(base, side, price, id)
+  redis.call("HDEL", base .. ":" .. side .. ":" .. price, id)
+end
+local function level_queue(base, side, price, book)
+  -- One HGETALL for the whole level; the book isn't needed.
+  local queue, flat = {}, redis.call("HGETALL", base .. ":" .. side .. ":" .. price)
+  for i = 1, #flat, 2 do
+    local qty, ts, trader = string.match(flat[i + 1], "^(%d+)|([^|]*)|(.*)$")
+    table.insert(queue, {id = flat[i], trader = trader, qty = tonumber(qty), ts = ts})
+  end
+  return queue
+end
+"""
+
+ORDER_RECORD_LUA = _LEVEL_RECORD_LUA if BOOK_LAYOUT == "level" else _HASH_RECORD_LUA
+
+
+def record_base(symbol: str = DEFAULT_SYMBOL) -> str:
+    """ORDER_RECORD_LUA's `base`: order:<id> prefix, or the symbol's level-hash prefix."""
+    return keys_for(symbol).orders if BOOK_LAYOUT == "level" else ORDER_DATA_PREFIX
+
+
+def pack_record(order: Order, qty: int) -> str:
+    """A level-layout record: everything the level's key doesn't say."""
+    return f"{qty}|{order.timestamp}|{order.trader_id}"
+
+
+def unpack_record(order_id: int, record: bytes, side: str, price: int, symbol: str) -> Order:
+    qty, timestamp, trader_id = record.split(b"|", 2)
+    return Order(
+        order_id=   order_id,
+        trader_id=  trader_id.decode(),
+        side=       Side(side),
+        order_type= OrderType.LIMIT,
+        price=      price,
+        qty=        int(qty),
+        timestamp=  float(timestamp),
+        symbol=     symbol,
+    )
+
+
 # ── Order book state (Sorted Sets + Hashes) ──────────────────────
 
-async def add_to_book(r: aioredis.Redis, order: Order) -> None:
+async def add_to_book(r: aioredis.Redis, order: Order, qty: int | None = None) -> None:
     """
-    Add a limit order to the book.
+    Add a limit order to the book — with `qty` lots instead of
+    order.qty if given (the unfilled remainder, see match_order).
 
     Two writes, always together:
       1. ZADD book:bids <price> <order_id>   — adds to the sorted set
       2. HSET order:<order_id> <all fields>  — stores full order data
+         (or one field of its level's hash — see ORDER RECORDS)
 
     Why not store everything in the sorted set?
       Sorted Sets only have (score, member). Member is a single string.
@@ -132,37 +289,207 @@ async def add_to_book(r: aioredis.Redis, order: Order) -> None:
     if order.price is None:
         return  # market orders don't rest in the book
 
-    book_key = BIDS_KEY if order.side.value == "bid" else ASKS_KEY
-
+    if qty is None:
+        qty = order.qty
     pipe = r.pipeline()
-    # ZADD key score member — sorted set insert
-    pipe.zadd(book_key, {order.order_id: order.price})
-    # HSET key field value [field value ...] — store full order
-    pipe.hset(f"{ORDER_DATA_PREFIX}{order.order_id}", mapping=order.to_stream_dict())
-    await pipe.execute()
+    queue_add_to_book(pipe, order, qty)
+    queue_level_delta(pipe, order.symbol, order.side.value, order.price, qty)
+    await execute_pipeline(r, pipe)
     #
     # pipeline() batches both commands into one round-trip to Redis.
     # Always pipeline writes that logically belong together — it's
     # both faster and less likely to leave state partially written.
 
 
-async def remove_from_book(r: aioredis.Redis, order_id: str, side: str) -> None:
+async def remove_from_book(r: aioredis.Redis, order: Order) -> None:
     """
     Remove a fully-filled or cancelled order from the book.
 
     ZREM key member — O(log N)
-    DEL key         — O(1)
+    DEL key         — O(1)      (HDEL of its field, per level)
+
+    Leaves the L2 depth alone — the caller knows how much qty left the
+    level (see match_order). Cancels, which don't, go through
+    cancel_own.
     """
-    book_key = BIDS_KEY if side == "bid" else ASKS_KEY
     pipe = r.pipeline()
-    pipe.zrem(book_key, order_id)
-    pipe.delete(f"{ORDER_DATA_PREFIX}{order_id}")
+    queue_remove_from_book(pipe, order)
     await pipe.execute()
 
 
-async def get_best_bid(r: aioredis.Redis) -> float | None:
+# Shared with lua_match.MATCH_SCRIPT (after LEVEL_DELTA_LUA and
+# ORDER_RECORD_LUA). A cancel carries only the order id: ZSCORE on each
+# book finds its side and price (no score → not resting in *this*
+# symbol's book), the record its owner and remaining qty. Another
+# trader's order is left alone.
+CANCEL_OWN_LUA = """
+local function cancel_own(base, md, trader, order_id, bids, asks, bid_depth, bid_levels, ask_depth, ask_levels)
+  local side, book, depth, levels = "bid", bids, bid_depth, bid_levels
+  local price = redis.call("ZSCORE", bids, order_id)
+  if not price then
+    side, book, depth, levels = "ask", asks, ask_depth, ask_levels
+    price = redis.call("ZSCORE", asks, order_id)
+    if not price then return 0 end
+  end
+  local qty, owner = order_get(base, side, price, order_id)
+  if not qty or owner ~= trader then return 0 end
+  redis.call("ZREM", book, order_id)
+  order_del(base, side, price, order_id)
+  level_delta(depth, levels, md, side, price, "-" .. qty)
+  return 1
+end
+"""
+
+CANCEL_OWN_SCRIPT = LEVEL_DELTA_LUA + ORDER_RECORD_LUA + CANCEL_OWN_LUA + """
+local cancelled = 0
+for i = 3, #ARGV do
+  cancelled = cancelled + cancel_own(ARGV[1], KEYS[1], ARGV[2], ARGV[i], unpack(KEYS, 2))
+end
+return cancelled
+"""
+
+
+def side_keys(symbol: str = DEFAULT_SYMBOL) -> list[str]:
+    """md:stream, both books and both sides' depth keys — KEYS for CANCEL_OWN_SCRIPT."""
+    keys = keys_for(symbol)
+    return [keys.md, keys.bids, keys.asks, keys.bid_depth, keys.bid_levels, keys.ask_depth, keys.ask_levels]
+
+
+async def cancel_own(
+    r: aioredis.Redis,
+    trader_id: str,
+    order_ids: tuple[int, ...] | list[int],
+    symbol: str = DEFAULT_SYMBOL,
+) -> int:
+    """
+    The engine's side of a CANCEL (redis mode): pull every listed order
+    that is still resting and belongs to trader_id, L2 depth included,
+    in one script call. Returns how many were removed.
     """
-    Best bid = highest price willing to buy.
+    if not order_ids:
+        return 0
+    return await r.eval(
+        CANCEL_OWN_SCRIPT, 7, *side_keys(symbol),
+        record_base(symbol), trader_id, *order_ids,
+    )
+
+
+# ── Pipeline builders ────────────────────────────────────────────
+#
+# The queue_* helpers only *append* commands to a pipeline; the caller
+# decides when to execute it. That lets the in-memory engine fold every
+# book mutation, trade record and XACK for an order into one round-trip.
+
+def queue_add_to_book(pipe: aioredis.client.Pipeline, order: Order, qty: int | None = None) -> None:
+    """ZADD + HSET for a resting order (see add_to_book)."""
+    keys = keys_for(order.symbol)
+    # ZADD key score member — sorted set insert
+    pipe.zadd(keys.book(order.side.value), {order.order_id: order.price})
+    if qty is None:
+        qty = order.qty
+    if BOOK_LAYOUT == "level":
+        # HSET level order_id record — one field in the level's hash
+        pipe.hset(keys.level_orders(order.side.value, order.price),
+                  str(order.order_id), pack_record(order, qty))
+    else:
+        # HSET key field value [field value ...] — store full order
+        fields = order.to_stream_dict()
+        fields["qty"] = str(qty)
+        pipe.hset(f"{ORDER_DATA_PREFIX}{order.order_id}", mapping=fields)
+
+
+def queue_remove_from_book(pipe: aioredis.client.Pipeline, order: Order) -> None:
+    """ZREM + DEL (or HDEL) for a filled or cancelled order (see remove_from_book)."""
+    keys = keys_for(order.symbol)
+    pipe.zrem(keys.book(order.side.value), order.order_id)
+    if BOOK_LAYOUT == "level":
+        pipe.hdel(keys.level_orders(order.side.value, order.price), str(order.order_id))
+    else:
+        pipe.delete(f"{ORDER_DATA_PREFIX}{order.order_id}")
+
+
+def queue_update_qty(pipe: aioredis.client.Pipeline, order: Order, qty: int) -> None:
+    """
+    Rewrite the remaining lots after a partial fill. Sorted set is
+    untouched. A level record is rewritten whole — it's one field.
+    """
+    if BOOK_LAYOUT == "level":
+        pipe.hset(keys_for(order.symbol).level_orders(order.side.value, order.price),
+                  str(order.order_id), pack_record(order, qty))
+    else:
+        pipe.hset(f"{ORDER_DATA_PREFIX}{order.order_id}", "qty", str(qty))
+
+
+def queue_book_changes(pipe: aioredis.client.Pipeline, changes: list[BookChange]) -> None:
+    """
+    Replay the in-memory book's mutations into Redis, in order.
+
+    Order matters: the same order id can be added, partially filled
+    and removed within one batch, and the last write must win. Each
+    write uses the qty recorded with its change, not the live order's.
+    """
+    for change in changes:
+        order = change.order
+        if change.kind == ChangeKind.ADD:
+            queue_add_to_book(pipe, order, change.qty)
+        elif change.kind == ChangeKind.UPDATE:
+            queue_update_qty(pipe, order, change.qty)
+        else:
+            queue_remove_from_book(pipe, order)
+
+
+async def load_resting_orders(
+    r: aioredis.Redis,
+    symbol: str = DEFAULT_SYMBOL,
+) -> list[Order]:
+    """
+    Read every resting order back out of Redis, oldest first.
+
+    Used once at engine startup to rebuild the in-memory book from its
+    Redis projection. One ZRANGE per side, then all record reads in a
+    single pipeline. Members whose record has gone missing are skipped.
+    """
+    keys = keys_for(symbol)
+    rows: list[Order | None] = []
+    for side in ("bid", "ask"):
+        members = await r.zrange(keys.book(side), 0, -1, withscores=True)
+        rows += await get_resting_orders(r, symbol, side, [
+            (int(oid), int(price)) for oid, price in members
+        ])
+    orders = [order for order in rows if order is not None]
+    orders.sort(key=lambda o: o.timestamp)
+    return orders
+
+
+async def clear_book(r: aioredis.Redis, symbol: str = DEFAULT_SYMBOL) -> None:
+    """
+    Delete one symbol's resting orders: both books, every record, the
+    L2 depth. Records are found through the books and both layouts'
+    keys are deleted, so this also cleans up after a BOOK_LAYOUT switch.
+    A leftover level hash would be worse than wasted memory: matching
+    reads a whole level with one HGETALL and would fill its records.
+
+    The depth keys vanish without a delete per level, so a clear event
+    goes to md:stream in the same MULTI — otherwise every BookReplica
+    would keep the old levels, with no gap in seq to tell it so.
+    """
+    keys = keys_for(symbol)
+    doomed = {keys.bids, keys.asks, keys.bid_depth, keys.ask_depth, keys.bid_levels, keys.ask_levels}
+    for side in ("bid", "ask"):
+        for order_id, price in await r.zrange(keys.book(side), 0, -1, withscores=True):
+            doomed.add(f"{ORDER_DATA_PREFIX}{order_id.decode()}")
+            doomed.add(keys.level_orders(side, int(price)))
+    doomed = list(doomed)
+    pipe = r.pipeline()
+    queue_md_event(pipe, symbol, "clear")
+    for i in range(0, len(doomed), 1000):
+        pipe.delete(*doomed[i:i + 1000])
+    await pipe.execute()
+
+
+async def get_best_bid(r: aioredis.Redis, symbol: str = DEFAULT_SYMBOL) -> int | None:
+    """
+    Best bid = highest price willing to buy, in ticks.
 
     ZREVRANGEBYSCORE key +inf -inf WITHSCORES LIMIT 0 1
                          ^max  ^min            ^offset ^count
@@ -170,104 +497,135 @@ async def get_best_bid(r: aioredis.Redis) -> float | None:
     ZREVRANGE sorts high→low, so index 0 is the highest bid.
     We use WITHSCORES to get the price back directly.
     """
-    result = await r.zrevrange(BIDS_KEY, 0, 0, withscores=True)
+    result = await r.zrevrange(keys_for(symbol).bids, 0, 0, withscores=True)
     if not result:
         return None
-    return result[0][1]  # (member, score) → score is the price
+    return int(result[0][1])  # (member, score) → score is the price
 
 
-async def get_best_ask(r: aioredis.Redis) -> float | None:
+async def get_best_ask(r: aioredis.Redis, symbol: str = DEFAULT_SYMBOL) -> int | None:
     """
-    Best ask = lowest price willing to sell.
+    Best ask = lowest price willing to sell, in ticks.
 
     ZRANGE sorts low→high, so index 0 is the lowest ask.
     """
-    result = await r.zrange(ASKS_KEY, 0, 0, withscores=True)
+    result = await r.zrange(keys_for(symbol).asks, 0, 0, withscores=True)
     if not result:
         return None
-    return result[0][1]
+    return int(result[0][1])
 
 
-async def get_order_by_id(r: aioredis.Redis, order_id: str) -> Order | None:
-    """Fetch full order data from the hash."""
-    data = await r.hgetall(f"{ORDER_DATA_PREFIX}{order_id}")
-    if not data:
-        return None
-    return Order.from_stream_dict(data)
+async def get_resting_orders(
+    r: aioredis.Redis,
+    symbol: str,
+    side: str,
+    members: list[tuple[int, int]],
+) -> list[Order | None]:
+    """
+    Records for (order_id, price) pairs off one side of the book — what
+    a ZRANGE... WITHSCORES returns — in one pipelined round-trip.
+
+    hash layout: one HGETALL per order. level layout: one HMGET per
+    price level, for all of that level's ids at once. transaction=False:
+    these are independent reads, no need to wrap them in MULTI/EXEC.
+    Missing records → None, in the position of their pair.
+    """
+    pipe = r.pipeline(transaction=False)
+    if BOOK_LAYOUT != "level":
+        for order_id, _ in members:
+            pipe.hgetall(f"{ORDER_DATA_PREFIX}{order_id}")
+        rows = await pipe.execute()
+        return [Order.from_stream_dict(row) if row else None for row in rows]
+
+    keys = keys_for(symbol)
+    by_price: dict[int, list[int]] = {}
+    for order_id, price in members:
+        by_price.setdefault(price, []).append(order_id)
+    for price, ids in by_price.items():
+        pipe.hmget(keys.level_orders(side, price), ids)
+    found: dict[int, Order] = {}
+    for (price, ids), records in zip(by_price.items(), await pipe.execute()):
+        for order_id, record in zip(ids, records):
+            if record is not None:
+                found[order_id] = unpack_record(order_id, record, side, price, symbol)
+    return [found.get(order_id) for order_id, _ in members]
 
 
 async def get_book_snapshot(
     r: aioredis.Redis,
     depth: int = MAX_BOOK_DEPTH,
-) -> tuple[list[tuple[str, float]], list[tuple[str, float]]]:
+    symbol: str = DEFAULT_SYMBOL,
+) -> tuple[list[tuple[int, int]], list[tuple[int, int]]]:
     """
-    Return top N bids and asks as (order_id, price) pairs.
+    Return top N bids and asks as (order_id, price in ticks) pairs.
 
     Used by the dashboard to render the book ladder.
     Both calls are O(log N + M) where M is the depth requested.
     """
-    bids_raw = await r.zrevrange(BIDS_KEY, 0, depth - 1, withscores=True)
-    asks_raw = await r.zrange(ASKS_KEY, 0, depth - 1, withscores=True)
+    keys = keys_for(symbol)
+    bids_raw = await r.zrevrange(keys.bids, 0, depth - 1, withscores=True)
+    asks_raw = await r.zrange(keys.asks, 0, depth - 1, withscores=True)
 
-    bids = [(oid.decode(), price) for oid, price in bids_raw]
-    asks = [(oid.decode(), price) for oid, price in asks_raw]
+    bids = [(int(oid), int(price)) for oid, price in bids_raw]
+    asks = [(int(oid), int(price)) for oid, price in asks_raw]
     return bids, asks
 
 
 # ── Trade recording ──────────────────────────────────────────────
 
-async def record_trade(r: aioredis.Redis, trade: Trade) -> None:
+def queue_trade(pipe: aioredis.client.Pipeline, trade: Trade) -> None:
     """
-    Store a completed trade + update mid price.
+    Record a completed trade + update the mid price (and put both on
+    md:stream).
 
-    HSET trades:latest <trade_id> <json>
-    We store at most MAX_TRADES_STORED trades by deleting oldest when
-    we exceed the limit. There's no TTL-based eviction here — we
-    manage it manually so the dashboard always sees exactly N trades.
-    """
-    pipe = r.pipeline()
-    pipe.hset(TRADES_KEY, trade.trade_id, str(trade.to_hash_dict()))
-    pipe.set(MID_PRICE_KEY, str(trade.price))
-    await pipe.execute()
+    XADD trades:tape MAXLEN ~ 50 * trade_id ... price ... qty ...
 
-    # Trim to max stored: count current, delete if over limit
-    count = await r.hlen(TRADES_KEY)
-    if count > MAX_TRADES_STORED:
-        # Get all keys, delete the oldest (we'd need timestamps for proper trim)
-        # Simple approach: just let it grow to MAX + batch trim
-        all_keys = await r.hkeys(TRADES_KEY)
-        to_delete = all_keys[:count - MAX_TRADES_STORED]
-        if to_delete:
-            await r.hdel(TRADES_KEY, *to_delete)
+    A stream is the natural shape for a tape: entries are kept in
+    arrival order, so "drop the oldest" is what MAXLEN does for free
+    while appending — no HLEN, no HKEYS, no guessing which hash field
+    is oldest. The '~' lets Redis trim whole internal nodes at once,
+    so the tape may briefly hold a few more than MAX_TRADES_STORED
+    entries; readers ask for exactly n with XREVRANGE COUNT n anyway.
+    """
+    keys = keys_for(trade.symbol)
+    fields = trade.to_hash_dict()
+    pipe.xadd(keys.trades, fields, maxlen=MAX_TRADES_STORED, approximate=True)
+    queue_md_event(pipe, trade.symbol, "trade", fields)
+    queue_mid(pipe, trade.symbol, from_ticks(trade.price))
 
 
-# ── Sync versions for dashboard ──────────────────────────────────
+def queue_mid(pipe: aioredis.client.Pipeline, symbol: str, mid: float) -> None:
+    """
+    SET book:mid + PUBLISH the same value on mid:channel (and a mid
+    event on md:stream).
 
-def sync_get_book_snapshot(
-    r: syncredis.Redis,
-    depth: int = MAX_BOOK_DEPTH,
-) -> tuple[list[tuple[str, float]], list[tuple[str, float]]]:
-    """Sync version of get_book_snapshot for the Rich dashboard."""
-    bids_raw = r.zrevrange(BIDS_KEY, 0, depth - 1, withscores=True)
-    asks_raw = r.zrange(ASKS_KEY, 0, depth - 1, withscores=True)
-    bids = [(oid.decode(), price) for oid, price in bids_raw]
-    asks = [(oid.decode(), price) for oid, price in asks_raw]
-    return bids, asks
+    The key is for whoever arrives late (a new process seeding its
+    cache, the dashboard); the message is for everyone already
+    listening. In a MULTI pipeline both land together, so a reader
+    that subscribes first and GETs second can't miss an update.
+    """
+    keys = keys_for(symbol)
+    pipe.set(keys.mid, str(mid))
+    pipe.publish(keys.mid_channel, str(mid))
+    queue_md_event(pipe, symbol, "mid", {"price": str(mid)})
 
 
-def sync_get_mid_price(r: syncredis.Redis) -> float | None:
-    val = r.get(MID_PRICE_KEY)
-    return float(val) if val else None
+# ── Sync versions for dashboard ──────────────────────────────────
 
+def sync_get_recent_trades(
+    r: syncredis.Redis,
+    n: int = 10,
+    symbol: str = DEFAULT_SYMBOL,
+) -> list[dict]:
+    """
+    Return the n most recent trades, newest first.
 
-def sync_get_recent_trades(r: syncredis.Redis, n: int = 10) -> list[dict]:
-    """Return the n most recent trades from the hash."""
-    raw = r.hgetall(TRADES_KEY)
-    trades = []
-    for _, v in raw.items():
-        try:
-            trades.append(eval(v.decode()))  # stored as str(dict)
-        except Exception:
-            pass
-    trades.sort(key=lambda t: float(t.get("timestamp", 0)), reverse=True)
-    return trades[:n]
\ No newline at end of file
+    XREVRANGE trades:tape + - COUNT n walks the stream backwards from
+    the newest entry and stops after n — cost depends on n, not on
+    how many trades the tape holds.
+    """
+    raw = r.xrevrange(keys_for(symbol).trades, count=n)
+    return [
+        {k.decode(): v.decode() for k, v in fields.items()}
+        for _, fields in raw
+    ]
\ No newline at end of file
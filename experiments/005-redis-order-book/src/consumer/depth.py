@@ -0,0 +1,264 @@
+"""
+L2 depth — total resting quantity per price level, kept in Redis.
+
+WHY AGGREGATE?
+───────────────
+book:bids / book:asks hold one member per ORDER. A depth ladder
+("how much is bid at 99.50?") built from them needs every order id
+at every shown price, then an HGETALL per order to sum the qty —
+O(orders) reads for a picture that only has O(levels) rows.
+
+So the engine keeps the sums as it goes, in two keys per side:
+
+  book:depth:bids   hash        price → total qty at that price
+  book:levels:bids  sorted set  score = price, member = price
+
+The hash answers "how much at 99.50?"; the sorted set answers "which
+are the best 10 prices?" (a hash has no order). Field and member are
+the same price string — the price in ticks, "9950", which is also
+what the order:<id> hashes store in "price" — so one can look up the
+other. Totals are lots. L2_SCRIPT reads the top N levels of both
+sides in one call.
+
+WHO KEEPS THEM UP TO DATE
+──────────────────────────
+  redis mode  — every fill and every rest queues a signed delta
+                (queue_level_delta) in the same pipeline as the
+                order writes
+  lua mode    — MATCH_SCRIPT calls the same level_delta function
+  memory mode — the engine knows each touched level's exact total,
+                so it HSETs it, or HDEL + ZREM if the level emptied
+                (queue_level_total → level_set)
+  cancels     — the CANCEL / REPLACE path (book.CANCEL_OWN_LUA,
+                also inside MATCH_SCRIPT) reads the remaining qty and
+                price out of the order's record and applies the
+                delta atomically
+
+Every one of them also appends the change to md:stream — add, modify
+or delete with the level's new total — inside the same script, so the
+sequenced feed (consumer/market_data.py) can never disagree with the
+hash. Whether a change is an add or a modify is ZADD's own answer:
+it returns 1 only for a price that wasn't a level yet.
+
+A delta can't be done with plain pipelined commands: when a level
+empties, its field and member must be removed, and only Redis knows
+the new total at that point. Hence a tiny Lua function around
+HINCRBY (level_set is its sibling for known totals). Integer lots add
+up exactly, so a level is empty when its total is 0 — not "close to
+0", as it had to be while the sums were HINCRBYFLOAT's.
+
+EVALSHA, NOT EVAL
+──────────────────
+Every fill and every touched level queues one of these scripts, so
+sending the ~1.5KB body each time (and having Redis hash it each
+time) would put most of a commit's bytes into Lua source. As in
+consumer/lua_match.py, the scripts are loaded once (load_depth_scripts)
+and only their SHA1 travels — known up front, since it's just the
+SHA1 of the body. If Redis lost them (a restart, SCRIPT FLUSH),
+EVALSHA fails with NOSCRIPT; inside a MULTI that fails only those
+commands while the rest of the transaction runs, so execute_pipeline
+reloads the scripts and resends just the level updates that failed.
+"""
+
+from __future__ import annotations
+
+import hashlib
+
+import redis.asyncio as aioredis
+from redis.exceptions import NoScriptError
+
+from src.config import DEFAULT_SYMBOL, MAX_BOOK_DEPTH, keys_for
+from src.consumer.market_data import MD_EVENT_LUA, queue_md_event
+
+
+# Shared with MATCH_SCRIPT and CANCEL_OWN_SCRIPT: Lua has no imports, so
+# scripts that maintain depth paste these functions in front of their body.
+LEVEL_DELTA_LUA = MD_EVENT_LUA + """
+local function level_changed(md_key, side, price, total, added)
+  if total <= 0 then
+    md_event(md_key, "type", "delete", "side", side, "price", price)
+  else
+    md_event(md_key, "type", added and "add" or "modify", "side", side,
+             "price", price, "qty", string.format("%d", total))
+  end
+end
+
+local function level_delta(depth_key, levels_key, md_key, side, price, delta)
+  local total = redis.call("HINCRBY", depth_key, price, delta)
+  if total <= 0 then
+    redis.call("HDEL", depth_key, price)
+    if redis.call("ZREM", levels_key, price) == 0 then return end
+    level_changed(md_key, side, price, 0, false)
+  else
+    level_changed(md_key, side, price, total, redis.call("ZADD", levels_key, price, price) == 1)
+  end
+end
+
+local function level_set(depth_key, levels_key, md_key, side, price, qty)
+  local total = tonumber(qty)
+  if total <= 0 then
+    redis.call("HDEL", depth_key, price)
+    if redis.call("ZREM", levels_key, price) == 0 then return end
+    level_changed(md_key, side, price, 0, false)
+  else
+    redis.call("HSET", depth_key, price, qty)
+    level_changed(md_key, side, price, total, redis.call("ZADD", levels_key, price, price) == 1)
+  end
+end
+"""
+
+LEVEL_DELTA_SCRIPT = LEVEL_DELTA_LUA + """
+level_delta(KEYS[1], KEYS[2], KEYS[3], ARGV[1], ARGV[2], ARGV[3])
+"""
+
+LEVEL_SET_SCRIPT = LEVEL_DELTA_LUA + """
+level_set(KEYS[1], KEYS[2], KEYS[3], ARGV[1], ARGV[2], ARGV[3])
+"""
+
+L2_SCRIPT = """
+local n = tonumber(ARGV[1])
+local function side(levels_key, depth_key, best_first_desc)
+  local prices
+  if best_first_desc then
+    prices = redis.call("ZREVRANGE", levels_key, 0, n - 1)
+  else
+    prices = redis.call("ZRANGE", levels_key, 0, n - 1)
+  end
+  if #prices == 0 then return {{}, {}} end
+  return {prices, redis.call("HMGET", depth_key, unpack(prices))}
+end
+local bids = side(KEYS[1], KEYS[2], true)
+local asks = side(KEYS[3], KEYS[4], false)
+return {bids[1], bids[2], asks[1], asks[2]}
+"""
+
+
+def _sha(script: str) -> str:
+    """What SCRIPT LOAD would return for script."""
+    return hashlib.sha1(script.encode()).hexdigest()
+
+
+LEVEL_DELTA_SHA = _sha(LEVEL_DELTA_SCRIPT)
+LEVEL_SET_SHA   = _sha(LEVEL_SET_SCRIPT)
+L2_SHA          = _sha(L2_SCRIPT)
+
+
+async def load_depth_scripts(r: aioredis.Redis) -> None:
+    """SCRIPT LOAD the writers, so the EVALSHAs queued below find them."""
+    for script in (LEVEL_DELTA_SCRIPT, LEVEL_SET_SCRIPT):
+        await r.script_load(script)
+
+
+async def execute_pipeline(r: aioredis.Redis, pipe: aioredis.client.Pipeline) -> list:
+    """
+    pipe.execute() for a pipeline holding queued level updates.
+
+    Level updates that failed with NOSCRIPT are resent, in their
+    original order, once the scripts are loaded again (see the module
+    docstring). Any other error is raised, as execute() would.
+    """
+    queued = [args for args, _ in pipe.command_stack]
+    replies = await pipe.execute(raise_on_error=False)
+    missing = [args for args, reply in zip(queued, replies) if isinstance(reply, NoScriptError)]
+    if missing:
+        await load_depth_scripts(r)
+        resend = r.pipeline()
+        for args in missing:
+            resend.execute_command(*args)
+        await resend.execute()
+    for reply in replies:
+        if isinstance(reply, Exception) and not isinstance(reply, NoScriptError):
+            raise reply
+    return replies
+
+
+# ── Writers (pipeline builders, like book.queue_*) ───────────────
+
+def queue_level_delta(
+    pipe: aioredis.client.Pipeline,
+    symbol: str,
+    side: str,
+    price: int,
+    delta: int,
+) -> None:
+    """
+    Add `delta` lots (negative for fills) to one level, dropping it if
+    it empties. Execute the pipeline with execute_pipeline.
+    """
+    keys = keys_for(symbol)
+    pipe.evalsha(
+        LEVEL_DELTA_SHA, 3, keys.depth(side), keys.levels(side), keys.md,
+        side, price, delta,
+    )
+
+
+def queue_level_total(
+    pipe: aioredis.client.Pipeline,
+    symbol: str,
+    side: str,
+    price: int,
+    qty: int,
+) -> None:
+    """Overwrite one level with a known total; qty 0 removes the level (see queue_level_delta)."""
+    keys = keys_for(symbol)
+    pipe.evalsha(
+        LEVEL_SET_SHA, 3, keys.depth(side), keys.levels(side), keys.md,
+        side, price, qty,
+    )
+
+
+def queue_depth_rebuild(
+    pipe: aioredis.client.Pipeline,
+    symbol: str,
+    levels: dict[str, list[tuple[int, int]]],
+) -> None:
+    """
+    Replace both sides' aggregates with `levels` ({side: [(price, qty)]}).
+    Used when the memory engine (re)loads its book, so depth written
+    by an earlier run or another mode can't linger.
+    """
+    keys = keys_for(symbol)
+    queue_md_event(pipe, symbol, "clear")
+    for side in ("bid", "ask"):
+        pipe.delete(keys.depth(side), keys.levels(side))
+        rows = [(price, qty) for price, qty in levels.get(side, []) if qty > 0]
+        if rows:
+            pipe.hset(keys.depth(side), mapping={p: q for p, q in rows})
+            pipe.zadd(keys.levels(side), {p: p for p, _ in rows})
+        for price, qty in rows:
+            queue_md_event(pipe, symbol, "add", {"side": side, "price": price, "qty": qty})
+
+
+# ── Readers ──────────────────────────────────────────────────────
+
+async def get_l2_snapshot(
+    r: aioredis.Redis,
+    depth: int = MAX_BOOK_DEPTH,
+    symbol: str = DEFAULT_SYMBOL,
+) -> tuple[list[tuple[int, int]], list[tuple[int, int]]]:
+    """
+    Top `depth` levels per side as (ticks, total lots), best first.
+    One EVALSHA — O(depth), however many orders rest at each level —
+    loading L2_SCRIPT first only if Redis doesn't have it yet.
+    """
+    args = [4, *_l2_keys(symbol), depth]
+    try:
+        reply = await r.evalsha(L2_SHA, *args)
+    except NoScriptError:
+        await r.script_load(L2_SCRIPT)
+        reply = await r.evalsha(L2_SHA, *args)
+    return _parse_l2(reply)
+
+
+def _l2_keys(symbol: str) -> list[str]:
+    keys = keys_for(symbol)
+    return [keys.bid_levels, keys.bid_depth, keys.ask_levels, keys.ask_depth]
+
+
+def _parse_l2(reply: list) -> tuple[list[tuple[int, int]], list[tuple[int, int]]]:
+    bid_prices, bid_qtys, ask_prices, ask_qtys = reply
+
+    def rows(prices: list, qtys: list) -> list[tuple[int, int]]:
+        return [(int(p), int(q)) for p, q in zip(prices, qtys) if q is not None]
+
+    return rows(bid_prices, bid_qtys), rows(ask_prices, ask_qtys)
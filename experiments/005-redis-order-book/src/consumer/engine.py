@@ -10,6 +10,11 @@ WHAT THIS FILE DOES
 5. If unmatched → add order to the book (rests as a limit order)
 6. XACK every message after processing
 
+Entries can also be CANCEL / REPLACE messages (models.CancelReplace):
+pull some of a trader's resting orders, then — REPLACE — match new
+ones. They're applied in stream order like everything else, so a
+cancel can never race a match that is already using the order.
+
 THE KEY REDIS CONCEPT: CONSUMER GROUPS
 ────────────────────────────────────────
 Regular XREAD: "give me messages after cursor X"
@@ -21,7 +26,9 @@ XREADGROUP: "give me undelivered messages for my group"
   - Delivered-but-unacknowledged messages sit in the PEL
     (Pending Entry List)
   - XACK removes a message from the PEL
-  - On restart, you can call XAUTOCLAIM to reclaim PEL messages
+  - XAUTOCLAIM hands idle PEL messages to another consumer —
+    that's how a surviving engine finishes a crashed one's work
+    (autoclaim_loop below)
 
 It's the difference between reading a file (XREAD) and a job queue
 where the server tracks what you've actually finished (XREADGROUP).
@@ -29,7 +36,7 @@ where the server tracks what you've actually finished (XREADGROUP).
 MATCHING ALGORITHM: PRICE-TIME PRIORITY
 ─────────────────────────────────────────
 For a new BID at price P:
-  1. Get all asks with price ≤ P (these are crossable)
+  1. Page through asks with price ≤ P until their qty covers ours
   2. Sort by price ascending (best ask first), then by timestamp
   3. Fill greedily until our qty is exhausted or no more matches
 
@@ -40,33 +47,73 @@ the resting order stays in the book with qty=5. We do this by
 deleting the old hash entry and reinserting with reduced qty.
 The sorted set entry (price, order_id) doesn't change — only the
 hash changes. This is why we separated them.
+
+ENGINE MODES (config.ENGINE_MODE)
+──────────────────────────────────
+  redis  — match_order below: the sorted sets ARE the book. Every
+           order reads candidates out of Redis, one HGETALL each.
+  memory — consumer/local_book.py: the book lives in process memory,
+           matching does zero I/O, and the result is projected into
+           Redis with one pipeline per batch (process_in_memory).
+           Restarts restore the book from a local snapshot + journal
+           (consumer/persistence.py, recover_local_book).
+  lua    — consumer/lua_match.py: the matching loop runs inside Redis
+           as one atomic EVALSHA per order. Safe with several engines.
+
+SYMBOLS
+────────
+Each instrument has its own stream and book keys (config.keys_for).
+One engine reads the streams of every symbol it owns in a single
+XREADGROUP, so orders for AAPL and MSFT never queue behind each other
+in one stream — and a second engine can own a disjoint set of
+symbols (consumer/router.py) without sharing any book at all.
+Ordering is only guaranteed within a symbol, which is all matching
+needs: books for different symbols never interact.
 """
 
 from __future__ import annotations
 
 import asyncio
 import json
+import os
 import time
-from typing import AsyncIterator
+import traceback
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Sequence
 
 import redis.asyncio as aioredis
 
 from src.config import (
-    ASKS_KEY, BIDS_KEY, CONSUMER_GROUP, CONSUMER_NAME,
-    ORDER_DATA_PREFIX, STREAM_KEY, TRADES_CHANNEL,
-    get_async_redis,
+    CLAIM_BATCH, CLAIM_INTERVAL, CLAIM_MIN_IDLE_MS, COMMIT_KEY_PREFIX,
+    CONSUMER_GROUP, CONSUMER_NAME, CROSSABLE_PAGE_SIZE, DEFAULT_SYMBOL, ENGINE_BATCH_MAX,
+    ENGINE_BATCH_MIN, ENGINE_MODE, ENGINE_PIPELINE_DEPTH, METRICS_INTERVAL,
+    PROFILE_CHANNEL, SNAPSHOT_INTERVAL, SYMBOLS, get_async_redis, keys_for,
 )
 from src.consumer.book import (
-    add_to_book, get_order_by_id, record_trade, remove_from_book,
+    add_to_book, cancel_own, get_resting_orders, load_resting_orders,
+    queue_book_changes, queue_remove_from_book, queue_trade, queue_update_qty,
 )
-from src.models import Order, OrderType, Side, Trade
+from src.consumer.batching import AdaptiveBatchSize, group_lag
+from src.consumer.depth import (
+    execute_pipeline, load_depth_scripts, queue_depth_rebuild, queue_level_delta,
+    queue_level_total,
+)
+from src.consumer.local_book import BookChange, LevelTotal, LocalBook
+from src.consumer.lua_match import LuaMatcher
+from src.consumer.persistence import BookStore, format_stream_id, parse_stream_id
+from src.metrics import Metrics, SampledLog
+from src.profiler import SamplingProfiler, install_signal, listen_for_requests
+from src.models import CancelReplace, Message, Order, OrderType, Side, Trade, decode_message, next_id
 
 
 # ── Consumer group setup ─────────────────────────────────────────
 
-async def ensure_consumer_group(r: aioredis.Redis) -> None:
+async def ensure_consumer_group(
+    r: aioredis.Redis,
+    symbols: Sequence[str] = (DEFAULT_SYMBOL,),
+) -> None:
     """
-    Create the consumer group if it doesn't exist.
+    Create the consumer group on each symbol's stream if it doesn't exist.
 
     XGROUP CREATE stream group $ MKSTREAM
                                ^
@@ -79,26 +126,32 @@ async def ensure_consumer_group(r: aioredis.Redis) -> None:
     The try/except is intentional — if the group already exists,
     Redis raises a BusyGroup error. That's fine, we just continue.
     """
-    try:
-        await r.xgroup_create(
-            STREAM_KEY,
-            CONSUMER_GROUP,
-            id="$",
-            mkstream=True,
-        )
-        print(f"[engine] Created consumer group '{CONSUMER_GROUP}'")
-    except aioredis.ResponseError as e:
-        if "BUSYGROUP" in str(e):
-            print(f"[engine] Consumer group '{CONSUMER_GROUP}' already exists")
-        else:
-            raise
+    for symbol in symbols:
+        stream = keys_for(symbol).stream
+        try:
+            await r.xgroup_create(
+                stream,
+                CONSUMER_GROUP,
+                id="$",
+                mkstream=True,
+            )
+            print(f"[engine] Created consumer group '{CONSUMER_GROUP}' on '{stream}'")
+        except aioredis.ResponseError as e:
+            if "BUSYGROUP" in str(e):
+                print(f"[engine] Consumer group '{CONSUMER_GROUP}' already exists on '{stream}'")
+            else:
+                raise
 
 
 # ── The XREADGROUP loop ──────────────────────────────────────────
 
-async def order_stream(r: aioredis.Redis) -> AsyncIterator[tuple[str, Order]]:
+async def order_stream(
+    r: aioredis.Redis,
+    consumer: str = CONSUMER_NAME,
+    symbols: Sequence[str] = (DEFAULT_SYMBOL,),
+) -> AsyncIterator[tuple[str, Message]]:
     """
-    Async generator that yields (stream_id, Order) forever.
+    Async generator that yields (stream_id, Order | CancelReplace) forever.
 
     Uses XREADGROUP so Redis tracks what we've processed.
 
@@ -111,13 +164,17 @@ async def order_stream(r: aioredis.Redis) -> AsyncIterator[tuple[str, Order]]:
     BLOCK 2000: wait up to 2000ms for new messages before returning
     empty. This is long-polling — we don't spin-wait, Redis wakes us
     up when something arrives. Far better than sleep() in a loop.
+
+    With several symbols, STREAMS lists one key per symbol (all with
+    '>') and the reply holds one entry list per stream that had data.
     """
+    streams = {keys_for(symbol).stream: ">" for symbol in symbols}
     while True:
         try:
             response = await r.xreadgroup(
                 groupname=CONSUMER_GROUP,
-                consumername=CONSUMER_NAME,
-                streams={STREAM_KEY: ">"},
+                consumername=consumer,
+                streams=streams,
                 count=10,
                 block=2000,
             )
@@ -129,11 +186,55 @@ async def order_stream(r: aioredis.Redis) -> AsyncIterator[tuple[str, Order]]:
         if not response:
             continue  # timeout, no new messages, loop again
 
-        # response: [(b"orders:stream", [(b"id", {fields}), ...])]
-        stream_entries = response[0][1]
-        for stream_id, fields in stream_entries:
-            order = Order.from_stream_dict(fields)
-            yield stream_id.decode(), order
+        # response: [(b"orders:stream", [(b"id", {fields}), ...]), ...]
+        for _, stream_entries in response:
+            for stream_id, fields in stream_entries:
+                yield stream_id.decode(), decode_message(fields)
+
+
+async def order_batches(
+    r: aioredis.Redis,
+    sizer: AdaptiveBatchSize,
+    consumer: str = CONSUMER_NAME,
+    symbols: Sequence[str] = (DEFAULT_SYMBOL,),
+) -> AsyncIterator[list[tuple[str, Message]]]:
+    """
+    Like order_stream, but yields each XREADGROUP reply as one batch.
+
+    COUNT comes from the AdaptiveBatchSize: after every full read we
+    ask XINFO GROUPS how far behind the group is and size the next
+    read to that backlog (see consumer/batching.py). COUNT applies per
+    stream, so one batch holds up to size entries for each symbol.
+    """
+    streams = [keys_for(symbol).stream for symbol in symbols]
+    while True:
+        try:
+            response = await r.xreadgroup(
+                groupname=CONSUMER_GROUP,
+                consumername=consumer,
+                streams={stream: ">" for stream in streams},
+                count=sizer.size,
+                block=2000,
+            )
+            per_stream = [stream_entries for _, stream_entries in response or []]
+            entries = [entry for stream_entries in per_stream for entry in stream_entries]
+            if sizer.observe_read(max(map(len, per_stream), default=0)):
+                sizer.observe_lag(await group_lag(r, streams))
+        except aioredis.ConnectionError:
+            print("[engine] Redis connection lost, retrying in 1s...")
+            await asyncio.sleep(1)
+            continue
+
+        if entries:
+            yield decode_entries(entries)
+
+
+def decode_entries(entries: list) -> list[tuple[str, Message]]:
+    """[(b"id", {fields}), ...] → [("id", Order | CancelReplace), ...]"""
+    return [
+        (stream_id.decode(), decode_message(fields))
+        for stream_id, fields in entries
+    ]
 
 
 # ── Matching logic ───────────────────────────────────────────────
@@ -141,55 +242,81 @@ async def order_stream(r: aioredis.Redis) -> AsyncIterator[tuple[str, Order]]:
 async def get_crossable_orders(
     r: aioredis.Redis,
     incoming: Order,
+    page_size: int = CROSSABLE_PAGE_SIZE,
 ) -> list[Order]:
     """
-    Find all resting orders that can trade against the incoming order.
+    Find the resting orders needed to fill the incoming order.
 
-    For a BID at price P: find asks where ask_price <= P
-      ZRANGEBYSCORE book:asks -inf P WITHSCORES
+    For a BID at price P: walk asks where ask_price <= P
+      ZRANGEBYSCORE book:asks -inf P WITHSCORES LIMIT offset count
       Sorted low→high, so we get cheapest asks first. Good.
 
-    For an ASK at price P: find bids where bid_price >= P
-      ZREVRANGEBYSCORE book:bids +inf P WITHSCORES
+    For an ASK at price P: walk bids where bid_price >= P
+      ZREVRANGEBYSCORE book:bids +inf P WITHSCORES LIMIT offset count
       Sorted high→low, so we get most generous bids first. Good.
 
-    Then we look up the full Order object for each match via HGETALL.
+    Market orders use the same walk with the open bound (+inf / -inf).
+
+    WHY PAGE INSTEAD OF FETCHING EVERYTHING?
+      A market order for 5 lots on a 100k-order book needs one or two
+      resting orders, not 100k HGETALLs. So we read page_size members
+      at a time, fetch that page's records in ONE pipeline, and stop as
+      soon as the (non-self) quantity seen covers the incoming qty.
+
+    One subtlety: within a price level, a sorted set orders members by
+    member string (order_id), not by arrival. If a page boundary falls
+    inside a level, the earliest order at that price might be on the
+    next page. So once qty is covered we also pull the rest of that
+    last level (ZRANGEBYSCORE p p) before sorting by time.
     """
-    if incoming.price is None:
-        # Market order — crosses at any price
-        if incoming.side == Side.BID:
-            raw = await r.zrange(ASKS_KEY, 0, -1, withscores=True)
-        else:
-            raw = await r.zrevrange(BIDS_KEY, 0, -1, withscores=True)
+    if incoming.qty <= 0:
+        return []  # nothing to fill — and the loop's else branch needs a page
+
+    keys = keys_for(incoming.symbol)
+    side = Side.ASK if incoming.side == Side.BID else Side.BID
+    if incoming.side == Side.BID:
+        book_key, reverse = keys.asks, False
+        near, far = "-inf", incoming.price if incoming.price is not None else "+inf"
     else:
-        if incoming.side == Side.BID:
-            # Find asks priced at or below what we're willing to pay
-            raw = await r.zrangebyscore(
-                ASKS_KEY, "-inf", incoming.price, withscores=True
+        book_key, reverse = keys.bids, True
+        near, far = "+inf", incoming.price if incoming.price is not None else "-inf"
+
+    crossable: list[Order] = []
+    seen: set[int] = set()
+    covered = 0
+    offset = 0
+    last_price: float | None = None
+
+    while covered < incoming.qty:
+        if reverse:
+            raw = await r.zrevrangebyscore(
+                book_key, near, far, start=offset, num=page_size, withscores=True
             )
         else:
-            # Find bids priced at or above what we're willing to accept
-            raw = await r.zrevrangebyscore(
-                BIDS_KEY, "+inf", incoming.price, withscores=True
+            raw = await r.zrangebyscore(
+                book_key, near, far, start=offset, num=page_size, withscores=True
             )
+        if not raw:
+            break
+        offset += len(raw)
+        last_price = raw[-1][1]
+        covered += _collect(
+            incoming,
+            await get_resting_orders(r, incoming.symbol, side.value, [
+                (int(oid), int(price)) for oid, price in raw
+            ]),
+            crossable, seen,
+        )
+        if len(raw) < page_size:
+            break  # walked off the end of the crossable range
 
-    if not raw:
-        return []
-
-    # Fetch full order data for each candidate
-    crossable = []
-    for order_id_bytes, _ in raw:
-        order = await get_order_by_id(r, order_id_bytes.decode())
-        if order:
-            crossable.append(order)
-
-    # Self-trade prevention (STP) — standard on every real exchange.
-    # If the resting order belongs to the same trader as the incoming
-    # order, skip it. Without this, a market maker's new quotes cross
-    # against its own stale resting quotes, producing phantom trades
-    # with buyer == seller. No real P&L changes hands; it just
-    # pollutes the tape and inflates volume statistics.
-    crossable = [o for o in crossable if o.trader_id != incoming.trader_id]
+    else:
+        # Qty covered — finish the boundary level so time priority holds.
+        level = await r.zrangebyscore(book_key, last_price, last_price)
+        rest = [(int(oid), int(last_price)) for oid in level if int(oid) not in seen]
+        if rest:
+            _collect(incoming, await get_resting_orders(r, incoming.symbol, side.value, rest),
+                     crossable, seen)
 
     # Preserve price-time priority: best price first, then earliest arrival.
     if incoming.side == Side.BID:
@@ -209,6 +336,33 @@ async def get_crossable_orders(
     return crossable
 
 
+def _collect(
+    incoming: Order,
+    page: list[Order | None],
+    crossable: list[Order],
+    seen: set[int],
+) -> int:
+    """
+    Add one page of candidates to `crossable`, return the qty it adds.
+
+    Missing records (None) are skipped. So are the incoming trader's own
+    orders — self-trade prevention (STP), standard on every real
+    exchange. Without it, a market maker's new quotes cross against its
+    own stale resting quotes, producing phantom trades with buyer ==
+    seller. No real P&L changes hands; it just pollutes the tape and
+    inflates volume statistics. STP orders don't count toward coverage.
+    """
+    added = 0
+    for order in page:
+        if order is None or order.order_id in seen:
+            continue
+        seen.add(order.order_id)
+        if order.trader_id != incoming.trader_id:
+            crossable.append(order)
+            added += order.qty
+    return added
+
+
 async def match_order(
     r: aioredis.Redis,
     incoming: Order,
@@ -230,6 +384,11 @@ async def match_order(
       - Subtract fill_qty from remaining_qty
       - If remaining_qty == 0 → incoming order fully filled → stop
     If remaining_qty > 0 after all matches → add remainder to book
+
+    Quantities are whole lots, so "fully filled" is exact equality.
+    The remainder rests as `incoming` with a qty override — add_to_book
+    writes the smaller qty; no second Order is built for it, and the
+    caller's Order is left as it arrived.
     """
     trades: list[Trade] = []
     remaining_qty = incoming.qty
@@ -248,67 +407,818 @@ async def match_order(
         else:
             bid_order, ask_order = resting, incoming
 
-        trade = Trade.create(bid_order, ask_order, fill_qty)
-        trade.price = resting.price  # trades clear at the resting/maker price
-        trades.append(trade)
+        # Trades clear at the resting/maker price
+        trades.append(Trade.create(bid_order, ask_order, fill_qty, resting.price))
 
         remaining_qty -= fill_qty
 
-        if fill_qty >= resting.qty - 1e-9:
+        pipe = r.pipeline()
+        if fill_qty == resting.qty:
             # Resting order fully consumed — remove from book
-            await remove_from_book(r, resting.order_id, resting.side.value)
+            queue_remove_from_book(pipe, resting)
         else:
-            # Resting order partially filled — update qty in hash
-            new_qty = resting.qty - fill_qty
-            await r.hset(
-                f"{ORDER_DATA_PREFIX}{resting.order_id}",
-                "qty",
-                str(new_qty),
-            )
+            # Resting order partially filled — update qty in its record
+            queue_update_qty(pipe, resting, resting.qty - fill_qty)
+        # Either way, fill_qty left that price level
+        queue_level_delta(pipe, incoming.symbol, resting.side.value, resting.price, -fill_qty)
+        await execute_pipeline(r, pipe)
 
     # If the incoming order wasn't fully filled, add remainder to book
     if remaining_qty > 0 and incoming.order_type == OrderType.LIMIT:
-        # Create a new Order with the remaining qty (frozen dataclass)
-        remainder = Order(
-            order_id=  incoming.order_id,
-            trader_id= incoming.trader_id,
-            side=      incoming.side,
-            order_type=incoming.order_type,
-            price=     incoming.price,
-            qty=       remaining_qty,
-            timestamp= incoming.timestamp,
-        )
-        await add_to_book(r, remainder)
+        await add_to_book(r, incoming, remaining_qty)
 
     return trades
 
 
-# ── Trade publishing ─────────────────────────────────────────────
+async def apply_message(r: aioredis.Redis, message: Message) -> list[Trade]:
+    """
+    Redis-mode handling of one stream entry. An Order is matched; a
+    CancelReplace pulls its cancel_ids (book.cancel_own — the order's
+    own hash says which side it rests on) and then matches each leg.
+    """
+    if isinstance(message, Order):
+        return await match_order(r, message)
+    await cancel_own(r, message.trader_id, message.cancel_ids, message.symbol)
+    trades: list[Trade] = []
+    for order in message.orders:
+        trades.extend(await match_order(r, order))
+    return trades
+
+
+async def apply_pending(r: aioredis.Redis, stream_id: str, message: Message) -> list[Trade]:
+    """
+    apply_message, but only for an entry nobody has processed yet.
+
+    apply_message writes the book as it goes, long before any commit.
+    Acking after it, as the other modes do, would leave an entry that
+    was applied but not acked — a failure later in its batch, a crash
+    before the commit — pending, and a reclaim would apply it again:
+    makers filled twice, remainders rested twice. So redis mode XACKs
+    first, like MATCH_SCRIPT (consumer/lua_match.py), and skips the
+    entry if XACK returns 0. Unlike the script, the two steps aren't
+    atomic: an entry whose matching fails after its XACK is not
+    retried. At most once, where a retry could double-fill — and
+    match_batch still commits the rest of the batch around it.
+    """
+    if not await r.xack(keys_for(message.symbol).stream, CONSUMER_GROUP, stream_id):
+        return []  # already processed (reclaimed from a consumer that wasn't dead)
+    return await apply_message(r, message)
+
+
+# ── Engine state ─────────────────────────────────────────────────
+
+@dataclass
+class EngineContext:
+    """
+    What the processing loops share within one engine process.
+
+    Exactly one of books / lua is set in memory / lua mode; neither in
+    redis mode. books holds one LocalBook per owned symbol, stores the
+    snapshot + journal files behind each. The lock serializes
+    match+commit between the main read loop and the autoclaim loop: in
+    memory mode the projection must receive commits in the same order
+    the local books applied them, and a snapshot must never see a batch
+    half-applied. metrics and log are the process's instrumentation
+    (src/metrics.py), exported by metrics_loop. commits is the queue of
+    matched-but-uncommitted batches while consumer/pipeline.py runs
+    (see settle).
+    """
+    r: aioredis.Redis
+    consumer: str = CONSUMER_NAME
+    symbols: list[str] = field(default_factory=lambda: [DEFAULT_SYMBOL])
+    books: dict[str, LocalBook] | None = None
+    stores: dict[str, BookStore] | None = None
+    lua: LuaMatcher | None = None
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    snapshot_at: float = field(default_factory=time.monotonic)
+    commits: asyncio.Queue[MatchedBatch] | None = None
+    metrics: Metrics = field(init=False)
+    log: SampledLog = field(init=False)
+
+    def __post_init__(self) -> None:
+        self.metrics = Metrics(self.consumer)
+        self.log = SampledLog("engine")
+
+
+# ── In-memory matching ───────────────────────────────────────────
+
+async def load_local_book(r: aioredis.Redis, symbol: str = DEFAULT_SYMBOL) -> LocalBook:
+    """
+    Rebuild one symbol's in-process book from its Redis projection,
+    then rewrite the L2 depth keys from it so they start out exact.
+    """
+    book = LocalBook(symbol)
+    book.restore(await load_resting_orders(r, symbol))
+    await write_depth(r, book)
+    return book
+
+
+async def write_depth(r: aioredis.Redis, book: LocalBook) -> None:
+    """Replace a symbol's L2 aggregates with the local book's levels."""
+    pipe = r.pipeline()
+    queue_depth_rebuild(pipe, book.symbol, {
+        side.value: book.depth(side) for side in (Side.BID, Side.ASK)
+    })
+    await pipe.execute()
+
+
+async def resync_local_books(ctx: EngineContext) -> None:
+    """
+    After a failed batch the local books may have applied orders that
+    Redis never heard about. Rebuild memory from the projection so the
+    two can't drift apart; keep the old state if Redis is unreachable.
+    The reloaded book is snapshotted straight away so the journal
+    replays on top of it, not on top of the state we just threw out.
+    """
+    for symbol, book in ctx.books.items():
+        try:
+            book.reload(await load_resting_orders(ctx.r, symbol))
+            await write_depth(ctx.r, book)
+            ctx.stores[symbol].snapshot(book)
+        except Exception as reload_error:
+            print(f"[engine] ERROR reloading {symbol} book: {reload_error}")
+
 
-async def publish_trades(r: aioredis.Redis, trades: list[Trade]) -> None:
+def match_in_memory(ctx: EngineContext, batch: list[tuple[str, Message]]) -> MatchedBatch:
+    """
+    Memory-mode match_batch: journal, then match locally.
+
+    Entries at or below their symbol's last applied ID are already in
+    the book — a redelivery after a restart — so they are acked but
+    not matched again (unless they were set aside: BookStore.skip). The rest are journaled *before* matching
+    (write-ahead, see consumer/persistence.py) and only count as
+    applied once their commit has landed (commit_matched).
+    """
+    fresh: dict[str, list[tuple[str, Message]]] = {}
+    for stream_id, order in batch:
+        if ctx.stores[order.symbol].is_new(stream_id):
+            fresh.setdefault(order.symbol, []).append((stream_id, order))
+
+    marks = {symbol: ctx.stores[symbol].append(entries) for symbol, entries in fresh.items()}
+    try:
+        trades_by_id = {
+            (symbol, stream_id): ctx.books[symbol].apply(order)
+            for symbol, entries in fresh.items()
+            for stream_id, order in entries
+        }
+    except Exception:
+        # The caller resyncs the books from Redis; the journal must
+        # not claim these entries were applied either.
+        for symbol, mark in marks.items():
+            ctx.stores[symbol].rollback(mark)
+        raise
+
+    # Keyed by symbol too: each symbol has its own stream, so two
+    # entries in one batch can carry the same ID.
+    applied = [entry for entries in fresh.values() for entry in entries]
+    return MatchedBatch(
+        batch=          batch,
+        per_order=      [trades_by_id.get((order.symbol, stream_id), []) for stream_id, order in batch],
+        acks=           group_acks(batch),
+        matched_at=     time.time(),
+        changes=        [c for book in ctx.books.values() for c in book.drain_changes()],
+        levels=         [level for book in ctx.books.values() for level in book.drain_levels()],
+        applied=        applied,
+        applied_trades= [trades_by_id[(order.symbol, stream_id)] for stream_id, order in applied],
+    )
+
+
+async def commit_until_acked(
+    r: aioredis.Redis,
+    acks: dict[str, list[str]],
+    trades: list[Trade],
+    changes: list[BookChange],
+    levels: list[LevelTotal],
+) -> None:
     """
-    For each trade:
-      1. Store in the trades:latest hash (for dashboard polling)
-      2. PUBLISH to trades:channel (for dashboard Pub/Sub)
+    commit_orders, retried until it lands.
+
+    The local books (and the journal) have already applied this batch,
+    so giving up would leave memory ahead of Redis. Retrying blindly
+    isn't safe either: a commit that raised may still have executed —
+    the connection can drop after EXEC — and running it twice would
+    put every trade on the tape twice. So before each retry we ask
+    XPENDING whether the entries are still pending; if not, the
+    earlier EXEC went through.
+    """
+    while True:
+        try:
+            await commit_orders(r, acks, trades, changes, levels)
+            return
+        except aioredis.RedisError as e:
+            print(f"[engine] Commit failed ({e}), retrying in 1s...")
+        await asyncio.sleep(1)
+        try:
+            if not await still_pending(r, acks):
+                return
+        except aioredis.RedisError:
+            pass
+
+
+async def commit_until_landed(r: aioredis.Redis, consumer: str, trades: list[Trade]) -> None:
+    """
+    Lua and redis mode's commit_until_acked.
+
+    Their entries were XACKed before matching (MATCH_SCRIPT,
+    apply_pending), so a commit that never lands loses its trades for
+    good — nothing is left pending for anyone to retry. So this retries
+    too. XPENDING can't say whether a failed attempt went through
+    (there was nothing to ack), so every attempt also SETs
+    commit:engine:<consumer> to a fresh token in the same MULTI: if the
+    key holds the last attempt's token, that attempt landed.
+    """
+    if not trades:
+        return
+    key = f"{COMMIT_KEY_PREFIX}:{consumer}"
+    while True:
+        token = str(next_id())
+        try:
+            await commit_orders(r, {}, trades, marker=(key, token))
+            return
+        except aioredis.RedisError as e:
+            print(f"[engine] Commit failed ({e}), retrying in 1s...")
+        await asyncio.sleep(1)
+        try:
+            if await r.get(key) == token.encode():
+                return
+        except aioredis.RedisError:
+            pass
+
 
-    PUBLISH channel message
-      Delivers message to all current subscribers instantly.
-      Zero persistence — if nobody is subscribed right now, the
-      message is gone. That's fine; we have the hash as a fallback.
+async def commit_orders(
+    r: aioredis.Redis,
+    acks: dict[str, list[str]],
+    trades: list[Trade],
+    changes: list[BookChange] | None = None,
+    levels: list[LevelTotal] | None = None,
+    marker: tuple[str, str] | None = None,
+) -> None:
+    """
+    Everything Redis needs to hear about a set of processed orders, in
+    ONE pipeline:
+
+      ZADD/HSET/ZREM/DEL   book mutations (memory mode only)
+      EVAL level_set       L2 totals of the levels they touched (ditto),
+                           each with its md:stream event
+      XADD + SET           trade tape + mid price (queue_trade), and
+                           their trade / mid events on md:stream
+      PUBLISH              the new mid, for producers' caches (queue_mid)
+      PUBLISH              fills for live subscribers
+      XACK id [id ...]     done with these stream entries (per symbol)
+      SET                  marker: commit_until_landed's token, if given
+
+    The pipeline runs as MULTI/EXEC, so the projection either gets all
+    of it or none of it — and the XACK only lands with the writes.
+    XACK takes any number of IDs, so a whole batch is one command per
+    symbol stream. acks maps symbol → stream IDs (see group_acks).
+    (Lua and redis mode pass no IDs: each entry was acked before it
+    was matched — by the script, or by apply_pending.)
+
+    PUBLISH delivers to whoever is subscribed right now and keeps
+    nothing: a dashboard that wasn't listening catches up from the
+    tape stream instead.
     """
+    if not (any(acks.values()) or trades or changes):
+        return
+
+    pipe = r.pipeline()
+    if changes:
+        queue_book_changes(pipe, changes)
+    for level in levels or ():
+        queue_level_total(pipe, level.symbol, level.side.value, level.price, level.qty)
     for trade in trades:
-        await record_trade(r, trade)
-        payload = json.dumps(trade.to_hash_dict())
-        await r.publish(TRADES_CHANNEL, payload)
-        print(
-            f"[engine] TRADE  {trade.qty:6.1f} @ {trade.price:8.2f}"
-            f"  buyer={trade.buyer_id}  seller={trade.seller_id}"
+        queue_trade(pipe, trade)
+        pipe.publish(keys_for(trade.symbol).trades_channel, json.dumps(trade.to_hash_dict()))
+    for symbol, stream_ids in acks.items():
+        if stream_ids:
+            pipe.xack(keys_for(symbol).stream, CONSUMER_GROUP, *stream_ids)
+    if marker is not None:
+        pipe.set(*marker)
+    await execute_pipeline(r, pipe)
+
+
+def group_acks(batch: list[tuple[str, Message]]) -> dict[str, list[str]]:
+    """[(stream_id, message), ...] → {symbol: [stream_id, ...]} for XACK."""
+    acks: dict[str, list[str]] = {}
+    for stream_id, order in batch:
+        acks.setdefault(order.symbol, []).append(stream_id)
+    return acks
+
+
+# ── Batch processing ─────────────────────────────────────────────
+
+@dataclass
+class MatchedBatch:
+    """
+    A batch between its two halves: matched — the book already reflects
+    it — but not yet committed to Redis. per_order holds each entry's
+    trades; applied / applied_trades are the entries that were actually
+    matched (memory mode skips redeliveries, lua / redis mode leave out
+    entries that failed) and get observed once the commit lands. changes / levels are memory mode's projection writes.
+    """
+    batch: list[tuple[str, Message]]
+    per_order: list[list[Trade]]
+    acks: dict[str, list[str]]
+    matched_at: float
+    changes: list[BookChange] = field(default_factory=list)
+    levels: list[LevelTotal] = field(default_factory=list)
+    applied: list[tuple[str, Message]] | None = None
+    applied_trades: list[list[Trade]] | None = None
+
+    def __post_init__(self) -> None:
+        if self.applied is None:
+            self.applied, self.applied_trades = self.batch, self.per_order
+
+
+async def process_batch(
+    ctx: EngineContext,
+    batch: list[tuple[str, Message]],
+) -> list[list[Trade]]:
+    """
+    Match a whole XREADGROUP batch, then commit it with one pipeline
+    and one multi-ID XACK. Returns the trades for each order.
+
+    Round-trips per batch, by mode:
+      memory — 1    (matching is local; commit_orders does the rest)
+      lua    — 2    (all EVALSHAs pipelined, then commit_orders)
+      redis  — per-order XACK and reads + 1 (matching has to read
+               the book between orders; only the trade writes batch up)
+
+    Orders are still matched strictly in stream order — batching only
+    changes when the results are written, never which trades happen.
+    The two halves are separate so consumer/pipeline.py can overlap
+    one batch's commit with the next one's match.
+    """
+    matched = await match_batch(ctx, batch)
+    await commit_matched(ctx, [matched])
+    return matched.per_order
+
+
+async def match_batch(ctx: EngineContext, batch: list[tuple[str, Message]]) -> MatchedBatch:
+    """
+    First half of process_batch: run every entry through the matcher, in order.
+
+    Lua and redis mode ack each entry as they apply it (inside
+    MATCH_SCRIPT, or apply_pending), so an entry that raises can't fail
+    the whole batch: the others are acked and in the book, and their
+    trades still have to reach commit_matched — nothing would ever
+    retry them. The failure is reported, its entry gets no trades, and
+    the rest of the batch goes on as usual.
+    """
+    if ctx.books is not None:
+        return match_in_memory(ctx, batch)
+
+    if ctx.lua is not None:
+        results = await ctx.lua.match_many(
+            [order for _, order in batch], [stream_id for stream_id, _ in batch],
         )
+    else:
+        results: list[list[Trade] | Exception] = []
+        for stream_id, order in batch:
+            try:
+                results.append(await apply_pending(ctx.r, stream_id, order))
+            except Exception as e:
+                results.append(e)
+
+    per_order: list[list[Trade]] = []
+    applied: list[tuple[str, Message]] = []
+    applied_trades: list[list[Trade]] = []
+    for (stream_id, order), result in zip(batch, results):
+        if isinstance(result, Exception):
+            report_failure(ctx, stream_id, result)
+            per_order.append([])
+        else:
+            per_order.append(result)
+            applied.append((stream_id, order))
+            applied_trades.append(result)
+    # Acked before matching: inside the script, or by apply_pending
+    return MatchedBatch(
+        batch=          batch,
+        per_order=      per_order,
+        acks=           {},
+        matched_at=     time.time(),
+        applied=        applied,
+        applied_trades= applied_trades,
+    )
+
+
+async def commit_matched(ctx: EngineContext, matched: list[MatchedBatch]) -> None:
+    """
+    Second half: commit one or more matched batches, oldest first, as
+    ONE commit_orders pipeline, then mark them applied and observed.
+    Every mode retries until the commit lands: memory mode's books have
+    already moved on (commit_until_acked), and lua and redis mode acked
+    the entries before matching them (commit_until_landed).
+    """
+    acks: dict[str, list[str]] = {}
+    for m in matched:
+        for symbol, stream_ids in m.acks.items():
+            acks.setdefault(symbol, []).extend(stream_ids)
+    trades = [trade for m in matched for order_trades in m.per_order for trade in order_trades]
+
+    if ctx.books is None:
+        await commit_until_landed(ctx.r, ctx.consumer, trades)
+    else:
+        changes = [c for m in matched for c in m.changes]
+        levels = [level for m in matched for level in m.levels]
+        await commit_until_acked(ctx.r, acks, trades, changes, levels)
+        for m in matched:
+            for symbol, stream_ids in group_acks(m.applied).items():
+                ctx.stores[symbol].applied(stream_ids)
+
+    for m in matched:
+        observe_batch(ctx, m.applied, m.applied_trades, m.matched_at)
+
+
+async def settle(ctx: EngineContext) -> None:
+    """
+    Wait until every batch the pipeline has matched is committed.
+    Anything that commits on its own or reads the projection — a
+    reclaim, a snapshot, a resync — does this first, under ctx.lock,
+    so it can't overtake (or miss) a batch still in flight. A no-op
+    outside pipeline mode.
+    """
+    if ctx.commits is not None:
+        await ctx.commits.join()
+
+
+def report_failure(ctx: EngineContext, ids: str, error: Exception) -> None:
+    """Log a failed entry (or range of entries) with its traceback, and count it."""
+    print(f"[engine] ERROR processing {ids}: {error}")
+    traceback.print_exception(error)
+    ctx.metrics.inc("errors_total")
+
+
+async def recover_failed_batch(
+    ctx: EngineContext,
+    batch: list[tuple[str, Message]],
+    error: Exception,
+) -> None:
+    """
+    What every loop does when matching a batch raised. Call under
+    ctx.lock.
+
+    Lua and redis mode XACK each entry as they match it (MATCH_SCRIPT,
+    apply_pending), and match_batch already handles an entry that
+    fails on its own. What gets here is a failure around the matching
+    — a dropped connection, say — so some entries may be acked and in
+    the book, the rest still pending. The batch is run once more
+    straight away: the ack-first check makes the acked ones no-ops and
+    the pending ones are matched now, in order. If that fails too,
+    whatever is still pending is left to autoclaim_loop; whatever was
+    acked is done, trades or not (at most once — see apply_pending).
+
+    Memory mode acks only in the commit, so nothing in the batch was
+    acked — but it can't leave the batch to autoclaim_loop either. The loop goes on reading, later
+    batches commit and move last_id past the failed entries, and when
+    they are reclaimed is_new() would take them for redeliveries and
+    ack them unmatched. So the batch is retried right away, one entry
+    per process_batch, on books resynced from Redis: entries that only
+    shared a batch with the bad one are matched and committed now, in
+    order. An entry that fails on its own is set aside — skip() in its
+    BookStore keeps it new for when autoclaim_loop brings it back —
+    and the books are resynced again before the next one.
+    """
+    ids = batch[0][0] if len(batch) == 1 else f"{batch[0][0]}..{batch[-1][0]}"
+    report_failure(ctx, ids, error)
+    await settle(ctx)
+    if ctx.books is None:
+        try:
+            await process_batch(ctx, batch)
+        except Exception as e:
+            print(f"[engine] ERROR retrying {ids}, leaving what's still pending to autoclaim_loop: {e}")
+            ctx.metrics.inc("errors_total")
+        return
+
+    if len(batch) > 1:
+        await resync_local_books(ctx)
+        for stream_id, message in batch:
+            try:
+                await process_batch(ctx, [(stream_id, message)])
+                continue
+            except Exception as e:
+                print(f"[engine] ERROR processing {stream_id} on its own: {e}")
+                ctx.metrics.inc("errors_total")
+            ctx.stores[message.symbol].skip(stream_id)
+            await resync_local_books(ctx)
+    else:
+        stream_id, message = batch[0]
+        ctx.stores[message.symbol].skip(stream_id)
+        await resync_local_books(ctx)
+
+
+# ── Recovery: snapshot + journal (memory mode) ───────────────────
+
+async def recover_local_book(
+    r: aioredis.Redis,
+    symbol: str = DEFAULT_SYMBOL,
+) -> tuple[LocalBook, BookStore]:
+    """
+    Restore one symbol's book at startup.
+
+      1. mmap the snapshot → book as of its last applied stream ID
+      2. replay the journal on top (replay_journal)
+      3. sanity-check against the projection: if Redis holds a
+         different number of resting orders, something else wrote the
+         book since (another mode, a FLUSHALL) — trust Redis and
+         rebuild from it, as load_local_book always did
+      4. write a fresh snapshot, so the journal starts empty and the
+         next restart is just as short
+
+    Without a snapshot (first run) the book comes from the projection
+    and last_id starts at 0-0: anything still pending was never
+    committed, so it isn't in the projection and must be applied.
+    """
+    store = BookStore(symbol)
+    loaded = store.load()
+    if loaded is not None:
+        book, replay = loaded
+        if replay:
+            await replay_journal(r, book, store, replay)
+        if not await projection_matches(r, book):
+            print(f"[engine] {symbol} snapshot disagrees with Redis, rebuilding from Redis")
+            loaded = None
+
+    if loaded is None:
+        book = await load_local_book(r, symbol)
+        store.last_id = (0, 0)
+    else:
+        await write_depth(r, book)
+
+    store.snapshot(book)
+    return book, store
+
+
+async def replay_journal(
+    r: aioredis.Redis,
+    book: LocalBook,
+    store: BookStore,
+    replay: list[tuple[str, Message]],
+) -> None:
+    """
+    Re-apply journaled entries on top of the snapshot, in order.
+
+    Matching is deterministic, so this reproduces the book exactly.
+    Side effects are committed only for entries still pending in the
+    group — the crash came between journaling and committing them;
+    everything else already reached Redis and its changes are dropped.
+    """
+    stream = keys_for(book.symbol).stream
+    # Not replay[0] / replay[-1]: a set-aside entry is journaled when
+    # it's finally matched, after entries with higher IDs.
+    ids = [stream_id for stream_id, _ in replay]
+    pending = await pending_ids(r, stream, min(ids, key=parse_stream_id), max(ids, key=parse_stream_id))
+    for stream_id, message in replay:
+        trades = book.apply(message)
+        changes, levels = book.drain_changes(), book.drain_levels()
+        if stream_id in pending:
+            await commit_orders(r, {book.symbol: [stream_id]}, trades, changes, levels)
+        store.applied([stream_id])
+    print(
+        f"[engine] Replayed {len(replay)} journaled {book.symbol} entries "
+        f"({len(pending & {stream_id for stream_id, _ in replay})} uncommitted)"
+    )
+
+
+async def projection_matches(r: aioredis.Redis, book: LocalBook) -> bool:
+    """Cheap consistency check: ZCARD bids + ZCARD asks == orders in memory."""
+    keys = keys_for(book.symbol)
+    pipe = r.pipeline(transaction=False)
+    pipe.zcard(keys.bids)
+    pipe.zcard(keys.asks)
+    return sum(await pipe.execute()) == len(book)
+
+
+async def pending_ids(r: aioredis.Redis, stream: str, lo: str, hi: str) -> set[str]:
+    """IDs between lo and hi (inclusive) still pending in our group, any owner."""
+    ids: set[str] = set()
+    start = lo
+    while True:
+        page = await r.xpending_range(stream, CONSUMER_GROUP, min=start, max=hi, count=CLAIM_BATCH)
+        ids.update(entry["message_id"].decode() for entry in page)
+        if len(page) < CLAIM_BATCH:
+            return ids
+        start = "(" + page[-1]["message_id"].decode()
+
+
+async def still_pending(r: aioredis.Redis, acks: dict[str, list[str]]) -> bool:
+    """Is any of these stream entries still unacknowledged?"""
+    for symbol, stream_ids in acks.items():
+        if not stream_ids:
+            continue
+        lo = min(stream_ids, key=parse_stream_id)
+        hi = max(stream_ids, key=parse_stream_id)
+        if await pending_ids(r, keys_for(symbol).stream, lo, hi) & set(stream_ids):
+            return True
+    return False
+
+
+async def maybe_snapshot(ctx: EngineContext, interval: float = SNAPSHOT_INTERVAL) -> None:
+    """Snapshot every book if `interval` seconds have passed since the last one."""
+    if ctx.stores is None or time.monotonic() - ctx.snapshot_at < interval:
+        return
+    async with ctx.lock:
+        await settle(ctx)
+        for symbol, store in ctx.stores.items():
+            store.snapshot(ctx.books[symbol])
+    ctx.snapshot_at = time.monotonic()
+
+
+# ── Failover: reclaiming other consumers' work ───────────────────
+
+async def autoclaim_loop(
+    ctx: EngineContext,
+    min_idle_ms: int = CLAIM_MIN_IDLE_MS,
+    interval: float = CLAIM_INTERVAL,
+) -> None:
+    """
+    Background task: adopt entries a crashed consumer never finished.
+
+    Every entry XREADGROUP hands out sits in the group's PEL, owned by
+    that consumer, until it's XACKed. If the consumer dies, its entries
+    sit there forever — nobody else will be given them.
+
+    XAUTOCLAIM orders:stream book-engine <me> <min-idle-ms> <cursor> COUNT n
+
+    transfers ownership of up to n PEL entries that have been idle for
+    at least min-idle-ms (whoever owned them) to us, and returns them.
+    We run them through process_batch like freshly read entries. The
+    returned cursor lets us sweep the PEL incrementally; "0-0" means
+    the sweep wrapped around, so we sleep before the next pass.
+
+    min_idle_ms must comfortably exceed normal processing time —
+    otherwise we'd steal entries from consumers that are merely busy.
+    Even then, lua and redis mode are safe: both XACK an entry before
+    matching it and skip one that is already acked (MATCH_SCRIPT,
+    apply_pending). Memory mode skips entries its BookStore has
+    already applied.
+
+    Entries that were trimmed out of the stream (MAXLEN) while pending
+    come back as "deleted" — there's nothing left to process, so we
+    just XACK them to clear the PEL.
+
+    Each symbol's stream has its own PEL, so each pass sweeps them in
+    turn, with one cursor per stream.
+    """
+    while True:
+        for symbol in ctx.symbols:
+            await autoclaim_stream(ctx, keys_for(symbol).stream, min_idle_ms)
+            await prune_idle_consumers(ctx, keys_for(symbol).stream, min_idle_ms * 10)
+        await asyncio.sleep(interval)
+
+
+async def autoclaim_stream(ctx: EngineContext, stream: str, min_idle_ms: int) -> None:
+    """One full XAUTOCLAIM sweep of one stream's PEL (see autoclaim_loop)."""
+    cursor = "0-0"
+    while True:
+        try:
+            cursor, claimed, *rest = await ctx.r.xautoclaim(
+                stream, CONSUMER_GROUP, ctx.consumer,
+                min_idle_time=min_idle_ms, start_id=cursor, count=CLAIM_BATCH,
+            )
+            deleted = list(rest[0]) if rest else []
+            deleted += [stream_id for stream_id, fields in claimed if fields is None]
+            if deleted:
+                await ctx.r.xack(stream, CONSUMER_GROUP, *deleted)
+        except aioredis.ConnectionError:
+            await asyncio.sleep(1)
+            continue
+
+        batch = decode_entries([e for e in claimed if e[1] is not None])
+        if batch:
+            print(f"[engine] Reclaimed {len(batch)} idle entries on '{stream}' starting at {batch[0][0]}")
+            ctx.metrics.inc("reclaimed_total", len(batch))
+            async with ctx.lock:
+                try:
+                    await settle(ctx)
+                    await process_batch(ctx, batch)
+                except Exception as e:
+                    await recover_failed_batch(ctx, batch, e)
+
+        if cursor in (b"0-0", "0-0"):
+            return
+
+
+async def prune_idle_consumers(ctx: EngineContext, stream: str, idle_ms: int) -> None:
+    """
+    XGROUP DELCONSUMER consumers that own nothing and have been idle
+    for idle_ms. Each engine process has its own consumer name, so
+    without this every restart would leave a dead name in XINFO.
+    Only consumers with zero pending entries are removed — deleting
+    one with pending entries would drop those entries from the PEL.
+    """
+    try:
+        for consumer in await ctx.r.xinfo_consumers(stream, CONSUMER_GROUP):
+            name = consumer["name"].decode()
+            if name != ctx.consumer and consumer["pending"] == 0 and consumer["idle"] > idle_ms:
+                await ctx.r.xgroup_delconsumer(stream, CONSUMER_GROUP, name)
+    except aioredis.ConnectionError:
+        pass
+
+
+# ── Instrumentation ──────────────────────────────────────────────
+
+# Histogram name → what it measures (see the stage diagram in src/metrics.py)
+LATENCY_STAGES = {
+    "publish_latency_us":    "Producer timestamp to stream entry (XADD), microseconds.",
+    "match_latency_us":      "Stream entry to match complete (queueing + matching), microseconds.",
+    "commit_latency_us":     "Match complete to trades published (commit pipeline), microseconds.",
+    "end_to_end_latency_us": "Producer timestamp to trades published, microseconds.",
+}
+
+
+def observe_batch(
+    ctx: EngineContext,
+    batch: list[tuple[str, Message]],
+    per_order: list[list[Trade]],
+    matched_at: float,
+) -> None:
+    """
+    Record a committed batch: latency per stage for every order,
+    counters, and the (sampled) per-trade / per-rest log lines.
+    matched_at is the wall-clock time matching finished; "now" is when
+    the commit — and with it the trade PUBLISH — completed.
+    """
+    published_at = time.time()
+    m = ctx.metrics
+    publish, match, commit, end_to_end = (
+        m.histogram(name, help) for name, help in LATENCY_STAGES.items()
+    )
+    commit_us = (published_at - matched_at) * 1e6
+    for (stream_id, order), trades in zip(batch, per_order):
+        added_at = parse_stream_id(stream_id)[0] / 1000
+        publish.record((added_at - order.timestamp) * 1e6)
+        match.record((matched_at - added_at) * 1e6)
+        commit.record(commit_us)
+        end_to_end.record((published_at - order.timestamp) * 1e6)
+
+        for trade in trades:
+            ctx.log.event(
+                "trade", symbol=trade.symbol, qty=trade.qty, price=trade.price,
+                buyer=trade.buyer_id, seller=trade.seller_id,
+            )
+        if isinstance(order, CancelReplace):
+            ctx.log.event(
+                order.type.value, symbol=order.symbol, trader=order.trader_id,
+                cancels=len(order.cancel_ids), legs=len(order.orders),
+            )
+            m.inc("cancel_requests_total", len(order.cancel_ids))
+        elif not trades:
+            ctx.log.event(
+                "rested", symbol=order.symbol, side=order.side.value, qty=order.qty,
+                price=order.price, trader=order.trader_id,
+            )
+        m.inc("trades_total", len(trades))
+    m.inc("orders_total", len(batch))
+    m.inc("batches_total")
+
+
+async def metrics_loop(ctx: EngineContext, interval: float = METRICS_INTERVAL) -> None:
+    """
+    Background task: every `interval` seconds refresh the gauges that
+    need a Redis round-trip (PEL size, group lag), export everything,
+    and log one summary line — instead of a print every 50 orders.
+    """
+    streams = [keys_for(symbol).stream for symbol in ctx.symbols]
+    while True:
+        await asyncio.sleep(interval)
+        await export_metrics(ctx, streams)
+
+
+async def export_metrics(ctx: EngineContext, streams: list[str]) -> None:
+    m = ctx.metrics
+    try:
+        pending = [await ctx.r.xpending(stream, CONSUMER_GROUP) for stream in streams]
+        m.set("pel_pending", sum(p["pending"] for p in pending))
+        m.set("stream_lag", await group_lag(ctx.r, streams))
+        if ctx.books is not None:
+            m.set("resting_orders", sum(map(len, ctx.books.values())))
+        await m.export(ctx.r)
+    except aioredis.ConnectionError:
+        pass
+
+    e2e = m.histograms.get("end_to_end_latency_us")
+    ctx.log.write(
+        "stats",
+        orders=m.counters.get("orders_total", 0),
+        trades=m.counters.get("trades_total", 0),
+        pel=m.gauges.get("pel_pending"),
+        lag=m.gauges.get("stream_lag"),
+        e2e_p50_us=e2e.percentile(0.5) if e2e else None,
+        e2e_p99_us=e2e.percentile(0.99) if e2e else None,
+    )
+    ctx.log.flush()
 
 
 # ── Main engine loop ─────────────────────────────────────────────
 
-async def run_engine() -> None:
+async def run_engine(
+    mode: str = ENGINE_MODE,
+    batch_max: int = ENGINE_BATCH_MAX,
+    consumer: str = CONSUMER_NAME,
+    symbols: Sequence[str] = SYMBOLS,
+    pipeline_depth: int = ENGINE_PIPELINE_DEPTH,
+) -> None:
     """
     The main engine loop.
 
@@ -320,44 +1230,125 @@ async def run_engine() -> None:
     XACK is always called — even if matching produced no trades.
     This tells Redis "I have fully processed this message, remove
     it from my PEL." If we crash before XACK, the message stays
-    in the PEL and will be redelivered on restart.
+    in the PEL, and autoclaim_loop in any surviving (or restarted)
+    engine picks it up once it has been idle long enough.
+
+    In memory mode, steps 2-3 collapse into commit_orders: one pipeline
+    carries the trade records, PUBLISHes and XACK. Lua and redis mode
+    XACK first instead (MATCH_SCRIPT, apply_pending): their matching
+    writes the book directly, so it must never run twice for one entry.
+    Their trades then go out in a commit_orders pipeline of their own,
+    retried until it lands (commit_until_landed).
+
+    batch_max > 0 switches to batch mode (run_batches): up to that
+    many entries per read, one commit pipeline + one XACK per batch.
+    pipeline_depth > 0 on top of that runs reading, matching and
+    committing as overlapping stages (consumer/pipeline.py).
+
+    Nothing is printed per order: trades and rests go to a sampled
+    JSON log, and latency/throughput numbers to metrics_loop's exports.
+
+    symbols are the instruments this engine owns — it reads their
+    streams and nobody else's (see consumer/router.py for sharding).
     """
-    r = get_async_redis()
-    await ensure_consumer_group(r)
+    if mode not in ("redis", "memory", "lua"):
+        raise ValueError(
+            f"unknown ENGINE_MODE {mode!r} (expected 'redis', 'memory' or 'lua')"
+        )
+    if pipeline_depth > 0 and batch_max <= 0:
+        raise ValueError("ENGINE_PIPELINE_DEPTH needs batch mode (ENGINE_BATCH_MAX > 0)")
 
-    print(f"[engine] Listening on '{STREAM_KEY}'...")
-    print(f"[engine] Consumer group: '{CONSUMER_GROUP}' / '{CONSUMER_NAME}'")
+    r = get_async_redis()
+    await ensure_consumer_group(r, symbols)
+    await load_depth_scripts(r)
+    ctx = EngineContext(r, consumer, list(symbols))
+
+    if mode == "memory":
+        ctx.books, ctx.stores = {}, {}
+        for symbol in symbols:
+            book, store = await recover_local_book(r, symbol)
+            ctx.books[symbol], ctx.stores[symbol] = book, store
+            print(
+                f"[engine] Loaded {len(book)} resting {symbol} orders into memory "
+                f"(last applied {format_stream_id(store.last_id)})"
+            )
+            # Whatever the previous run read but never committed is
+            # older than anything '>' will deliver — adopt it first so
+            # each book keeps applying its stream in order.
+            await autoclaim_stream(ctx, keys_for(symbol).stream, 0)
+
+    if mode == "lua":
+        ctx.lua = LuaMatcher(r)
+        print(f"[engine] Loaded match script, sha={await ctx.lua.load()}")
+
+    streams = ", ".join(keys_for(symbol).stream for symbol in symbols)
+    print(f"[engine] Listening on '{streams}' (mode={mode})...")
+    print(f"[engine] Consumer group: '{CONSUMER_GROUP}' / '{consumer}'")
+    profiler = SamplingProfiler(consumer)
+    hint = f"kill -USR1 {os.getpid()} or " if install_signal(profiler) else ""
+    print(f"[engine] Profile on demand: {hint}PUBLISH {PROFILE_CHANNEL}:{consumer} <seconds>")
     print()
 
-    orders_processed = 0
-    trades_executed  = 0
-
-    async for stream_id, order in order_stream(r):
-        try:
-            trades = await match_order(r, order)
-
-            if trades:
-                await publish_trades(r, trades)
-                trades_executed += len(trades)
+    claimer = asyncio.create_task(autoclaim_loop(ctx))
+    reporter = asyncio.create_task(metrics_loop(ctx))
+    listener = asyncio.create_task(listen_for_requests(profiler, consumer))
+    try:
+        if batch_max > 0:
+            sizer = AdaptiveBatchSize(min(ENGINE_BATCH_MIN, batch_max), batch_max)
+            print(f"[engine] Batch mode: {sizer.minimum}..{sizer.maximum} entries per read")
+            if pipeline_depth > 0:
+                from src.consumer.pipeline import run_pipelined   # imports this module
+                print(f"[engine] Pipelined: up to {pipeline_depth} batches queued per stage")
+                await run_pipelined(ctx, sizer, pipeline_depth)
             else:
-                side_str = "BID" if order.side == Side.BID else "ASK"
-                price_str = f"{order.price:.2f}" if order.price else "MARKET"
-                print(
-                    f"[engine] RESTED {side_str:3s}  {order.qty:6.1f} @ {price_str:>8}"
-                    f"  trader={order.trader_id}"
-                )
-
-            # ✅ Acknowledge — removes from PEL
-            await r.xack(STREAM_KEY, CONSUMER_GROUP, stream_id)
-            orders_processed += 1
-
-            if orders_processed % 50 == 0:
-                print(
-                    f"[engine] --- {orders_processed} orders processed, "
-                    f"{trades_executed} trades executed ---"
-                )
-
-        except Exception as e:
-            # Don't XACK on error — message stays in PEL for retry
-            print(f"[engine] ERROR processing {stream_id}: {e}")
-            import traceback; traceback.print_exc()
+                await run_batches(ctx, sizer)
+        else:
+            await run_per_order(ctx)
+    finally:
+        claimer.cancel()
+        reporter.cancel()
+        listener.cancel()
+        ctx.log.flush()
+        for store in (ctx.stores or {}).values():
+            store.close()
+
+
+async def run_per_order(ctx: EngineContext) -> None:
+    """Per-order main loop: match, publish and XACK each entry in turn."""
+    r = ctx.r
+
+    async for stream_id, order in order_stream(r, ctx.consumer, ctx.symbols):
+        async with ctx.lock:
+            try:
+                if ctx.books is not None:
+                    await process_batch(ctx, [(stream_id, order)])
+                else:
+                    # ✅ Acknowledged before matching — inside the script, or by apply_pending
+                    if ctx.lua is not None:
+                        trades = await ctx.lua.match(order, stream_id)
+                    else:
+                        trades = await apply_pending(r, stream_id, order)
+                    matched_at = time.time()
+                    await commit_until_landed(r, ctx.consumer, trades)
+                    observe_batch(ctx, [(stream_id, order)], [trades], matched_at)
+            except Exception as e:
+                # Memory mode hasn't XACKed it; lua / redis mode may have — see there
+                await recover_failed_batch(ctx, [(stream_id, order)], e)
+                continue
+
+        await maybe_snapshot(ctx)
+
+
+async def run_batches(ctx: EngineContext, sizer: AdaptiveBatchSize) -> None:
+    """Batch-mode main loop: one process_batch call per XREADGROUP reply."""
+    async for batch in order_batches(ctx.r, sizer, ctx.consumer, ctx.symbols):
+        async with ctx.lock:
+            try:
+                await process_batch(ctx, batch)
+            except Exception as e:
+                # Acked or not depends on the mode — see recover_failed_batch
+                await recover_failed_batch(ctx, batch, e)
+                continue
+
+        ctx.metrics.set("batch_size", sizer.size)
+        await maybe_snapshot(ctx)
@@ -0,0 +1,338 @@
+"""
+In-process order book — the matching engine's source of truth.
+
+WHY KEEP THE BOOK IN PYTHON MEMORY?
+────────────────────────────────────
+The Redis-backed matcher (engine.match_order) asks Redis for every
+crossable order, then issues one HGETALL per candidate, then sorts the
+candidates in Python. Every incoming order costs O(book size) network
+round trips — a few hundred orders/sec at best.
+
+Here the book lives in process memory, laid out the way real exchange
+engines do it:
+
+  side → sorted list of prices           (bisect: O(log L) to find a level)
+  side → {price: {order_id: Order}}      (FIFO queue per level = time priority)
+  order_id → Order                       (index for lookups and cancels)
+
+Prices are ticks and quantities lots (models: "Why integers for price
+and qty?"), so a level is found by exact key and "filled" means qty
+== 0 — no epsilon anywhere.
+
+Matching walks levels best-first and takes orders off the front of
+each queue. No network, no sorting — price priority comes from the
+sorted price list, time priority from the queue order.
+
+WHY IS A LEVEL'S QUEUE A DICT?
+───────────────────────────────
+Python dicts keep insertion order, so iterating one front-to-back is
+exactly FIFO — and unlike a deque, deleting a member from the middle
+is O(1). The index gives a cancel the order's side and price (its
+level), the level dict gives its queue slot: a cancel costs the same
+whether it's first in line or ten-thousandth. Market makers cancel
+nearly everything they quote, so this is the common case, not an
+edge case.
+
+REDIS BECOMES A PROJECTION
+───────────────────────────
+Every mutation (rest, partial fill, removal) is appended to a pending
+change list. The engine drains it after matching and replays it into
+book:bids / book:asks / order:* in one pipeline (book.queue_book_changes).
+That's a write-behind cache in reverse: memory is authoritative, Redis
+is the durable, queryable copy the dashboard and producers read.
+
+The L2 depth keys (consumer/depth.py) are projected the same way: the
+book remembers which levels a batch touched, and drain_levels() hands
+over each one's exact current total.
+
+On startup the engine restores the book from its own snapshot + journal
+(consumer/persistence.py), or, if it has none, rebuilds it from that
+projection (book.load_resting_orders), so a restart doesn't lose
+resting orders.
+"""
+
+from __future__ import annotations
+
+import bisect
+from dataclasses import dataclass
+from enum import StrEnum
+from typing import Iterator
+
+from src.config import DEFAULT_SYMBOL
+from src.models import CancelReplace, Message, Order, OrderType, Side, Trade
+
+
+class ChangeKind(StrEnum):
+    ADD    = "add"      # order now rests in the book → ZADD + HSET
+    UPDATE = "update"   # resting order partially filled → HSET qty
+    REMOVE = "remove"   # resting order fully filled → ZREM + DEL
+
+
+@dataclass(frozen=True, slots=True)
+class BookChange:
+    """
+    One mutation to replay into Redis. `order` is the live book entry,
+    not a copy, so it says which order and where it rests — but its
+    qty belongs to whenever the change is replayed, and with the
+    pipeline (consumer/pipeline.py) the next batch may have filled it
+    further by then. `qty` is the order's remaining lots when the
+    change happened, and that is what gets written: each commit leaves
+    Redis where memory was after *its* batch, never a state in between.
+    """
+    kind: ChangeKind
+    order: Order
+    qty: int
+
+
+@dataclass(frozen=True, slots=True)
+class LevelTotal:
+    """A touched price level's total resting lots after a batch (0 = level gone)."""
+    symbol: str
+    side: Side
+    price: int
+    qty: int
+
+
+class LocalBook:
+    """One instrument's book. A multi-symbol engine keeps one per symbol."""
+
+    def __init__(self, symbol: str = DEFAULT_SYMBOL) -> None:
+        self.symbol = symbol
+        # Ascending price lists. Best ask = asks[0], best bid = bids[-1].
+        self._prices: dict[Side, list[int]] = {Side.BID: [], Side.ASK: []}
+        self._levels: dict[Side, dict[int, dict[int, Order]]] = {
+            Side.BID: {},
+            Side.ASK: {},
+        }
+        self._orders: dict[int, Order] = {}
+        self._changes: list[BookChange] = []
+        self._touched: dict[tuple[Side, int], None] = {}   # a set, in first-touch order
+
+    # ── Queries ──────────────────────────────────────────────────
+
+    def __len__(self) -> int:
+        return len(self._orders)
+
+    def __contains__(self, order_id: int) -> bool:
+        return order_id in self._orders
+
+    def get(self, order_id: int) -> Order | None:
+        return self._orders.get(order_id)
+
+    def best_bid(self) -> int | None:
+        prices = self._prices[Side.BID]
+        return prices[-1] if prices else None
+
+    def best_ask(self) -> int | None:
+        prices = self._prices[Side.ASK]
+        return prices[0] if prices else None
+
+    def level_qty(self, side: Side, price: int) -> int:
+        """Total resting lots at one price (0 if the level doesn't exist)."""
+        return sum(o.qty for o in self._levels[side].get(price, {}).values())
+
+    def depth(self, side: Side) -> list[tuple[int, int]]:
+        """Every level on one side as (price, total_qty), ascending price."""
+        return [(price, self.level_qty(side, price)) for price in self._prices[side]]
+
+    def resting(self, side: Side) -> Iterator[Order]:
+        """
+        Every order on one side: ascending price, queue order within a
+        level. restore() of exactly this sequence rebuilds identical
+        queues — what persistence.BookStore snapshots rely on.
+        """
+        for price in self._prices[side]:
+            yield from self._levels[side][price].values()
+
+    # ── Mutations ────────────────────────────────────────────────
+
+    def restore(self, orders: list[Order]) -> None:
+        """
+        Load resting orders without recording changes — they are
+        already in Redis. Orders must arrive in time priority order
+        (load_resting_orders sorts them by timestamp).
+        """
+        for order in orders:
+            if order.price is not None:
+                self._insert(order)
+
+    def reload(self, orders: list[Order]) -> None:
+        """Throw away all state and restore() from scratch (resync after errors)."""
+        self.__init__(self.symbol)
+        self.restore(orders)
+
+    def add(self, order: Order) -> None:
+        """
+        Rest a limit order at the back of its price level's queue. The
+        book keeps this very object and fills decrement its qty.
+        """
+        if order.price is None:
+            return  # market orders never rest
+        self._insert(order)
+        self._changes.append(BookChange(ChangeKind.ADD, order, order.qty))
+        self._touched[(order.side, order.price)] = None
+
+    def remove(self, order_id: int) -> Order | None:
+        """Take an order out of the book (cancel), in O(1). No-op if unknown."""
+        resting = self._orders.pop(order_id, None)
+        if resting is None:
+            return None
+        level = self._levels[resting.side][resting.price]
+        del level[order_id]
+        if not level:
+            self._drop_level(resting.side, resting.price)
+        self._changes.append(BookChange(ChangeKind.REMOVE, resting, 0))
+        self._touched[(resting.side, resting.price)] = None
+        return resting
+
+    def apply(self, message: Message) -> list[Trade]:
+        """One stream entry: match an Order, or run a CancelReplace."""
+        if isinstance(message, CancelReplace):
+            return self.cancel_replace(message)
+        return self.match(message)
+
+    def cancel_replace(self, message: CancelReplace) -> list[Trade]:
+        """
+        Remove the message's cancel_ids (only the sender's own resting
+        orders), then match its new legs in order. Returns the legs'
+        trades. Nothing can interleave between the two steps — the
+        engine applies one stream entry at a time.
+        """
+        for order_id in message.cancel_ids:
+            resting = self._orders.get(order_id)
+            if resting is not None and resting.trader_id == message.trader_id:
+                self.remove(order_id)
+        trades: list[Trade] = []
+        for order in message.orders:
+            trades.extend(self.match(order))
+        return trades
+
+    def match(self, incoming: Order) -> list[Trade]:
+        """
+        Match an incoming order against the opposite side.
+
+        Same semantics as engine.match_order — price-time priority,
+        maker-price fills, self-trade prevention, LIMIT remainders rest,
+        MARKET remainders are dropped — but with zero I/O.
+
+        Level walk: asks are stored ascending, so a BID walks the ask
+        list upward from index 0; bids are also ascending, so an ASK
+        walks the bid list downward from the end. Emptied levels are
+        deleted as we go, which is why the ask walk only advances the
+        index when a level survives.
+
+        A LIMIT remainder rests as `incoming` itself, qty cut to what's
+        left — the caller's Order becomes the book's.
+        """
+        trades: list[Trade] = []
+        remaining = incoming.qty
+        opposite = Side.ASK if incoming.side == Side.BID else Side.BID
+        prices = self._prices[opposite]
+        levels = self._levels[opposite]
+
+        i = 0 if opposite == Side.ASK else len(prices) - 1
+        while remaining and 0 <= i < len(prices):
+            price = prices[i]
+            if incoming.price is not None:
+                if opposite == Side.ASK and price > incoming.price:
+                    break
+                if opposite == Side.BID and price < incoming.price:
+                    break
+
+            remaining = self._fill_level(incoming, levels[price], remaining, trades)
+
+            if levels[price]:
+                # Level survives: either we're done, or only our own
+                # orders are left here (STP) — step to the next level.
+                i = i + 1 if opposite == Side.ASK else i - 1
+            else:
+                self._drop_level(opposite, price)
+                if opposite == Side.BID:
+                    i -= 1
+
+        if remaining and incoming.order_type == OrderType.LIMIT:
+            incoming.qty = remaining
+            self.add(incoming)
+
+        return trades
+
+    def drain_changes(self) -> list[BookChange]:
+        """Hand the pending mutations to the Redis projection and reset."""
+        changes, self._changes = self._changes, []
+        return changes
+
+    def drain_levels(self) -> list[LevelTotal]:
+        """
+        Current totals of every level touched since the last drain, in
+        the order they were first touched — not hash order, so the md
+        events they become are the same on every run. Summing the level's queue costs O(orders at that price), but
+        only for levels that changed, and overwriting Redis with the
+        total means the copy there can't drift even if a delta is lost.
+        """
+        levels = [
+            LevelTotal(self.symbol, side, price, self.level_qty(side, price))
+            for side, price in self._touched
+        ]
+        self._touched.clear()
+        return levels
+
+    # ── Internals ────────────────────────────────────────────────
+
+    def _fill_level(
+        self,
+        incoming: Order,
+        level: dict[int, Order],
+        remaining: int,
+        trades: list[Trade],
+    ) -> int:
+        """
+        Consume one price level front-to-back. Returns the unfilled qty.
+
+        Orders from the incoming trader are skipped (STP) and simply keep
+        their queue position. Filled orders are deleted after the walk —
+        a dict can't change size while it's being iterated.
+        """
+        filled: list[int] = []
+
+        for resting in level.values():
+            if not remaining:
+                break
+            if resting.trader_id == incoming.trader_id:
+                continue
+
+            fill_qty = min(remaining, resting.qty)
+            # Trades clear at the resting/maker price.
+            if incoming.side == Side.BID:
+                trades.append(Trade.create(incoming, resting, fill_qty, resting.price))
+            else:
+                trades.append(Trade.create(resting, incoming, fill_qty, resting.price))
+
+            remaining -= fill_qty
+            resting.qty -= fill_qty
+            self._touched[(resting.side, resting.price)] = None
+
+            if not resting.qty:
+                filled.append(resting.order_id)
+                del self._orders[resting.order_id]
+                self._changes.append(BookChange(ChangeKind.REMOVE, resting, 0))
+            else:
+                self._changes.append(BookChange(ChangeKind.UPDATE, resting, resting.qty))
+
+        for order_id in filled:
+            del level[order_id]
+        return remaining
+
+    def _insert(self, resting: Order) -> None:
+        levels = self._levels[resting.side]
+        level = levels.get(resting.price)
+        if level is None:
+            level = levels[resting.price] = {}
+            bisect.insort(self._prices[resting.side], resting.price)
+        level[resting.order_id] = resting
+        self._orders[resting.order_id] = resting
+
+    def _drop_level(self, side: Side, price: int) -> None:
+        del self._levels[side][price]
+        prices = self._prices[side]
+        del prices[bisect.bisect_left(prices, price)]
+
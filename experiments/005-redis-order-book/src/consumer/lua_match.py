@@ -0,0 +1,312 @@
+"""
+Server-side matching — the whole match runs inside Redis as a Lua script.
+
+WHY LUA?
+─────────
+match_order in engine.py is a conversation: ZRANGEBYSCORE, then an
+HGETALL per candidate, then a ZREM/DEL or HSET per fill, then ZADD +
+HSET for the remainder. Each step is a separate await, and between
+any two of them another client can change the book. Two engines
+running that code side by side can both "fill" the same resting order.
+
+Redis runs a Lua script atomically: no other command executes until
+the script returns. So we ship the matching loop to the data instead
+of pulling the data to the loop:
+
+  EVALSHA <sha> 8 <bids> <asks> <stream> <depth keys...> <md> <cancel ids...> <order fields...>
+    → walks crossable levels best-first
+    → fills orders in time priority (sorted by timestamp per level)
+    → rewrites qty on partial fills, ZREM + deletes the record on full
+      fills (records per BOOK_LAYOUT — book.ORDER_RECORD_LUA)
+    → ZADD + writes a record for any LIMIT remainder
+    → keeps both sides' L2 depth in step and appends each level
+      change to md:stream (depth.LEVEL_DELTA_LUA)
+    → returns the fills
+
+One round-trip per order, and the book is never observed half-updated
+— which is exactly what you need once several engines share a book.
+
+CANCEL AND REPLACE
+───────────────────
+A CancelReplace entry goes through the same script: it first pulls
+each listed order that still rests and belongs to the sender (side
+and price from ZSCORE, remaining qty from its record —
+book.CANCEL_OWN_LUA), then
+matches the new legs one after another, returning one fill list per
+leg. A plain order is just the case with no cancels and one leg. So
+a market maker's requote — two cancels, two new quotes — is one
+atomic step, acked once.
+
+EXACTLY-ONCE PER STREAM ENTRY
+──────────────────────────────
+When the caller passes the order's stream ID, the script XACKs it
+first and bails out if XACK returns 0 — the entry was already
+processed. With several engines and XAUTOCLAIM, the same entry can be
+delivered twice (the first consumer stalled, not crashed). Because the
+ack and the match are one atomic unit, the second delivery is a no-op
+instead of a double fill.
+
+SCRIPT LOAD + EVALSHA
+──────────────────────
+SCRIPT LOAD caches the script server-side and returns its SHA1. From
+then on we send only the 40-char hash instead of the script body.
+If Redis restarts (or SCRIPT FLUSH runs) the cache is gone and EVALSHA
+fails with NOSCRIPT — we just load it again and retry.
+
+INTEGER ARITHMETIC
+───────────────────
+Prices arrive as ticks and quantities as lots (models: "Why integers
+for price and qty?"). Lua 5.1 numbers are doubles, which hold every
+integer up to 2^53 exactly, so `remaining - fill` never leaves dust
+and "filled" is a plain `==`. Quantities go back into Redis through
+string.format("%d"), never tostring, which would switch to
+exponent notation past 1e14.
+
+The record keys (order:<id>, or a level's hash) are built inside the
+script from a prefix rather than passed in KEYS. That's fine on a
+single Redis node; a Redis Cluster would need every touched key
+declared (and co-located).
+"""
+
+from __future__ import annotations
+
+import redis.asyncio as aioredis
+from redis.exceptions import NoScriptError
+
+from src.config import CONSUMER_GROUP, keys_for
+from src.consumer.book import CANCEL_OWN_LUA, ORDER_RECORD_LUA, record_base
+from src.consumer.depth import LEVEL_DELTA_LUA
+from src.models import CancelReplace, Message, Order, Side, Trade, next_id
+
+
+MATCH_SCRIPT = LEVEL_DELTA_LUA + ORDER_RECORD_LUA + CANCEL_OWN_LUA + """
+-- KEYS: bids, asks, stream, bid depth, bid levels, ask depth, ask levels, md stream
+local base      = ARGV[1]
+local group     = ARGV[2]
+local stream_id = ARGV[3]
+local symbol    = ARGV[4]
+local trader    = ARGV[5]
+local md        = KEYS[8]
+local n_cancel  = tonumber(ARGV[6])
+
+if stream_id ~= "" and redis.call("XACK", KEYS[3], group, stream_id) == 0 then
+  return false  -- already processed by someone else
+end
+
+local function match(order_id, side, otype, price_raw, qty_raw, ts)
+  local is_bid = side == "bid"
+  local opp_side = is_bid and "ask" or "bid"
+  local opp_key, own_key, opp_depth, opp_levels, own_depth, own_levels
+  if is_bid then
+    opp_key, own_key = KEYS[2], KEYS[1]
+    opp_depth, opp_levels, own_depth, own_levels = KEYS[6], KEYS[7], KEYS[4], KEYS[5]
+  else
+    opp_key, own_key = KEYS[1], KEYS[2]
+    opp_depth, opp_levels, own_depth, own_levels = KEYS[4], KEYS[5], KEYS[6], KEYS[7]
+  end
+  local limit = nil
+  if price_raw ~= "market" then limit = price_raw end
+  local remaining = tonumber(qty_raw)
+
+  local fills  = {}
+  local cursor = nil  -- last level visited; the next search excludes it
+
+  while remaining > 0 do
+    -- Next best crossable level on the opposite side.
+    local lvl
+    if is_bid then
+      local lo = cursor and ("(" .. cursor) or "-inf"
+      lvl = redis.call("ZRANGEBYSCORE", opp_key, lo, limit or "+inf",
+                       "WITHSCORES", "LIMIT", 0, 1)
+    else
+      local hi = cursor and ("(" .. cursor) or "+inf"
+      lvl = redis.call("ZREVRANGEBYSCORE", opp_key, hi, limit or "-inf",
+                       "WITHSCORES", "LIMIT", 0, 1)
+    end
+    if #lvl == 0 then break end
+    local level_price = lvl[2]
+
+    -- Every order at that price, in time priority.
+    local queue = level_queue(base, opp_side, level_price, opp_key)
+    table.sort(queue, function(a, b) return tonumber(a.ts) < tonumber(b.ts) end)
+
+    for _, o in ipairs(queue) do
+      if remaining == 0 then break end
+      if o.trader ~= trader then  -- self-trade prevention
+        local fill = math.min(remaining, o.qty)
+        remaining = remaining - fill
+        if fill == o.qty then
+          redis.call("ZREM", opp_key, o.id)
+          order_del(base, opp_side, level_price, o.id)
+        else
+          order_set_qty(base, opp_side, level_price, o.id, string.format("%d", o.qty - fill), o.trader, o.ts)
+        end
+        level_delta(opp_depth, opp_levels, md, opp_side, level_price, string.format("%d", -fill))
+        table.insert(fills, {o.id, o.trader, level_price, string.format("%d", fill), o.ts})
+      end
+    end
+
+    cursor = level_price
+  end
+
+  if remaining > 0 and otype == "limit" then
+    local qty = qty_raw
+    if #fills > 0 then qty = string.format("%d", remaining) end
+    redis.call("ZADD", own_key, limit, order_id)
+    order_put(base, side, price_raw, order_id, qty, trader, ts, symbol)
+    level_delta(own_depth, own_levels, md, side, price_raw, qty)
+  end
+
+  return fills
+end
+
+-- CANCEL / REPLACE: the cancels first, then the new legs, all in this one call.
+for i = 7, 6 + n_cancel do
+  cancel_own(base, md, trader, ARGV[i], KEYS[1], KEYS[2], KEYS[4], KEYS[5], KEYS[6], KEYS[7])
+end
+
+local replies = {}
+for i = 7 + n_cancel, #ARGV, 6 do
+  table.insert(replies, match(ARGV[i], ARGV[i + 1], ARGV[i + 2], ARGV[i + 3], ARGV[i + 4], ARGV[i + 5]))
+end
+return replies
+"""
+
+
+class LuaMatcher:
+    """Runs MATCH_SCRIPT via EVALSHA, reloading it if Redis forgot it."""
+
+    def __init__(self, r: aioredis.Redis):
+        self.r = r
+        self.sha: str | None = None
+
+    async def load(self) -> str:
+        """SCRIPT LOAD — cache the script server-side, remember its SHA1."""
+        self.sha = await self.r.script_load(MATCH_SCRIPT)
+        return self.sha
+
+    async def match(self, incoming: Message, stream_id: str = "") -> list[Trade]:
+        """
+        Match one order (or run one CancelReplace) atomically inside
+        Redis. Returns the trades.
+
+        With a stream_id the script also XACKs that entry (see module
+        docstring); the caller must not XACK it again.
+        """
+        if self.sha is None:
+            await self.load()
+        try:
+            reply = await self.r.evalsha(self.sha, *script_args(incoming, stream_id))
+        except NoScriptError:
+            await self.load()
+            reply = await self.r.evalsha(self.sha, *script_args(incoming, stream_id))
+        return trades_from_reply(incoming, reply)
+
+    async def match_many(
+        self,
+        orders: list[Message],
+        stream_ids: list[str] | None = None,
+    ) -> list[list[Trade] | Exception]:
+        """
+        Match a batch with all EVALSHAs in one pipeline (one round-trip).
+
+        Redis still runs the scripts one after another, in pipeline
+        order, each atomically — so the result is identical to calling
+        match() per order. transaction=False: the scripts are already
+        atomic individually, MULTI would add nothing.
+
+        One script failing doesn't stop the others: by then every
+        script before it — and after it — has XACKed its entry and
+        changed the book, so their trades must not be thrown away with
+        the error. Each entry gets its trades, or the exception its
+        script raised (like execute(raise_on_error=False)).
+
+        NOSCRIPT means the script cache was flushed and that EVALSHA
+        never ran — safe to reload and resend just those entries.
+        """
+        ids = stream_ids or [""] * len(orders)
+        if self.sha is None:
+            await self.load()
+        replies = await self._evalsha_pipeline(orders, ids)
+        unknown = [i for i, reply in enumerate(replies) if isinstance(reply, NoScriptError)]
+        if unknown:
+            await self.load()
+            resent = await self._evalsha_pipeline([orders[i] for i in unknown], [ids[i] for i in unknown])
+            for i, reply in zip(unknown, resent):
+                replies[i] = reply
+        return [
+            reply if isinstance(reply, Exception) else trades_from_reply(o, reply)
+            for o, reply in zip(orders, replies)
+        ]
+
+    async def _evalsha_pipeline(self, orders: list[Message], stream_ids: list[str]) -> list:
+        pipe = self.r.pipeline(transaction=False)
+        for order, stream_id in zip(orders, stream_ids):
+            pipe.evalsha(self.sha, *script_args(order, stream_id))
+        return await pipe.execute(raise_on_error=False)
+
+
+def script_args(message: Message, stream_id: str = "") -> list:
+    """numkeys, KEYS and ARGV for MATCH_SCRIPT. Keys follow the message's symbol."""
+    keys = keys_for(message.symbol)
+    if isinstance(message, CancelReplace):
+        cancel_ids, legs = message.cancel_ids, message.orders
+    else:
+        cancel_ids, legs = (), (message,)
+    args = [
+        8, keys.bids, keys.asks, keys.stream,
+        keys.bid_depth, keys.bid_levels, keys.ask_depth, keys.ask_levels, keys.md,
+        record_base(message.symbol),
+        CONSUMER_GROUP,
+        stream_id,
+        message.symbol,
+        message.trader_id,
+        len(cancel_ids),
+        *cancel_ids,
+    ]
+    for leg in legs:
+        fields = leg.to_stream_dict()
+        args += [
+            fields["order_id"],
+            fields["side"],
+            fields["order_type"],
+            fields["price"],
+            fields["qty"],
+            fields["timestamp"],
+        ]
+    return args
+
+
+def trades_from_reply(message: Message, reply: list | None) -> list[Trade]:
+    """
+    The script returns one fill list per leg (a plain order is one leg);
+    None means the entry had already been processed.
+    """
+    if reply is None:
+        return []
+    legs = message.orders if isinstance(message, CancelReplace) else (message,)
+    return [trade for leg, fills in zip(legs, reply) for trade in trades_from_fills(leg, fills)]
+
+
+def trades_from_fills(incoming: Order, fills: list) -> list[Trade]:
+    """
+    Turn the script's reply into Trade objects.
+
+    Each fill is [resting_id, resting_trader, price, fill_qty, resting_ts]
+    as bytes (price in ticks — the level's score — and fill_qty in
+    lots). Trades clear at the resting/maker price.
+    """
+    bid = incoming.side == Side.BID
+    return [
+        Trade(
+            trade_id=     next_id(),
+            bid_order_id= incoming.order_id if bid else int(order_id),
+            ask_order_id= int(order_id) if bid else incoming.order_id,
+            buyer_id=     incoming.trader_id if bid else trader_id.decode(),
+            seller_id=    trader_id.decode() if bid else incoming.trader_id,
+            price=        int(price),
+            qty=          int(qty),
+            symbol=       incoming.symbol,
+        )
+        for order_id, trader_id, price, qty, _ in fills
+    ]
@@ -0,0 +1,259 @@
+"""
+Sequenced market data — a market-by-price feed anyone can follow.
+
+WHY A FEED?
+────────────
+Without one, the only way to see the book is to poll the depth keys,
+and trades:channel says nothing about the levels the fill emptied —
+nor whether you missed a message. A market-by-price (MBP) feed fixes
+both: one ordered log of every change to a symbol's price levels,
+each with a sequence number, so a client can keep its own copy of the
+ladder and *know* that copy is complete.
+
+THE EVENTS
+───────────
+One Redis Stream per symbol (md:stream). Every entry's ID is 0-<seq>:
+
+    add     side price qty     a price level appeared
+    modify  side price qty     its total changed (qty = the new total)
+    delete  side price         the level emptied
+    clear                      the book was cleared or rebuilt: drop
+                               every level (after a rebuild, adds for
+                               the new book follow)
+    trade   trade fields       a fill
+    mid     price              a new book:mid
+
+Level prices and trade prices are ticks, quantities lots — integers,
+like a real exchange feed; a viewer scales them for display
+(models.from_ticks / from_lots). The mid is the one plain float.
+
+Each event is appended in the same script or MULTI as the write it
+describes (depth.level_delta / level_set, book.queue_trade / queue_mid),
+so event N is exactly the Nth change — a fill's level events come
+just before its trade event.
+
+THE PROTOCOL
+─────────────
+  1. get_md_snapshot → every level + the mid, read atomically together
+     with the seq they reflect
+  2. XREAD from 0-<seq> → events seq+1, seq+2, … in order, blocking
+     for new ones (md_read)
+  3. an event whose seq isn't last+1 means you missed some → back to 1
+  4. a quiet read: if md:stream's newest seq (md_head) is below yours,
+     the stream was recreated → back to 1
+
+BookReplica does steps 1, 3 and 4; the caller does the reading.
+
+WHY THE STREAM ID IS THE SEQUENCE
+───────────────────────────────────
+XADD <key> 0-* (Redis 7) leaves the sequence part of the ID to Redis:
+0-1, 0-2, 0-3, … with no gaps. So there's no counter key to keep in
+step with the stream, and the seq doubles as the cursor to resume
+from. Trimming (MAXLEN ~ MD_STREAM_MAX_LEN) never resets it.
+
+CHEAP RESYNC
+─────────────
+A client that drops its connection just reads again from its last
+seq — the stream still holds what it missed, nothing is re-read.
+Only a client that fell more than MD_STREAM_MAX_LEN events behind
+finds the stream trimmed past it (the next seq skips ahead) and pays
+for a snapshot. Even that is O(levels), not O(orders): it reads the
+depth hashes, never the per-order book.
+
+RESETS
+───────
+FLUSHDB (or a restart without persistence) starts md:stream over at
+0-1. A client reading from 0-<old seq> would then see nothing until
+the new stream passed its old seq — and then take those events as
+the continuation of the book it had. Two checks catch it: apply()
+rejects any seq at or below the replica's (reads start after it, so
+only a new stream can produce one), and a read that comes back empty
+after MD_BLOCK_MS compares the replica with md_head. Either way the
+answer is a fresh snapshot.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+
+import redis as syncredis
+import redis.asyncio as aioredis
+
+from src.config import DEFAULT_SYMBOL, MD_STREAM_MAX_LEN, keys_for
+
+
+# Pasted in front of any script that changes a level (see depth.py).
+MD_EVENT_LUA = f"""
+local function md_event(md_key, ...)
+  redis.call("XADD", md_key, "MAXLEN", "~", {MD_STREAM_MAX_LEN}, "0-*", ...)
+end
+"""
+
+SNAPSHOT_SCRIPT = """
+local last = redis.call("XREVRANGE", KEYS[1], "+", "-", "COUNT", 1)
+local seq = "0-0"
+if #last > 0 then seq = last[1][1] end
+return {seq, redis.call("HGETALL", KEYS[2]), redis.call("HGETALL", KEYS[3]),
+        redis.call("GET", KEYS[4]) or ""}
+"""
+
+
+@dataclass(slots=True)
+class MdEvent:
+    seq: int
+    type: str                       # add / modify / delete / clear / trade / mid
+    fields: dict[str, str]          # everything else, as published
+
+    @classmethod
+    def from_entry(cls, entry_id: bytes, data: dict[bytes, bytes]) -> MdEvent:
+        fields = {k.decode(): v.decode() for k, v in data.items()}
+        return cls(seq_of(entry_id), fields.pop("type"), fields)
+
+
+@dataclass
+class MdSnapshot:
+    seq: int
+    bids: dict[int, int]            # ticks → lots
+    asks: dict[int, int]
+    mid: float | None
+
+
+@dataclass
+class BookReplica:
+    """
+    A client's copy of one symbol's levels, kept in step by MdEvents.
+
+    apply() returns False when the event doesn't follow `seq` — the
+    replica is then stale and the caller should load() a fresh
+    snapshot before applying anything else. So does behind() for a
+    stream whose newest seq is below ours (see RESETS).
+    """
+    symbol: str = DEFAULT_SYMBOL
+    seq: int = -1                   # -1 until the first load()
+    bids: dict[int, int] = field(default_factory=dict)
+    asks: dict[int, int] = field(default_factory=dict)
+    mid: float | None = None
+    gaps: int = 0                   # resyncs needed so far
+
+    def load(self, snapshot: MdSnapshot) -> None:
+        self.seq, self.mid = snapshot.seq, snapshot.mid
+        self.bids, self.asks = dict(snapshot.bids), dict(snapshot.asks)
+
+    def apply(self, event: MdEvent) -> bool:
+        if self.seq < 0 or event.seq != self.seq + 1:
+            self.gaps += 1
+            return False
+        self.seq = event.seq
+        f = event.fields
+        if event.type in ("add", "modify"):
+            self._levels(f["side"])[int(f["price"])] = int(f["qty"])
+        elif event.type == "delete":
+            self._levels(f["side"]).pop(int(f["price"]), None)
+        elif event.type == "clear":
+            self.bids, self.asks = {}, {}
+        elif event.type == "mid":
+            self.mid = float(f["price"])
+        return True
+
+    def behind(self, head_seq: int) -> bool:
+        """True if md:stream ends before our seq: it was recreated since our snapshot."""
+        if head_seq >= self.seq:
+            return False
+        self.gaps += 1
+        return True
+
+    def _levels(self, side: str) -> dict[int, int]:
+        return self.bids if side == "bid" else self.asks
+
+
+def seq_of(entry_id: bytes | str) -> int:
+    """0-<seq> → seq."""
+    if isinstance(entry_id, bytes):
+        entry_id = entry_id.decode()
+    return int(entry_id.split("-")[1])
+
+
+# ── Writers ──────────────────────────────────────────────────────
+
+def queue_md_event(
+    pipe: aioredis.client.Pipeline,
+    symbol: str,
+    event_type: str,
+    fields: dict[str, str] | None = None,
+) -> None:
+    """Append one event to a (MULTI) pipeline, next to the write it describes."""
+    pipe.xadd(
+        keys_for(symbol).md, {"type": event_type, **(fields or {})},
+        id="0-*", maxlen=MD_STREAM_MAX_LEN, approximate=True,
+    )
+
+
+# ── Readers ──────────────────────────────────────────────────────
+
+async def get_md_snapshot(r: aioredis.Redis, symbol: str = DEFAULT_SYMBOL) -> MdSnapshot:
+    """Every level + mid, tagged with the seq of the last event they include."""
+    return _parse_snapshot(await r.eval(SNAPSHOT_SCRIPT, 4, *_snapshot_keys(symbol)))
+
+
+def sync_get_md_snapshot(r: syncredis.Redis, symbol: str = DEFAULT_SYMBOL) -> MdSnapshot:
+    """Sync version of get_md_snapshot for the Rich dashboard."""
+    return _parse_snapshot(r.eval(SNAPSHOT_SCRIPT, 4, *_snapshot_keys(symbol)))
+
+
+async def md_read(
+    r: aioredis.Redis,
+    after_seq: int,
+    symbol: str = DEFAULT_SYMBOL,
+    count: int = 500,
+    block_ms: int | None = None,
+) -> list[MdEvent]:
+    """Up to `count` events after after_seq, oldest first (XREAD, optionally blocking)."""
+    reply = await r.xread({keys_for(symbol).md: f"0-{after_seq}"}, count=count, block=block_ms)
+    return _parse_read(reply)
+
+
+def sync_md_read(
+    r: syncredis.Redis,
+    after_seq: int,
+    symbol: str = DEFAULT_SYMBOL,
+    count: int = 500,
+    block_ms: int | None = None,
+) -> list[MdEvent]:
+    """Sync version of md_read for the Rich dashboard."""
+    reply = r.xread({keys_for(symbol).md: f"0-{after_seq}"}, count=count, block=block_ms)
+    return _parse_read(reply)
+
+
+async def md_head(r: aioredis.Redis, symbol: str = DEFAULT_SYMBOL) -> int:
+    """Seq of the newest event in md:stream, 0 if there is none."""
+    return _parse_head(await r.xrevrange(keys_for(symbol).md, count=1))
+
+
+def sync_md_head(r: syncredis.Redis, symbol: str = DEFAULT_SYMBOL) -> int:
+    """Sync version of md_head for the Rich dashboard."""
+    return _parse_head(r.xrevrange(keys_for(symbol).md, count=1))
+
+
+def _snapshot_keys(symbol: str) -> list[str]:
+    keys = keys_for(symbol)
+    return [keys.md, keys.bid_depth, keys.ask_depth, keys.mid]
+
+
+def _parse_snapshot(reply: list) -> MdSnapshot:
+    seq, bids, asks, mid = reply
+
+    def levels(flat: list) -> dict[int, int]:
+        return {int(flat[i]): int(flat[i + 1]) for i in range(0, len(flat), 2)}
+
+    return MdSnapshot(seq_of(seq), levels(bids), levels(asks), float(mid) if mid else None)
+
+
+def _parse_read(reply) -> list[MdEvent]:
+    if not reply:
+        return []
+    _, entries = reply[0]
+    return [MdEvent.from_entry(entry_id, data) for entry_id, data in entries]
+
+
+def _parse_head(reply: list) -> int:
+    return seq_of(reply[0][0]) if reply else 0
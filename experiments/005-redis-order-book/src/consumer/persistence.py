@@ -0,0 +1,362 @@
+"""
+Snapshot + journal — the memory engine's own recovery point.
+
+WHY NOT JUST RELOAD FROM REDIS?
+────────────────────────────────
+load_local_book rebuilds the in-memory book from the Redis projection:
+a ZRANGE per side plus an HGETALL for every resting order. That's
+O(book size) round-trips on every restart, and it can't say *which*
+stream entry the projection reflects — so there's no well-defined
+point to resume from, and in-level queue order is guessed from
+timestamps.
+
+Instead each symbol keeps two local files:
+
+  <symbol>.snapshot   the whole book + the last applied stream ID
+  <symbol>.journal    every stream entry applied since that snapshot
+
+Recovery = snapshot + replay(journal). The snapshot is written every
+SNAPSHOT_INTERVAL seconds and the journal is cut back to zero right
+after, so restart time is bounded by how much flow arrives in one
+interval, not by how big the book has grown. Replaying the same
+inputs in the same order through the same LocalBook gives the same
+book — recovery is deterministic.
+
+WRITE-AHEAD, THEN COMMIT
+─────────────────────────
+The engine journals a batch *before* its Redis commit (the pipeline
+with the projection writes + XACK). After a crash there are three
+cases per entry:
+
+  journaled, acked      → replay it, discard its side effects
+                          (Redis already has them)
+  journaled, pending    → replay it AND commit it now — the crash
+                          came between journal and commit
+  not journaled         → never applied; still pending in the PEL,
+                          adopted and processed normally
+
+"Acked or pending" comes from XPENDING, so every entry's effects reach
+Redis exactly once. Entries at or below the last applied ID are
+skipped wherever they turn up (journal or stream), which makes replay
+idempotent. That relies on each symbol's entries being applied in
+stream order — which is why a failed commit is retried in place
+rather than skipped (engine.commit_until_acked).
+
+The one exception is an entry that fails to *match*: the engine sets
+it aside and goes on (engine.recover_failed_batch), so later entries
+move last_id past it while it waits in the PEL. Its ID goes into the
+store's `skipped` set, which is_new() checks too, and into every
+snapshot — when autoclaim_loop brings it back, it's matched like a
+new entry, not acked as a redelivery.
+
+FILE FORMATS
+─────────────
+Little-endian throughout. An order record is
+
+  u8 flags | u64 order_id | i64 price (ticks) | i64 qty (lots) | f64 timestamp
+  | u32 len, trader_id
+
+(flags: bit 0 = ASK, bit 1 = MARKET). The snapshot is a header
+(magic, last stream ID, order count, skipped count), the skipped
+stream IDs, the order records in book order — bids then asks,
+ascending price, queue order within a level — and a CRC32 of
+everything before it. Startup mmaps it and decodes the records in
+place. Journal records are u32 length + u32 CRC32 + (u64, u64 stream
+ID + message record); a torn record at the tail (crash mid-write)
+fails its length or CRC check and ends the replay.
+
+A message record is an order record, or — flags bit 2 set — a
+CancelReplace:
+
+  u8 flags | f64 timestamp | u32 len, trader_id
+  | u32 n, n × u64 order_id | u32 m, m × order record
+
+Lengths and counts are u32, not u8: nothing upstream caps a trader_id
+at 255 bytes or a requote at 255 cancels, and an entry that can't be
+journaled can never be processed in memory mode.
+"""
+
+from __future__ import annotations
+
+import mmap
+import os
+import struct
+import zlib
+from pathlib import Path
+
+from src.config import ENGINE_STATE_DIR, JOURNAL_FSYNC
+from src.consumer.local_book import LocalBook
+from src.models import CancelReplace, Message, Order, OrderType, Side
+
+SNAPSHOT_MAGIC = b"OBSNAP04"           # 04: u32 lengths and counts
+
+_ORDER     = struct.Struct("<BQqqd")    # flags, order_id, price, qty, timestamp
+_ORDER_ID  = struct.Struct("<Q")
+_LENGTH    = struct.Struct("<I")        # string length / item count
+_CANCEL    = struct.Struct("<Bd")       # flags, timestamp
+_SNAP_HEAD = struct.Struct("<8sQQII")   # magic, last id (ms, seq), order count, skipped count
+_SNAP_TAIL = struct.Struct("<I")        # CRC32 of header + records
+_JREC_HEAD = struct.Struct("<II")       # payload length, CRC32 of payload
+_STREAM_ID = struct.Struct("<QQ")
+
+_FLAG_ASK     = 0x01
+_FLAG_MARKET  = 0x02
+_FLAG_REPLACE = 0x04   # journal only: the record is a CancelReplace
+
+StreamId = tuple[int, int]
+
+
+def parse_stream_id(stream_id: str | bytes) -> StreamId:
+    """"1715000000000-3" → (1715000000000, 3), comparable as a tuple."""
+    if isinstance(stream_id, bytes):
+        stream_id = stream_id.decode()
+    ms, _, seq = stream_id.partition("-")
+    return int(ms), int(seq or 0)
+
+
+def format_stream_id(stream_id: StreamId) -> str:
+    return f"{stream_id[0]}-{stream_id[1]}"
+
+
+# ── Order + message records ──────────────────────────────────────
+
+def encode_order(order: Order) -> bytes:
+    flags = (_FLAG_ASK if order.side == Side.ASK else 0) | (
+        _FLAG_MARKET if order.price is None else 0
+    )
+    trader_id = order.trader_id.encode()
+    return b"".join((
+        _ORDER.pack(flags, order.order_id, order.price or 0, order.qty, order.timestamp),
+        _LENGTH.pack(len(trader_id)), trader_id,
+    ))
+
+
+def decode_order(buf, pos: int, symbol: str) -> tuple[Order, int]:
+    """Decode one order record at buf[pos:]; returns (order, next pos)."""
+    flags, order_id, price, qty, timestamp = _ORDER.unpack_from(buf, pos)
+    trader_id, end = _decode_str(buf, pos + _ORDER.size)
+    market = flags & _FLAG_MARKET
+    return Order(
+        order_id=   order_id,
+        trader_id=  trader_id,
+        side=       Side.ASK if flags & _FLAG_ASK else Side.BID,
+        order_type= OrderType.MARKET if market else OrderType.LIMIT,
+        price=      None if market else price,
+        qty=        qty,
+        timestamp=  timestamp,
+        symbol=     symbol,
+    ), end
+
+
+def _decode_str(buf, pos: int) -> tuple[str, int]:
+    """A u32-length-prefixed UTF-8 string at buf[pos:]; returns (str, next pos)."""
+    (length,) = _LENGTH.unpack_from(buf, pos)
+    start = pos + _LENGTH.size
+    return bytes(buf[start:start + length]).decode(), start + length
+
+
+def encode_message(message: Message) -> bytes:
+    if isinstance(message, Order):
+        return encode_order(message)
+    trader_id = message.trader_id.encode()
+    parts = [
+        _CANCEL.pack(_FLAG_REPLACE, message.timestamp),
+        _LENGTH.pack(len(trader_id)), trader_id,
+        _LENGTH.pack(len(message.cancel_ids)),
+        *map(_ORDER_ID.pack, message.cancel_ids),
+        _LENGTH.pack(len(message.orders)),
+    ]
+    parts += map(encode_order, message.orders)
+    return b"".join(parts)
+
+
+def decode_message(buf, pos: int, symbol: str) -> tuple[Message, int]:
+    """Decode one message record at buf[pos:]; returns (message, next pos)."""
+    if not buf[pos] & _FLAG_REPLACE:
+        return decode_order(buf, pos, symbol)
+    _, timestamp = _CANCEL.unpack_from(buf, pos)
+    trader_id, pos = _decode_str(buf, pos + _CANCEL.size)
+    (count,) = _LENGTH.unpack_from(buf, pos)
+    pos += _LENGTH.size
+    cancel_ids = []
+    for _ in range(count):
+        cancel_ids.append(_ORDER_ID.unpack_from(buf, pos)[0])
+        pos += _ORDER_ID.size
+    (count,) = _LENGTH.unpack_from(buf, pos)
+    pos += _LENGTH.size
+    orders = []
+    for _ in range(count):
+        order, pos = decode_order(buf, pos, symbol)
+        orders.append(order)
+    return CancelReplace(trader_id, tuple(cancel_ids), tuple(orders), timestamp, symbol), pos
+
+
+# ── Per-symbol store ─────────────────────────────────────────────
+
+class BookStore:
+    """
+    Snapshot + journal files for one symbol's book.
+
+    last_id is the newest stream entry reflected in the book; anything
+    at or below it has already been applied — except the entries in
+    skipped, which failed to match and are still pending.
+    """
+
+    def __init__(self, symbol: str, state_dir: str | Path = ENGINE_STATE_DIR):
+        self.symbol = symbol
+        self.dir = Path(state_dir)
+        self.snapshot_path = self.dir / f"{symbol}.snapshot"
+        self.journal_path = self.dir / f"{symbol}.journal"
+        self.last_id: StreamId = (0, 0)
+        self.skipped: set[StreamId] = set()
+        self._journal = None
+
+    # ── Startup ──────────────────────────────────────────────────
+
+    def load(self) -> tuple[LocalBook, list[tuple[str, Message]]] | None:
+        """
+        Read the snapshot into a fresh LocalBook and return it with the
+        journal entries still to be replayed on top (oldest first).
+        None if there is no usable snapshot — the caller falls back to
+        the Redis projection and the stale journal is discarded.
+        """
+        book = self._read_snapshot()
+        if book is None:
+            return None
+        replay = [
+            (format_stream_id(sid), message)
+            for sid, message in self._read_journal()
+            if sid > self.last_id or sid in self.skipped
+        ]
+        return book, replay
+
+    def _read_snapshot(self) -> LocalBook | None:
+        try:
+            f = open(self.snapshot_path, "rb")
+        except FileNotFoundError:
+            return None
+        with f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            body_end = len(buf) - _SNAP_TAIL.size
+            if body_end < _SNAP_HEAD.size:
+                return None
+            magic, ms, seq, count, skipped = _SNAP_HEAD.unpack_from(buf, 0)
+            (crc,) = _SNAP_TAIL.unpack_from(buf, body_end)
+            if magic != SNAPSHOT_MAGIC or zlib.crc32(buf[:body_end]) != crc:
+                print(f"[engine] Ignoring corrupt snapshot {self.snapshot_path}")
+                return None
+
+            pos = _SNAP_HEAD.size
+            skipped_ids = set()
+            for _ in range(skipped):
+                skipped_ids.add(_STREAM_ID.unpack_from(buf, pos))
+                pos += _STREAM_ID.size
+            orders = []
+            for _ in range(count):
+                order, pos = decode_order(buf, pos, self.symbol)
+                orders.append(order)
+
+        book = LocalBook(self.symbol)
+        book.restore(orders)
+        self.last_id, self.skipped = (ms, seq), skipped_ids
+        return book
+
+    def _read_journal(self) -> list[tuple[StreamId, Message]]:
+        try:
+            data = self.journal_path.read_bytes()
+        except FileNotFoundError:
+            return []
+        entries = []
+        pos = 0
+        while pos + _JREC_HEAD.size <= len(data):
+            length, crc = _JREC_HEAD.unpack_from(data, pos)
+            start = pos + _JREC_HEAD.size
+            payload = data[start:start + length]
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                print(f"[engine] Journal {self.journal_path} ends in a torn record, ignoring it")
+                break
+            ms, seq = _STREAM_ID.unpack_from(payload, 0)
+            message, _ = decode_message(payload, _STREAM_ID.size, self.symbol)
+            entries.append(((ms, seq), message))
+            pos = start + length
+        return entries
+
+    # ── Running ──────────────────────────────────────────────────
+
+    def is_new(self, stream_id: str) -> bool:
+        sid = parse_stream_id(stream_id)
+        return sid > self.last_id or sid in self.skipped
+
+    def skip(self, stream_id: str) -> None:
+        """Leave an entry unapplied: is_new() stays True for it after last_id passes it."""
+        self.skipped.add(parse_stream_id(stream_id))
+
+    def append(self, batch: list[tuple[str, Message]]) -> int:
+        """
+        Journal entries about to be applied. Returns the journal size
+        before the write, for rollback() if the commit then fails.
+        """
+        journal = self._open_journal()
+        mark = journal.tell()
+        records = []
+        for stream_id, message in batch:
+            payload = _STREAM_ID.pack(*parse_stream_id(stream_id)) + encode_message(message)
+            records.append(_JREC_HEAD.pack(len(payload), zlib.crc32(payload)))
+            records.append(payload)
+        journal.write(b"".join(records))
+        journal.flush()
+        if JOURNAL_FSYNC:
+            os.fsync(journal.fileno())
+        return mark
+
+    def rollback(self, mark: int) -> None:
+        """Drop everything appended since `mark` (the batch was not applied)."""
+        journal = self._open_journal()
+        journal.truncate(mark)
+        journal.seek(mark)
+
+    def applied(self, stream_ids: list[str]) -> None:
+        """Advance last_id after a successful commit."""
+        if stream_ids:
+            sids = set(map(parse_stream_id, stream_ids))
+            self.skipped -= sids
+            self.last_id = max(self.last_id, *sids)
+
+    def snapshot(self, book: LocalBook) -> None:
+        """
+        Write the book + last_id, then start an empty journal.
+
+        Written to a temp file, fsynced, then renamed over the old
+        snapshot — a crash mid-write leaves the previous snapshot and
+        journal intact. Runs synchronously under the engine lock so no
+        entry can be applied between the two steps; it's one sequential
+        file write, a few ms even for a deep book.
+        """
+        self.dir.mkdir(parents=True, exist_ok=True)
+        orders = [order for side in (Side.BID, Side.ASK) for order in book.resting(side)]
+        body = b"".join((
+            _SNAP_HEAD.pack(SNAPSHOT_MAGIC, *self.last_id, len(orders), len(self.skipped)),
+            *(_STREAM_ID.pack(*sid) for sid in sorted(self.skipped)),
+            *map(encode_order, orders),
+        ))
+        tmp = self.snapshot_path.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            f.write(body)
+            f.write(_SNAP_TAIL.pack(zlib.crc32(body)))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.snapshot_path)
+
+        # Everything in the journal is now ≤ last_id, i.e. in the snapshot.
+        self._open_journal().truncate(0)
+        self._journal.seek(0)
+
+    def close(self) -> None:
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    def _open_journal(self):
+        if self._journal is None:
+            self.dir.mkdir(parents=True, exist_ok=True)
+            self._journal = open(self.journal_path, "ab+")
+        return self._journal
@@ -0,0 +1,145 @@
+"""
+Pipelined batch mode: read, match and commit overlap instead of taking turns.
+
+WHY STAGES?
+────────────
+run_batches handles one batch at a time:
+
+  read ──► match ──► commit ──► read ──► match ──► commit ──► ...
+  (wait)    (CPU)     (wait)    (wait)    (CPU)     (wait)
+
+In memory mode the match is the only part that uses the CPU, and it
+sits idle through both round-trips around it. Here each step is its
+own task, with a bounded queue between neighbours:
+
+  reader    XREADGROUP + decode           ─► decoded  (ENGINE_PIPELINE_DEPTH)
+  matcher   match_batch, under ctx.lock   ─► ctx.commits (ENGINE_PIPELINE_DEPTH)
+  committer commit_matched: writes, trades, PUBLISH and XACK in one MULTI
+
+While batch N's commit is on the wire, batch N+1 is matched and batch
+N+2 is being read. In memory mode the XACK stays inside the commit's
+MULTI: acking separately would ack entries whose trades might not have
+landed. Lua and redis mode have acked each entry by the time it's
+matched, so their commits can't be left to a later retry from the PEL
+— commit_matched keeps retrying until they land, in every mode.
+
+ORDERING
+─────────
+One task per stage and FIFO queues: batches are matched in the order
+they were read and committed in the order they were matched — the
+same order run_batches would have used, so the trades, the tape and
+the projection come out identical. What changes is only *when* a
+commit happens relative to the next match, and only the matcher's
+own state can see that: in memory mode the books run ahead of Redis
+by at most the queued batches. Those are already journaled
+(write-ahead), so a crash loses nothing — recovery commits whatever
+is still pending, exactly as before.
+
+When the committer finds several batches waiting, it commits up to
+PIPELINE_COALESCE of them in one pipeline — the slower Redis is, the
+bigger each commit, the fewer round-trips.
+
+BACKPRESSURE
+─────────────
+The queues are bounded, so a slow stage stalls the one before it
+rather than letting work pile up: commits fall behind → ctx.commits
+fills → the matcher waits for room → decoded fills → the reader stops
+reading, and the backlog stays in the stream, where the adaptive
+batch size sees it as lag.
+
+WHAT MUST WAIT
+───────────────
+A reclaimed batch commits on its own, a snapshot must not include
+matched-but-uncommitted entries, a resync reloads the projection, a
+failed batch is retried entry by entry (engine.recover_failed_batch)
+— each of those would overtake or miss a batch in flight. They all take
+ctx.lock and call engine.settle first, which waits until ctx.commits
+is empty. The matcher holds ctx.lock from match to enqueue, so nothing
+gets between a batch's match and its place in the commit order.
+
+In lua and redis mode matching is itself a Redis call, so there is
+less to overlap — but reads still run ahead, and a batch's trade
+publishing no longer holds up the next batch's EVALSHAs.
+"""
+
+from __future__ import annotations
+
+import asyncio
+
+from src.config import ENGINE_PIPELINE_DEPTH, PIPELINE_COALESCE
+from src.consumer.batching import AdaptiveBatchSize
+from src.consumer.engine import (
+    EngineContext, MatchedBatch, commit_matched, match_batch, maybe_snapshot,
+    order_batches, recover_failed_batch,
+)
+from src.models import Message
+
+
+async def run_pipelined(
+    ctx: EngineContext,
+    sizer: AdaptiveBatchSize,
+    depth: int = ENGINE_PIPELINE_DEPTH,
+) -> None:
+    """Run the three stages until cancelled (or one of them fails)."""
+    decoded: asyncio.Queue[list[tuple[str, Message]]] = asyncio.Queue(maxsize=depth)
+    ctx.commits = asyncio.Queue(maxsize=depth)
+    stages = [
+        asyncio.create_task(read_stage(ctx, sizer, decoded), name="pipeline-read"),
+        asyncio.create_task(match_stage(ctx, sizer, decoded), name="pipeline-match"),
+        asyncio.create_task(commit_stage(ctx), name="pipeline-commit"),
+    ]
+    try:
+        await asyncio.gather(*stages)
+    finally:
+        for stage in stages:
+            stage.cancel()
+        await asyncio.gather(*stages, return_exceptions=True)
+        ctx.commits = None
+
+
+async def read_stage(
+    ctx: EngineContext,
+    sizer: AdaptiveBatchSize,
+    decoded: asyncio.Queue[list[tuple[str, Message]]],
+) -> None:
+    async for batch in order_batches(ctx.r, sizer, ctx.consumer, ctx.symbols):
+        await decoded.put(batch)
+
+
+async def match_stage(
+    ctx: EngineContext,
+    sizer: AdaptiveBatchSize,
+    decoded: asyncio.Queue[list[tuple[str, Message]]],
+) -> None:
+    while True:
+        batch = await decoded.get()
+        async with ctx.lock:
+            try:
+                matched = await match_batch(ctx, batch)
+            except Exception as e:
+                # Settles, then retries the batch before the next one
+                # is matched — see there.
+                await recover_failed_batch(ctx, batch, e)
+                continue
+            # Still under the lock: a reclaim or snapshot that settles
+            # after this point must find the batch already queued.
+            await ctx.commits.put(matched)
+
+        ctx.metrics.set("batch_size", sizer.size)
+        ctx.metrics.set("pipeline_queued", ctx.commits.qsize())
+        await maybe_snapshot(ctx)
+
+
+async def commit_stage(ctx: EngineContext) -> None:
+    while True:
+        group: list[MatchedBatch] = [await ctx.commits.get()]
+        while len(group) < PIPELINE_COALESCE and not ctx.commits.empty():
+            group.append(ctx.commits.get_nowait())
+        try:
+            # Retries Redis errors until the commit lands. Anything else
+            # is a bug: let it stop the pipeline, and the engine, rather
+            # than drop trades whose entries may already be acked.
+            await commit_matched(ctx, group)
+        finally:
+            for _ in group:
+                ctx.commits.task_done()
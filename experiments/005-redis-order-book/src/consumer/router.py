@@ -0,0 +1,39 @@
+"""
+Symbol → engine routing.
+
+WHY SHARD BY SYMBOL?
+─────────────────────
+Books for different instruments never interact: an AAPL bid can only
+ever match an AAPL ask. So the natural unit of parallelism is the
+symbol, not the order. Give each engine a disjoint set of symbols and
+it owns those books outright:
+
+  - no locking or atomic scripts needed between engines
+  - memory mode works with several engines (each book has one owner)
+  - a hot symbol only slows down its own shard
+
+Every symbol already has its own stream (config.keys_for), so
+"routing" is just deciding which streams each engine reads.
+
+WHY A HASH, NOT ROUND-ROBIN?
+─────────────────────────────
+shard_for must give the same answer in every process, on every run,
+without coordination — the producer side and every engine have to
+agree on who owns "AAPL". Python's hash() is salted per process
+(PYTHONHASHSEED), so we use CRC32 of the symbol name instead.
+"""
+
+from __future__ import annotations
+
+import zlib
+from typing import Sequence
+
+
+def shard_for(symbol: str, shards: int) -> int:
+    """Which of `shards` engines owns `symbol`. Stable across processes."""
+    return zlib.crc32(symbol.encode()) % shards
+
+
+def symbols_for_shard(symbols: Sequence[str], shard: int, shards: int) -> list[str]:
+    """The subset of `symbols` that engine number `shard` should read."""
+    return [symbol for symbol in symbols if shard_for(symbol, shards) == shard]
@@ -0,0 +1,290 @@
+"""
+Background reconciliation of the book's sorted sets and order records.
+
+WHY A SWEEPER?
+───────────────
+A resting order is two things in Redis: a member of book:bids /
+book:asks, and a record (order:<id>, or a field of its level's hash —
+book.py: ORDER RECORDS). Every code path writes the pair together, in
+one MULTI or one script, but that only holds for the code as it is
+now. A crash in an older version, a FLUSH of the wrong key, a redis
+mode engine run next to another one (two HSETs racing a DEL) can
+leave one half without the other, and nothing expires either half:
+
+  stale entry    a book member without a record. get_crossable_orders
+                 pays a round trip for it on every walk past its price,
+                 then skips it; the L2 depth may still count its qty.
+  orphan record  a record without a book member. order:<id> is dead
+                 memory forever. A level-layout record is worse: the
+                 matcher reads a level with one HGETALL, so it would
+                 fill an order that isn't in the book.
+
+The sweeper walks both directions and removes whichever half is left,
+then recounts each level it touched and fixes its L2 total (and
+md:stream) if that was off too.
+
+INCREMENTAL, UNDER A BUDGET
+────────────────────────────
+Never ZRANGE 0 -1 or KEYS *: on a million-order book either blocks
+Redis for as long as it takes to build the reply. ZSCAN / SCAN / HSCAN
+return a bounded slice and a cursor, and the sweeper sleeps after
+every slice so it examines at most SWEEP_RATE members + records per
+second. A full pass over a million orders at the default rate takes
+minutes; the engine doesn't notice. SCAN may return a key twice, and
+keys created mid-pass may be missed — harmless, the next pass looks
+again.
+
+CHECK AND FIX ATOMICALLY
+─────────────────────────
+What a scan returned may have changed by the time we act on it — the
+engine keeps matching while we sweep. So the scan only nominates
+candidates; the scripts below look at each one again and delete only
+what is *still* half-missing. The check and the delete are one atomic
+step, so a live order can't be swept.
+
+In memory mode the engine's book is the authority and Redis its
+projection: a swept entry there means the projection was wrong, and a
+restart's projection check (engine.recover_local_book) rebuilds it.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import asdict, dataclass, fields
+
+import redis.asyncio as aioredis
+
+from src.config import (
+    BOOK_LAYOUT, DEFAULT_SYMBOL, ORDER_DATA_PREFIX, ORDERS_KEY, SWEEP_BATCH, SWEEP_INTERVAL,
+    SWEEP_RATE, get_async_redis, keys_for,
+)
+from src.consumer.book import ORDER_RECORD_LUA, record_base
+from src.consumer.depth import LEVEL_DELTA_LUA
+from src.metrics import SampledLog
+
+
+# Recount one level from the records that still rest there (the book
+# member's score is the level's price) and overwrite its L2 total if
+# it disagrees. Returns 1 if it had to.
+_REPAIR_LEVEL_LUA = """
+local function repair_level(base, book, depth, levels, md, side, price)
+  local total = 0
+  for _, o in ipairs(level_queue(base, side, price, book)) do
+    if redis.call("ZSCORE", book, o.id) == price then total = total + o.qty end
+  end
+  if tonumber(redis.call("HGET", depth, price) or "0") == total then return 0 end
+  level_set(depth, levels, md, side, price, string.format("%d", total))
+  return 1
+end
+
+local function repair_levels(base, touched, side)
+  local repaired = 0
+  for price in pairs(touched) do
+    repaired = repaired + repair_level(base, KEYS[1], KEYS[2], KEYS[3], KEYS[4], side, price)
+  end
+  return repaired
+end
+"""
+
+# KEYS: book, depth, levels, md   ARGV: base, side, order ids...
+SWEEP_ENTRIES_SCRIPT = LEVEL_DELTA_LUA + ORDER_RECORD_LUA + _REPAIR_LEVEL_LUA + """
+local base, side = ARGV[1], ARGV[2]
+local stale, touched = 0, {}
+for i = 3, #ARGV do
+  local price = redis.call("ZSCORE", KEYS[1], ARGV[i])
+  if price and not order_get(base, side, price, ARGV[i]) then
+    redis.call("ZREM", KEYS[1], ARGV[i])
+    stale = stale + 1
+    touched[price] = true
+  end
+end
+return {stale, repair_levels(base, touched, side)}
+"""
+
+# KEYS: book, depth, levels, md   ARGV: base, side, (order id, price)...
+SWEEP_RECORDS_SCRIPT = LEVEL_DELTA_LUA + ORDER_RECORD_LUA + _REPAIR_LEVEL_LUA + """
+local base, side = ARGV[1], ARGV[2]
+local orphans, touched = 0, {}
+for i = 3, #ARGV, 2 do
+  local id, price = ARGV[i], ARGV[i + 1]
+  if redis.call("ZSCORE", KEYS[1], id) ~= price and order_get(base, side, price, id) then
+    order_del(base, side, price, id)
+    orphans = orphans + 1
+    if tonumber(price) then touched[price] = true end
+  end
+end
+return {orphans, repair_levels(base, touched, side)}
+"""
+
+# An order:<id> hash with no side or price can't be matched to a book:
+# only a lone HSET qty, landing after the order was deleted, makes one.
+SWEEP_FRAGMENT_SCRIPT = """
+if redis.call("HEXISTS", KEYS[1], "side") == 1 and redis.call("HEXISTS", KEYS[1], "price") == 1 then
+  return 0
+end
+return redis.call("DEL", KEYS[1])
+"""
+
+
+@dataclass
+class SweepReport:
+    """What one pass looked at and what it reclaimed."""
+    entries: int = 0            # book members examined
+    records: int = 0            # order records examined
+    stale_entries: int = 0      # members without a record → ZREM
+    orphan_records: int = 0     # records without a member → DEL / HDEL
+    levels_repaired: int = 0    # L2 totals rewritten after a removal
+    seconds: float = 0.0
+
+    def add(self, other: SweepReport) -> None:
+        for f in fields(self):
+            setattr(self, f.name, getattr(self, f.name) + getattr(other, f.name))
+
+
+class Sweeper:
+    """
+    Reconciles `symbols`' books with the order records of the current
+    BOOK_LAYOUT. sweep() is one full pass; run() sweeps every
+    `interval` seconds until cancelled, logging each pass.
+
+    Book members are only examined for `symbols`; records are found by
+    a keyspace SCAN, so orphans of any symbol are reclaimed.
+    """
+
+    def __init__(
+        self,
+        r: aioredis.Redis,
+        symbols: list[str],
+        rate: int = SWEEP_RATE,
+        batch: int = SWEEP_BATCH,
+    ):
+        self.r = r
+        self.symbols = list(symbols)
+        self.rate = rate
+        self.batch = batch
+        self.total = SweepReport()              # across all passes
+        self.log = SampledLog("sweeper")
+
+    async def run(self, interval: float = SWEEP_INTERVAL) -> None:
+        while True:
+            report = await self.sweep()
+            self.total.add(report)
+            self.log.write("sweep", **asdict(report))
+            self.log.flush()
+            await asyncio.sleep(interval)
+
+    async def sweep(self) -> SweepReport:
+        report = SweepReport()
+        started = time.monotonic()
+        for symbol in self.symbols:
+            for side in ("bid", "ask"):
+                await self._sweep_entries(symbol, side, report)
+        if BOOK_LAYOUT == "level":
+            await self._sweep_level_records(report)
+        else:
+            await self._sweep_hash_records(report)
+        report.seconds = round(time.monotonic() - started, 3)
+        return report
+
+    # ── Book → records ───────────────────────────────────────────
+
+    async def _sweep_entries(self, symbol: str, side: str, report: SweepReport) -> None:
+        keys = keys_for(symbol)
+        cursor = 0
+        while True:
+            cursor, members = await self.r.zscan(keys.book(side), cursor, count=self.batch)
+            if members:
+                report.entries += len(members)
+                stale, repaired = await self.r.eval(
+                    SWEEP_ENTRIES_SCRIPT, 4, *_side_keys(symbol, side),
+                    record_base(symbol), side, *(order_id for order_id, _ in members),
+                )
+                report.stale_entries += stale
+                report.levels_repaired += repaired
+            await self._pace(len(members))
+            if cursor == 0:
+                return
+
+    # ── Records → book ───────────────────────────────────────────
+
+    async def _sweep_hash_records(self, report: SweepReport) -> None:
+        """SCAN order:*, read each hash's symbol/side/price, check them per book."""
+        cursor = 0
+        while True:
+            cursor, found = await self.r.scan(cursor, match=f"{ORDER_DATA_PREFIX}*", count=self.batch)
+            if found:
+                report.records += len(found)
+                pipe = self.r.pipeline(transaction=False)
+                for key in found:
+                    pipe.hmget(key, "symbol", "side", "price")
+                groups: dict[tuple[str, str], list] = {}
+                for key, (symbol, side, price) in zip(found, await pipe.execute()):
+                    if side is None or price is None:
+                        report.orphan_records += await self.r.eval(SWEEP_FRAGMENT_SCRIPT, 1, key)
+                        continue
+                    order_id = key[len(ORDER_DATA_PREFIX):]
+                    group = (symbol.decode() if symbol else DEFAULT_SYMBOL, side.decode())
+                    groups.setdefault(group, []).extend((order_id, price))
+                for (symbol, side), pairs in groups.items():
+                    await self._check_records(symbol, side, pairs, report)
+            await self._pace(self.batch)
+            if cursor == 0:
+                return
+
+    async def _sweep_level_records(self, report: SweepReport) -> None:
+        """SCAN the level hashes, HSCAN each one's order ids, check them against its book."""
+        cursor = 0
+        while True:
+            cursor, found = await self.r.scan(cursor, match=f"{ORDERS_KEY}:*", count=self.batch)
+            for key in found:
+                symbol, side, price = parse_level_key(key.decode())
+                field_cursor = 0
+                while True:
+                    field_cursor, records = await self.r.hscan(key, field_cursor, count=self.batch)
+                    if records:
+                        report.records += len(records)
+                        pairs = [part for order_id in records for part in (order_id, price)]
+                        await self._check_records(symbol, side, pairs, report)
+                    await self._pace(len(records))
+                    if field_cursor == 0:
+                        break
+            await self._pace(self.batch)
+            if cursor == 0:
+                return
+
+    async def _check_records(self, symbol: str, side: str, pairs: list, report: SweepReport) -> None:
+        orphans, repaired = await self.r.eval(
+            SWEEP_RECORDS_SCRIPT, 4, *_side_keys(symbol, side),
+            record_base(symbol), side, *pairs,
+        )
+        report.orphan_records += orphans
+        report.levels_repaired += repaired
+
+    async def _pace(self, examined: int) -> None:
+        """Sleep long enough that `examined` items stay within the rate budget."""
+        await asyncio.sleep(examined / self.rate if self.rate > 0 else 0)
+
+
+def parse_level_key(key: str) -> tuple[str, str, int]:
+    """book:orders[:<symbol>]:<side>:<price> → (symbol, side, price)."""
+    *symbol, side, price = key[len(ORDERS_KEY) + 1:].split(":")
+    return ":".join(symbol) or DEFAULT_SYMBOL, side, int(price)
+
+
+def _side_keys(symbol: str, side: str) -> list[str]:
+    keys = keys_for(symbol)
+    return [keys.book(side), keys.depth(side), keys.levels(side), keys.md]
+
+
+async def sweep_forever(symbols: list[str], interval: float = SWEEP_INTERVAL, rate: int = SWEEP_RATE) -> None:
+    """run_sweeper.py's loop: reconnect and carry on if Redis goes away."""
+    while True:
+        r = get_async_redis()
+        try:
+            await Sweeper(r, symbols, rate).run(interval)
+        except aioredis.ConnectionError as e:
+            print(f"[sweeper] connection lost ({e}), retrying in 1s")
+            await asyncio.sleep(1.0)
+        finally:
+            await r.aclose()
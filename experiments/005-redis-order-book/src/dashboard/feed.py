@@ -0,0 +1,146 @@
+"""
+The dashboard's own copy of one symbol's market, pushed by Redis.
+
+WHAT IT FOLLOWS
+────────────────
+md:stream — the engine's sequenced market-by-price feed
+(consumer/market_data.py): level adds / modifies / deletes, trades
+and mid changes, each with a sequence number. Every event is written
+in the same script or MULTI as the change it describes, so the feed
+sees the book change in the same order Redis did — and a trade shows
+up on the tape the moment it is committed instead of at the next poll.
+
+WHY A THREAD?
+──────────────
+Rich's Live owns the main thread, and a blocking XREAD would freeze
+it. So the reader runs in a daemon thread and only touches MarketView
+under its lock. Whenever it applies a batch it sets `changed`; the
+render loop sleeps on that Event. A quiet market means one XREAD
+parked on the server, no renders and no other commands — the old
+loop ran three queries and rebuilt every table twice a second
+whether anything moved or not.
+
+SNAPSHOT, THEN DELTAS
+──────────────────────
+Start: one md snapshot (every level + mid, tagged with its seq) and
+the last few trades for the tape. Then XREAD from that seq, forever.
+If an event doesn't follow the one before (the stream was trimmed
+past us), or a quiet read finds the stream ending before our seq
+(Redis was flushed or restarted), BookReplica says so and we take a
+fresh snapshot — the only time the dashboard re-reads the book.
+"""
+
+from __future__ import annotations
+
+import heapq
+import threading
+import time
+from collections import deque
+
+import redis as syncredis
+
+from src.config import DEFAULT_SYMBOL, MD_BLOCK_MS, get_sync_redis
+from src.consumer.book import sync_get_recent_trades
+from src.consumer.market_data import (
+    BookReplica, MdEvent, sync_get_md_snapshot, sync_md_head, sync_md_read,
+)
+from src.models import from_lots, from_ticks
+
+
+class MarketView:
+    """
+    Levels, mid and recent trades for one symbol.
+
+    The feed thread writes, the render loop reads; both hold `lock`.
+    book_version / tape_version tick on every change so the renderer
+    can skip panels whose data didn't move.
+    """
+
+    def __init__(self, symbol: str = DEFAULT_SYMBOL, tape_depth: int = 15):
+        self.symbol = symbol
+        self.lock = threading.Lock()
+        self.changed = threading.Event()
+        self.book = BookReplica(symbol)
+        self.tape: deque[dict] = deque(maxlen=tape_depth)
+        self.trades_seen = 0                   # fills on the tape since start
+        self.book_version = 0
+        self.tape_version = 0
+        self.updated_at: float | None = None
+        self.status = "connecting"
+
+    def add_trade(self, trade: dict) -> None:
+        if any(t.get("trade_id") == trade.get("trade_id") for t in self.tape):
+            return
+        self.tape.appendleft(trade)
+        self.trades_seen += 1
+        self.tape_version += 1
+
+    def touched(self) -> None:
+        """Call with the lock held after a write: wakes the renderer."""
+        self.updated_at = time.time()
+        self.changed.set()
+
+    def top(self, depth: int) -> tuple[list[tuple[float, float]], list[tuple[float, float]]]:
+        """Best `depth` levels per side as (price, qty) in display units, best first."""
+        bids = heapq.nlargest(depth, self.book.bids.items())
+        asks = heapq.nsmallest(depth, self.book.asks.items())
+        return _display(bids), _display(asks)
+
+
+def _display(levels: list[tuple[int, int]]) -> list[tuple[float, float]]:
+    return [(from_ticks(price), from_lots(qty)) for price, qty in levels]
+
+
+class BookFeed(threading.Thread):
+    """Daemon thread keeping one MarketView in step with md:stream."""
+
+    def __init__(self, view: MarketView, block_ms: int = MD_BLOCK_MS):
+        super().__init__(name=f"book-feed-{view.symbol}", daemon=True)
+        self.view = view
+        self.block_ms = block_ms               # quiet this long → check for a reset
+
+    def run(self) -> None:
+        while True:
+            r = get_sync_redis()
+            try:
+                self._resync(r)
+                while True:
+                    events = sync_md_read(r, self.view.book.seq, self.view.symbol, block_ms=self.block_ms)
+                    if events:
+                        if not self._apply(events):
+                            self._resync(r)
+                    elif self.view.book.behind(sync_md_head(r, self.view.symbol)):
+                        self._resync(r)
+            except syncredis.ConnectionError as e:
+                with self.view.lock:
+                    self.view.status = f"reconnecting ({e})"
+                    self.view.touched()
+                time.sleep(1.0)
+            finally:
+                r.close()
+
+    def _resync(self, r: syncredis.Redis) -> None:
+        snapshot = sync_get_md_snapshot(r, self.view.symbol)
+        trades   = sync_get_recent_trades(r, n=self.view.tape.maxlen, symbol=self.view.symbol)
+        with self.view.lock:
+            self.view.book.load(snapshot)
+            self.view.book_version += 1
+            for trade in reversed(trades):     # oldest first: the tape prepends
+                self.view.add_trade(trade)
+            self.view.status = f"live · resyncs {self.view.book.gaps}"
+            self.view.touched()
+
+    def _apply(self, events: list[MdEvent]) -> bool:
+        """Apply a batch; False as soon as one doesn't follow (gap → resync)."""
+        with self.view.lock:
+            try:
+                for event in events:
+                    if not self.view.book.apply(event):
+                        return False
+                    if event.type == "trade":
+                        self.view.add_trade(event.fields)
+                    else:
+                        self.view.book_version += 1
+            finally:
+                self.view.touched()
+        return True
@@ -3,25 +3,34 @@ Live terminal dashboard using Rich.
 
 ARCHITECTURE
 ─────────────
-Rich's Live context manager takes over the terminal and re-renders
-a Layout on every refresh cycle. We poll Redis every 0.5s and
-rebuild the tables from the current sorted set state.
+Rich's Live context manager takes over the terminal. It no longer
+refreshes on a timer: a background thread (dashboard/feed.py) keeps
+a local MarketView current from the engine's sequenced market-data
+stream — level changes, fills, mid — and the main loop below sleeps
+until that view changes.
 
 We use the SYNC Redis client here because Rich's Live runs in the
 main thread (sync context). The async client would require running
 an event loop inside the Live loop — unnecessary complexity.
 
-WHY POLLING INSTEAD OF PUB/SUB FOR THE DASHBOARD?
-────────────────────────────────────────────────────
-Pub/Sub would give us instant trade notifications but:
-  1. It doesn't give us the full book state — just trade events
-  2. It requires a blocking subscribe loop which conflicts with
-     Rich's own render loop
-  3. For a 0.5s refresh rate, polling Redis is trivially cheap
-
-The trades hash (trades:latest) gives us everything we need.
-Pub/Sub would be the right choice if we were building a WebSocket
-server that pushes updates to a browser — different use case.
+WHY PUSH INSTEAD OF POLLING?
+─────────────────────────────
+This used to poll: three queries and a full Layout rebuild every
+0.5s. Push was ruled out because trades:channel only carried
+trades, not the book. Now the engine logs every level change on
+md:stream, so the events *are* the book, and the objections go away:
+  1. Full state = one snapshot at start + the deltas after it
+  2. The blocking read lives in its own thread
+  3. A fill is on screen as soon as it's committed, and a quiet
+     market costs nothing — no queries, no renders
+
+DELTA RENDERING
+────────────────
+The Layout is built once. On each wake-up only the panels whose
+data changed get a new renderable (MarketView's version counters
+say which), then one live.refresh(). Bursts are coalesced: after a
+render we wait MIN_RENDER_INTERVAL before looking again, so a
+thousand level updates in a second cost ~20 renders, not a thousand.
 
 LAYOUT
 ───────
@@ -50,26 +59,24 @@ from rich.panel import Panel
 from rich.table import Table
 from rich.text import Text
 
-from src.config import get_sync_redis, INITIAL_MID_PRICE
-from src.consumer.book import (
-    sync_get_book_snapshot,
-    sync_get_mid_price,
-    sync_get_recent_trades,
-)
+from src.config import DEFAULT_SYMBOL
+from src.dashboard.feed import BookFeed, MarketView
+from src.models import from_lots, from_ticks
 
 
-REFRESH_RATE = 0.5   # seconds between renders
-BOOK_DEPTH   = 10    # price levels shown per side
-TAPE_DEPTH   = 15    # recent trades shown
+MIN_RENDER_INTERVAL = 0.05   # seconds; at most ~20 renders/s in a burst
+BOOK_DEPTH          = 10     # price levels shown per side
+TAPE_DEPTH          = 15     # recent trades shown
 
 
 def build_book_table(
-    bids: list[tuple[str, float]],
-    asks: list[tuple[str, float]],
+    bids: list[tuple[float, float]],
+    asks: list[tuple[float, float]],
     mid: float | None,
 ) -> Table:
     """
-    Renders the order book ladder.
+    Renders the order book ladder, one row per price level
+    (bids/asks are (price, total_qty) pairs, best first).
 
     Asks displayed top (lowest ask first, ascending up the table).
     Mid price in the center.
@@ -87,14 +94,14 @@ def build_book_table(
         padding=(0, 1),
         expand=True,
     )
-    table.add_column("order id",  style="dim",    width=10)
+    table.add_column("qty",       justify="right", width=10)
     table.add_column("price",     justify="right", width=10)
     table.add_column("side",      justify="center",width=6)
 
     # Asks: show in reverse (lowest ask at the bottom, closest to mid)
-    for oid, price in reversed(asks[:BOOK_DEPTH]):
+    for price, qty in reversed(asks[:BOOK_DEPTH]):
         table.add_row(
-            Text(oid[:8], style="dim"),
+            Text(f"{qty:.1f}", style="dim"),
             Text(f"{price:.2f}", style="bold red"),
             Text("ASK", style="red"),
         )
@@ -108,9 +115,9 @@ def build_book_table(
     )
 
     # Bids: highest first
-    for oid, price in bids[:BOOK_DEPTH]:
+    for price, qty in bids[:BOOK_DEPTH]:
         table.add_row(
-            Text(oid[:8], style="dim"),
+            Text(f"{qty:.1f}", style="dim"),
             Text(f"{price:.2f}", style="bold green"),
             Text("BID", style="green"),
         )
@@ -139,8 +146,8 @@ def build_tape_table(trades: list[dict]) -> Table:
 
     for t in trades[:TAPE_DEPTH]:
         try:
-            price    = float(t.get("price", 0))
-            qty      = float(t.get("qty", 0))
+            price    = from_ticks(int(t.get("price", 0)))
+            qty      = from_lots(int(t.get("qty", 0)))
             buyer    = str(t.get("buyer_id", "?"))[:13]
             seller   = str(t.get("seller_id", "?"))[:13]
             ts       = float(t.get("timestamp", 0))
@@ -169,10 +176,12 @@ def build_stats_bar(
     bids: list,
     asks: list,
     trade_count: int,
+    n_bids: int,
+    n_asks: int,
 ) -> Text:
-    """Footer stats line."""
-    best_bid = bids[0][1]  if bids  else None
-    best_ask = asks[0][1]  if asks  else None
+    """Footer stats line. n_bids / n_asks count every level, not just the shown ones."""
+    best_bid = bids[0][0]  if bids  else None
+    best_ask = asks[0][0]  if asks  else None
     spread   = (best_ask - best_bid) if (best_bid and best_ask) else None
 
     parts = []
@@ -181,79 +190,96 @@ def build_stats_bar(
     parts.append(f"ask: [red]{best_ask:.2f}[/red]" if best_ask else "ask: [dim]---[/dim]")
     parts.append(f"spread: [cyan]{spread:.4f}[/cyan]" if spread else "spread: [dim]---[/dim]")
     parts.append(f"trades: [white]{trade_count}[/white]")
-    parts.append(f"depth: [dim]{len(bids)}b / {len(asks)}a[/dim]")
+    parts.append(f"levels: [dim]{n_bids}b / {n_asks}a[/dim]")
 
     return Text.from_markup("   |   ".join(parts))
 
 
-def run_dashboard() -> None:
+def build_header(symbol: str, status: str, updated_at: float | None) -> Panel:
+    when = datetime.fromtimestamp(updated_at).strftime("%H:%M:%S") if updated_at else "---"
+    return Panel(
+        Text.from_markup(
+            f"[bold]redis order book simulator[/bold]  {symbol}   "
+            f"[dim]{status} · last update {when}[/dim]"
+        ),
+        border_style="dim",
+    )
+
+
+def build_layout(symbol: str) -> Layout:
+    """The fixed frame; run_dashboard swaps the panels inside it."""
+    layout = Layout()
+    layout.split_column(
+        Layout(build_header(symbol, "connecting", None), name="header", size=3),
+        Layout(name="body", ratio=1),
+        Layout(name="footer", size=3),
+    )
+    layout["body"].split_row(
+        Layout(name="book", ratio=1),
+        Layout(name="tape", ratio=2),
+    )
+    return layout
+
+
+def run_dashboard(symbol: str = DEFAULT_SYMBOL) -> None:
     """
-    Main dashboard loop.
+    Main dashboard loop for one symbol's book.
 
     Rich's Live context manager handles terminal takeover and
-    cleanup. On every tick we fetch state from Redis and rebuild
-    all tables from scratch — simple and always consistent.
+    cleanup. BookFeed keeps the MarketView current; every time it
+    signals a change we copy what we need under the lock, rebuild
+    only the panels whose version moved, and refresh once.
     """
-    r       = get_sync_redis()
+    view    = MarketView(symbol, tape_depth=TAPE_DEPTH)
     console = Console()
-    trade_count = 0
+    layout  = build_layout(symbol)
+    BookFeed(view).start()
 
+    book_seen = tape_seen = -1
     with Live(
+        layout,
         console=console,
-        refresh_per_second=int(1 / REFRESH_RATE),
+        auto_refresh=False,   # we refresh when the view changes, never on a timer
         screen=True,          # takes over full terminal
     ) as live:
         while True:
             try:
-                bids, asks  = sync_get_book_snapshot(r, depth=BOOK_DEPTH)
-                mid         = sync_get_mid_price(r)
-                trades      = sync_get_recent_trades(r, n=TAPE_DEPTH)
-                trade_count = len(trades)
-
-                book_panel  = Panel(
-                    build_book_table(bids, asks, mid),
-                    title="[bold]order book[/bold]",
-                    border_style="dim",
-                    padding=(0, 1),
-                )
-                tape_panel  = Panel(
-                    build_tape_table(trades),
-                    title="[bold]trade tape[/bold]",
+                view.changed.wait()
+                with view.lock:
+                    view.changed.clear()
+                    book_version, tape_version = view.book_version, view.tape_version
+                    if book_version != book_seen:
+                        bids, asks = view.top(BOOK_DEPTH)
+                        mid        = view.book.mid
+                        n_bids, n_asks = len(view.book.bids), len(view.book.asks)
+                    if tape_version != tape_seen:
+                        trades = list(view.tape)
+                    trade_count = view.trades_seen
+                    status, updated_at = view.status, view.updated_at
+
+                layout["header"].update(build_header(symbol, status, updated_at))
+                if book_version != book_seen:
+                    layout["book"].update(Panel(
+                        build_book_table(bids, asks, mid),
+                        title="[bold]order book[/bold]",
+                        border_style="dim",
+                        padding=(0, 1),
+                    ))
+                    book_seen = book_version
+                if tape_version != tape_seen:
+                    layout["tape"].update(Panel(
+                        build_tape_table(trades),
+                        title="[bold]trade tape[/bold]",
+                        border_style="dim",
+                        padding=(0, 1),
+                    ))
+                    tape_seen = tape_version
+                layout["footer"].update(Panel(
+                    build_stats_bar(mid, bids, asks, trade_count, n_bids, n_asks),
                     border_style="dim",
-                    padding=(0, 1),
-                )
-                stats       = build_stats_bar(mid, bids, asks, trade_count)
-
-                layout = Layout()
-                layout.split_column(
-                    Layout(
-                        Panel(
-                            Text.from_markup(
-                                f"[bold]redis order book simulator[/bold]   "
-                                f"[dim]{datetime.now().strftime('%H:%M:%S')}[/dim]"
-                            ),
-                            border_style="dim",
-                        ),
-                        name="header",
-                        size=3,
-                    ),
-                    Layout(name="body", ratio=1),
-                    Layout(
-                        Panel(stats, border_style="dim"),
-                        name="footer",
-                        size=3,
-                    ),
-                )
-                layout["body"].split_row(
-                    Layout(book_panel,  name="book", ratio=1),
-                    Layout(tape_panel,  name="tape", ratio=2),
-                )
-
-                live.update(layout)
-                time.sleep(REFRESH_RATE)
+                ))
+                live.refresh()
+                time.sleep(MIN_RENDER_INTERVAL)
 
             except KeyboardInterrupt:
                 break
-            except Exception as e:
-                console.print(f"[red]dashboard error: {e}[/red]")
-                time.sleep(1)
\ No newline at end of file
@@ -0,0 +1,194 @@
+"""
+One Redis reader, many viewers — the gateway's fan-out core.
+
+WHY A GATEWAY?
+───────────────
+Every viewer that talks to Redis directly (the Rich dashboard,
+server.js) costs Redis a connection and its own reads: a hundred
+browser tabs are a hundred pollers. The hub reads md:stream once —
+one blocking XREAD covering every symbol, on one connection — keeps
+a BookReplica per symbol, and pushes to as many clients as connect.
+Redis load no longer depends on how many people are watching.
+
+CONFLATION, NOT QUEUES
+───────────────────────
+The obvious fan-out is a queue per client. Its failure mode: one
+slow client (bad wifi, a backgrounded tab) lets its queue grow
+without bound, and the gateway runs out of memory on behalf of
+someone who couldn't read the data anyway.
+
+Market data has a better option, because a book update supersedes
+the one before it. A Subscriber holds no book updates at all, only a
+dirty flag. Its writer (gateway/server.py) wakes when the flag is set,
+renders the book *as it is now*, writes it, waits for the socket to
+drain, then sleeps GATEWAY_INTERVAL. A fast client sees every state
+the interval allows; a slow one gets the latest state whenever it is
+ready for more — everything in between is conflated away.
+
+Trades can't be merged like that, so each Subscriber keeps them in a
+deque(maxlen=GATEWAY_TRADE_BUFFER). On overflow the oldest fall out
+and the next push says how many were skipped. Either way the memory
+per client is bounded, whatever its speed.
+
+RENDER ONCE PER SEQ
+────────────────────
+A thousand clients asking for the top 10 levels at the same seq get
+the same JSON: book_payload caches the last rendering per (symbol,
+depth), so the heap walk and the json.dumps happen once per change,
+not once per client.
+
+Clients get prices and quantities as plain decimals: md:stream's
+ticks and lots are scaled here, once per event, so a browser never
+needs to know config.PRICE_SCALE.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import json
+from collections import deque
+
+import redis.asyncio as aioredis
+
+from src.config import (
+    GATEWAY_MAX_DEPTH, GATEWAY_TRADE_BUFFER, MD_BLOCK_MS, get_async_redis, keys_for,
+)
+from src.consumer.market_data import BookReplica, MdEvent, get_md_snapshot, md_head
+from src.models import from_lots, from_ticks
+
+
+class Subscriber:
+    """One connected client: a dirty flag plus a bounded trade buffer."""
+
+    def __init__(self, symbol: str, depth: int):
+        self.symbol = symbol
+        self.depth = depth
+        self.dirty = asyncio.Event()
+        self.trades: deque[dict] = deque(maxlen=GATEWAY_TRADE_BUFFER)
+        self.skipped = 0                       # trades dropped since the last push
+        self.sent_seq = -1                     # seq of the last book pushed
+
+    def on_trade(self, trade: dict) -> None:
+        if len(self.trades) == self.trades.maxlen:
+            self.skipped += 1
+        self.trades.append(trade)
+        self.dirty.set()
+
+    def take_trades(self) -> tuple[list[dict], int]:
+        """Everything buffered since the last push, and how many didn't fit."""
+        trades, skipped = list(self.trades), self.skipped
+        self.trades.clear()
+        self.skipped = 0
+        return trades, skipped
+
+
+class MarketHub:
+    """
+    Follows md:stream for `symbols` and fans every change out to the
+    Subscribers of that symbol. Start run() as a task; wait for
+    `ready` before serving clients.
+    """
+
+    def __init__(self, symbols: list[str]):
+        self.replicas = {s: BookReplica(s) for s in symbols}
+        self.subscribers: dict[str, set[Subscriber]] = {s: set() for s in symbols}
+        self.ready = asyncio.Event()
+        self.events = 0                        # md events applied so far
+        self._rendered: dict[tuple[str, int], tuple[int, str]] = {}
+
+    # ── Client side ──────────────────────────────────────────────
+
+    def subscribe(self, symbol: str, depth: int) -> Subscriber:
+        sub = Subscriber(symbol, clamp_depth(depth))
+        self.subscribers[symbol].add(sub)
+        sub.dirty.set()                        # first push: the current book
+        return sub
+
+    def unsubscribe(self, sub: Subscriber) -> None:
+        self.subscribers[sub.symbol].discard(sub)
+
+    def book_payload(self, symbol: str, depth: int) -> tuple[int, str]:
+        """(seq, JSON) of the top `depth` levels per side — see RENDER ONCE PER SEQ."""
+        replica = self.replicas[symbol]
+        depth = clamp_depth(depth)
+        cached = self._rendered.get((symbol, depth))
+        if cached and cached[0] == replica.seq:
+            return cached
+        payload = json.dumps({
+            "symbol": symbol,
+            "seq":    replica.seq,
+            "mid":    replica.mid,
+            "bids":   _display(heapq.nlargest(depth, replica.bids.items())),
+            "asks":   _display(heapq.nsmallest(depth, replica.asks.items())),
+        })
+        self._rendered[(symbol, depth)] = (replica.seq, payload)
+        return replica.seq, payload
+
+    # ── Redis side ───────────────────────────────────────────────
+
+    async def run(self) -> None:
+        while True:
+            r = get_async_redis()
+            try:
+                for symbol in self.replicas:
+                    await self._resync(r, symbol)
+                self.ready.set()
+                streams = {keys_for(s).md: s for s in self.replicas}
+                while True:
+                    reply = await r.xread(
+                        {key: f"0-{self.replicas[s].seq}" for key, s in streams.items()},
+                        count=1000, block=MD_BLOCK_MS,
+                    )
+                    if not reply:
+                        await self._check_resets(r)
+                    for key, entries in reply:
+                        symbol = streams[key.decode()]
+                        await self._dispatch(r, symbol, [MdEvent.from_entry(i, d) for i, d in entries])
+            except aioredis.ConnectionError as e:
+                print(f"[gateway] connection lost ({e}), resyncing in 1s")
+                await asyncio.sleep(1.0)
+            finally:
+                await r.aclose()
+
+    async def _dispatch(self, r: aioredis.Redis, symbol: str, events: list[MdEvent]) -> None:
+        replica, subs = self.replicas[symbol], self.subscribers[symbol]
+        for event in events:
+            if not replica.apply(event):
+                await self._resync(r, symbol)
+                return
+            self.events += 1
+            if event.type == "trade" and subs:
+                trade = {
+                    **event.fields,
+                    "price": from_ticks(int(event.fields["price"])),
+                    "qty":   from_lots(int(event.fields["qty"])),
+                }
+                for sub in subs:
+                    sub.on_trade(trade)
+        for sub in subs:
+            sub.dirty.set()
+
+    async def _check_resets(self, r: aioredis.Redis) -> None:
+        """Quiet for MD_BLOCK_MS: resync any symbol whose stream was recreated."""
+        for symbol, replica in self.replicas.items():
+            if replica.behind(await md_head(r, symbol)):
+                await self._resync(r, symbol)
+
+    async def _resync(self, r: aioredis.Redis, symbol: str) -> None:
+        self.replicas[symbol].load(await get_md_snapshot(r, symbol))
+        # After a reset the seqs start over, so a cached rendering or a
+        # client's sent_seq can match a new seq with an old book.
+        self._rendered = {key: v for key, v in self._rendered.items() if key[0] != symbol}
+        for sub in self.subscribers[symbol]:
+            sub.sent_seq = -1
+            sub.dirty.set()
+
+
+def clamp_depth(depth: int) -> int:
+    """1..GATEWAY_MAX_DEPTH, so the render cache has a bounded number of keys."""
+    return max(1, min(depth, GATEWAY_MAX_DEPTH))
+
+
+def _display(levels: list[tuple[int, int]]) -> list[tuple[float, float]]:
+    return [(from_ticks(price), from_lots(qty)) for price, qty in levels]
@@ -0,0 +1,163 @@
+"""
+Server-Sent Events over plain asyncio — the gateway's HTTP side.
+
+ENDPOINTS
+──────────
+  GET /events?symbol=SIM&depth=10   text/event-stream, forever:
+        event: book    {"symbol", "seq", "mid", "bids", "asks"}
+        event: trades  {"symbol", "trades": [...], "skipped": n}
+  GET /snapshot?symbol=SIM&depth=10 the same book JSON, once
+  GET /stats                        clients per symbol, events applied
+
+depth must be 1..GATEWAY_MAX_DEPTH (400 otherwise): every distinct
+depth is one more rendering cached per seq, and a huge one would be
+the whole book in every push.
+
+Try it with `curl -N localhost:8081/events?symbol=SIM`, or from a
+page with `new EventSource("/events?symbol=SIM")`.
+
+WHY SSE AND NOT WEBSOCKET?
+───────────────────────────
+The data only flows one way, server → browser. SSE is just a
+long-lived HTTP response with "event:/data:" lines, so it needs no
+handshake, no frame masking, no library — asyncio.start_server and
+a dozen lines of HTTP parsing do it, and the project keeps its three
+dependencies. Browsers reconnect an EventSource by themselves.
+WebSocket earns its keep when clients talk back (server.js does,
+for its own UI), which a market-data viewer doesn't.
+
+BACKPRESSURE
+─────────────
+writer.write() only appends to the transport's buffer; drain() is
+where a slow client makes us wait — and only this client's writer
+task waits. Meanwhile the hub keeps marking the Subscriber dirty
+instead of queueing, so the next push after drain() is the current
+book (hub.py: CONFLATION, NOT QUEUES). Per client that's at most one
+transport buffer (the 64 KiB high-water mark) plus the trade deque.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from urllib.parse import parse_qs, urlsplit
+
+from src.config import (
+    DEFAULT_SYMBOL, GATEWAY_DEPTH, GATEWAY_HOST, GATEWAY_INTERVAL, GATEWAY_KEEPALIVE,
+    GATEWAY_MAX_DEPTH, GATEWAY_PORT,
+)
+from src.gateway.hub import MarketHub, Subscriber
+
+
+async def serve(
+    symbols: list[str],
+    host: str = GATEWAY_HOST,
+    port: int = GATEWAY_PORT,
+) -> None:
+    """Start the hub, wait for its first snapshots, then accept clients forever."""
+    hub = MarketHub(symbols)
+    reader_task = asyncio.create_task(hub.run())
+    await hub.ready.wait()
+
+    server = await asyncio.start_server(
+        lambda reader, writer: handle(hub, reader, writer), host, port,
+    )
+    print(f"[gateway] http://{host}:{port}/events?symbol={symbols[0]}  ({', '.join(symbols)})")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        reader_task.cancel()
+
+
+async def handle(hub: MarketHub, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """One HTTP request: route it, then close (SSE: when the client goes away)."""
+    try:
+        request_line = await reader.readline()
+        while (await reader.readline()).strip():   # headers: nothing we need
+            pass
+        method, target, _ = request_line.decode("latin-1").split(" ", 2)
+        url   = urlsplit(target)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        symbol = query.get("symbol", DEFAULT_SYMBOL)
+        depth  = query.get("depth", str(GATEWAY_DEPTH))
+
+        if method != "GET":
+            await respond(writer, 405, "text/plain", "GET only\n")
+        elif url.path == "/stats":
+            await respond(writer, 200, "application/json", json.dumps({
+                "clients": {s: len(subs) for s, subs in hub.subscribers.items()},
+                "events":  hub.events,
+            }))
+        elif symbol not in hub.replicas:
+            await respond(writer, 404, "text/plain", f"unknown symbol {symbol}\n")
+        elif not (depth.isdigit() and 1 <= int(depth) <= GATEWAY_MAX_DEPTH):
+            await respond(writer, 400, "text/plain", f"depth must be 1..{GATEWAY_MAX_DEPTH}\n")
+        elif url.path == "/snapshot":
+            await respond(writer, 200, "application/json", hub.book_payload(symbol, int(depth))[1])
+        elif url.path == "/events":
+            await stream_events(hub, hub.subscribe(symbol, int(depth)), writer)
+        else:
+            await respond(writer, 404, "text/plain", "not found\n")
+    except (ConnectionError, ValueError):
+        pass                                        # client left, or sent garbage
+    finally:
+        writer.close()
+
+
+async def respond(writer: asyncio.StreamWriter, status: int, content_type: str, body: str) -> None:
+    data = body.encode()
+    writer.write(
+        f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(data)}\r\n"
+        f"Access-Control-Allow-Origin: *\r\n"
+        f"Connection: close\r\n\r\n".encode() + data
+    )
+    await writer.drain()
+
+
+async def stream_events(hub: MarketHub, sub: Subscriber, writer: asyncio.StreamWriter) -> None:
+    """
+    The per-client writer loop: wait until dirty, push what changed,
+    drain, rest GATEWAY_INTERVAL. A comment line every
+    GATEWAY_KEEPALIVE seconds of silence keeps proxies from closing
+    the connection — and is how we notice a vanished client when the
+    market is quiet.
+    """
+    writer.write(
+        b"HTTP/1.1 200 OK\r\n"
+        b"Content-Type: text/event-stream\r\n"
+        b"Cache-Control: no-cache\r\n"
+        b"Access-Control-Allow-Origin: *\r\n\r\n"
+    )
+    try:
+        while True:
+            try:
+                await asyncio.wait_for(sub.dirty.wait(), GATEWAY_KEEPALIVE)
+            except asyncio.TimeoutError:
+                writer.write(b": keepalive\n\n")
+                await writer.drain()
+                continue
+            sub.dirty.clear()
+
+            trades, skipped = sub.take_trades()
+            if trades:
+                writer.write(sse("trades", json.dumps(
+                    {"symbol": sub.symbol, "trades": trades, "skipped": skipped},
+                )))
+            seq, book = hub.book_payload(sub.symbol, sub.depth)
+            if seq != sub.sent_seq:
+                writer.write(sse("book", book))
+                sub.sent_seq = seq
+            await writer.drain()
+            await asyncio.sleep(GATEWAY_INTERVAL)
+    finally:
+        hub.unsubscribe(sub)
+
+
+def sse(event: str, data: str) -> bytes:
+    return f"event: {event}\ndata: {data}\n\n".encode()
+
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed"}
@@ -0,0 +1,271 @@
+"""
+Engine instrumentation: latency histograms, counters, sampled logs.
+
+WHY NOT JUST PRINT?
+────────────────────
+The engine used to print a line per trade, a line per rested order and
+a summary every 50 orders. At a few orders per second that's harmless;
+at thousands it's a write() syscall per order on the hot path, and a
+terminal scrolling too fast to read anyway. And "50 orders processed"
+says nothing about *how long* anything took.
+
+So the engine records numbers instead, and publishes them in bulk:
+
+  Histogram   latency distribution, HDR-style buckets (below)
+  counters    monotonically increasing totals (orders, trades, ...)
+  gauges      point-in-time values (PEL size, stream lag, ...)
+  SampledLog  the per-order log lines, 1-in-N, buffered, one JSON
+              object per line
+
+Every METRICS_INTERVAL seconds the registry is rendered once to a
+Prometheus textfile (node_exporter's textfile collector, or just cat)
+and once to a Redis hash (redis-cli HGETALL metrics:engine:<consumer>).
+
+HDR-STYLE HISTOGRAMS
+─────────────────────
+Latency spans six orders of magnitude (µs for a local match, seconds
+for a backed-up stream), and the tail is what matters. A fixed-width
+bucket array either wastes memory or blurs the tail; storing every
+sample grows without bound.
+
+HdrHistogram's trick: log-linear buckets. Values below 2·SUB are
+counted exactly; above that, each power of two is split into SUB
+equal sub-buckets. With SUB = 32 every bucket is at most 1/32 ≈ 3%
+wide relative to its value — at 10 µs and at 10 s alike — and the
+whole range up to 2^40 fits in ~1.2k counters. record() is a couple
+of integer ops and a list increment; percentiles are one walk over
+the counts.
+
+LATENCY STAGES
+───────────────
+An order's life, as the engine sees it:
+
+  order.timestamp ──► stream ID ──► match complete ──► trades published
+     (producer)       (XADD, ms)      (engine)          (commit EXEC)
+      publish_us        match_us          commit_us
+  └──────────────────────── end_to_end_us ──────────────────────────┘
+
+Redis stream IDs start with the server's millisecond clock at XADD, so
+the "stream ID" stamp is free and has ms resolution. Producer and
+engine clocks only agree as well as the hosts' clocks do; negative
+intervals (skew) are clamped to 0.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import TextIO
+
+import redis.asyncio as aioredis
+
+from src.config import LOG_SAMPLE_EVERY, METRICS_DIR, METRICS_KEY_PREFIX
+
+_SUB_BITS = 5
+_SUB      = 1 << _SUB_BITS            # sub-buckets per power of two
+_MAX_EXP  = 40                        # values ≥ 2^40 land in the last bucket
+_BUCKETS  = 2 * _SUB + (_MAX_EXP - _SUB_BITS - 1) * _SUB
+
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+
+# ── Histogram ────────────────────────────────────────────────────
+
+def _bucket(value: int) -> int:
+    if value < 2 * _SUB:
+        return max(value, 0)
+    shift = value.bit_length() - _SUB_BITS - 1
+    index = 2 * _SUB + (shift - 1) * _SUB + (value >> shift) - _SUB
+    return min(index, _BUCKETS - 1)
+
+
+def _bucket_high(index: int) -> int:
+    """Largest value that lands in bucket `index` (what percentiles report)."""
+    if index < 2 * _SUB:
+        return index
+    shift, offset = divmod(index - 2 * _SUB, _SUB)
+    shift += 1
+    return ((offset + _SUB + 1) << shift) - 1
+
+
+class Histogram:
+    """Log-linear latency histogram over non-negative integers (µs here)."""
+
+    __slots__ = ("name", "help", "counts", "count", "total", "max")
+
+    def __init__(self, name: str, help: str):
+        self.name   = name
+        self.help   = help
+        self.counts = [0] * _BUCKETS
+        self.count  = 0
+        self.total  = 0
+        self.max    = 0
+
+    def record(self, value: int) -> None:
+        value = max(int(value), 0)
+        self.counts[_bucket(value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: Histogram) -> None:
+        """Add another histogram's samples (e.g. from another process)."""
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, q: float) -> int:
+        """Value at quantile q (0..1), to within one bucket; 0 if empty."""
+        if not self.count:
+            return 0
+        rank = max(1, round(q * self.count))
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(_bucket_high(index), self.max)
+        return self.max
+
+
+# ── Registry ─────────────────────────────────────────────────────
+
+class Metrics:
+    """
+    One engine process's counters, gauges and histograms.
+
+    Names are Prometheus-style (snake_case, _total for counters, unit
+    suffix for histograms) and get the "engine_" prefix on export.
+    Every exported sample carries a consumer="<name>" label, so several
+    engines can share one textfile directory or dashboard.
+    """
+
+    def __init__(self, consumer: str):
+        self.consumer = consumer
+        self.counters: dict[str, float] = {}
+        self.gauges: dict[str, float] = {}
+        self.histograms: dict[str, Histogram] = {}
+
+    def histogram(self, name: str, help: str) -> Histogram:
+        if name not in self.histograms:
+            self.histograms[name] = Histogram(name, help)
+        return self.histograms[name]
+
+    def inc(self, name: str, n: float = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def set(self, name: str, value: float | None) -> None:
+        if value is not None:
+            self.gauges[name] = value
+
+    # ── Export ───────────────────────────────────────────────────
+
+    def render_prometheus(self) -> str:
+        """Text exposition format; histograms as summaries (quantiles + sum + count)."""
+        label = f'consumer="{self.consumer}"'
+        lines: list[str] = []
+
+        def header(name: str, kind: str, help: str | None) -> None:
+            if help:
+                lines.append(f"# HELP engine_{name} {help}")
+            lines.append(f"# TYPE engine_{name} {kind}")
+
+        for name, value in sorted(self.counters.items()):
+            header(name, "counter", None)
+            lines.append(f"engine_{name}{{{label}}} {value:g}")
+        for name, value in sorted(self.gauges.items()):
+            header(name, "gauge", None)
+            lines.append(f"engine_{name}{{{label}}} {value:g}")
+        for name, h in sorted(self.histograms.items()):
+            header(name, "summary", h.help)
+            for q in QUANTILES:
+                lines.append(f'engine_{name}{{{label},quantile="{q}"}} {h.percentile(q)}')
+            lines.append(f"engine_{name}_sum{{{label}}} {h.total}")
+            lines.append(f"engine_{name}_count{{{label}}} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def to_hash(self) -> dict[str, str]:
+        """Flat field → value mapping for HSET (p50/p99/... per histogram)."""
+        fields = {name: f"{v:g}" for name, v in {**self.counters, **self.gauges}.items()}
+        for name, h in self.histograms.items():
+            fields[f"{name}:count"] = str(h.count)
+            fields[f"{name}:max"] = str(h.max)
+            for q in QUANTILES:
+                fields[f"{name}:p{q * 100:g}"] = str(h.percentile(q))
+        fields["updated_at"] = f"{time.time():.3f}"
+        return fields
+
+    async def export(self, r: aioredis.Redis, directory: str | Path = METRICS_DIR) -> None:
+        """
+        Write the textfile (atomically: temp file + rename, so a scraper
+        never reads half a file) and replace the Redis hash.
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{self.consumer}.prom"
+        tmp = path.with_suffix(".prom.tmp")
+        tmp.write_text(self.render_prometheus())
+        os.replace(tmp, path)
+
+        key = f"{METRICS_KEY_PREFIX}:{self.consumer}"
+        pipe = r.pipeline()
+        pipe.delete(key)
+        pipe.hset(key, mapping=self.to_hash())
+        await pipe.execute()
+
+
+# ── Sampled, buffered logs ───────────────────────────────────────
+
+class SampledLog:
+    """
+    Structured per-order log lines without per-order syscalls.
+
+    event() keeps the first occurrence of each kind and then every
+    `every`-th one; each kept line records n (how many of that kind
+    so far), so a reader can still tell volume. Lines are buffered
+    and written in one go when the buffer fills, when `flush_after`
+    seconds have passed, or on flush().
+    """
+
+    def __init__(
+        self,
+        source: str,
+        every: int = LOG_SAMPLE_EVERY,
+        flush_after: float = 1.0,
+        capacity: int = 256,
+        out: TextIO = sys.stdout,
+    ):
+        self.source      = source
+        self.every       = max(every, 1)
+        self.flush_after = flush_after
+        self.capacity    = capacity
+        self.out         = out
+        self.seen: dict[str, int] = {}
+        self._buffer: list[str] = []
+        self._flushed_at = time.monotonic()
+
+    def event(self, kind: str, **fields) -> None:
+        n = self.seen[kind] = self.seen.get(kind, 0) + 1
+        if (n - 1) % self.every == 0:
+            self.write(kind, n=n, **fields)
+
+    def write(self, kind: str, **fields) -> None:
+        """Log unconditionally (summaries, rare events)."""
+        self._buffer.append(json.dumps(
+            {"ts": round(time.time(), 6), "src": self.source, "event": kind, **fields},
+            separators=(",", ":"),
+        ))
+        if len(self._buffer) >= self.capacity or \
+                time.monotonic() - self._flushed_at >= self.flush_after:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._buffer:
+            self.out.write("\n".join(self._buffer) + "\n")
+            self.out.flush()
+            self._buffer.clear()
+        self._flushed_at = time.monotonic()
@@ -4,22 +4,70 @@ Core data models for the order book simulator.
 Why dataclasses?
   Clean, typed, no boilerplate. We'll serialize to/from Redis
   manually (dicts of strings) so we don't need Pydantic here.
+  slots=True: no per-instance __dict__. A resting order is one of
+  these for as long as it sits in the book; dropping the dict takes
+  about a fifth off each (~240 → ~190 bytes with its field values).
 
-Why frozen=True on Order?
-  Orders should be immutable once created. If the matching engine
-  needs to partially fill an order it creates a *new* Order with
-  reduced qty — it never mutates the original. This keeps the
-  stream log accurate (the stream entry always reflects the
-  original intent).
+Why integers for price and qty?
+  0.1 + 0.2 != 0.3. With float quantities, "fully filled" had to mean
+  "within 1e-9 of zero" in four places (Python and Lua), level totals
+  summed to 12.099999999999998, and "99.5" could be parsed into a
+  price one ulp off the level it belonged to. Real venues never had
+  this problem: a price is an integer number of ticks, a quantity an
+  integer number of lots. So is ours (config.PRICE_SCALE, QTY_SCALE).
+  Every comparison is exact, every sum is exact, and Redis stores
+  "10050" for 100.50 — the same string in a sorted-set score, a depth
+  hash field and an order hash. Producers convert once, with to_ticks
+  / to_lots, when they turn a strategy's float into an order; readers
+  that show numbers to people convert back with from_ticks / from_lots.
+
+Why is Order mutable?
+  qty is the *open* quantity. When a LIMIT order only partly fills,
+  the in-memory book rests the Order object itself with qty cut to
+  what's left, and partial fills against it decrement qty in place.
+  The old frozen Order meant a new Order per remainder and a
+  copy-on-snapshot per book change — allocations on the hottest path
+  the engine has. The stream entry is safe anyway: it's encoded
+  (journal, XADD) before matching ever sees the object.
+
+Why integer ids?
+  An id from next_id() is a plain int: cheap to hash and compare, a
+  fixed 8 bytes in the packed format and the engine's journal, and
+  increasing within a process, so one trader's ids sort by creation.
+  Across processes they're kept apart by a random prefix (see
+  next_id).
+
+Why two wire formats?
+  to_stream_dict writes every attribute as its own string field —
+  easy to read in redis-cli, but the engine re-parses seven strings
+  (two of them into enums, four into numbers) for every entry it
+  reads. to_packed_dict writes the whole order as ONE binary field:
+  a fixed struct, integers plus the float timestamp. from_stream_dict
+  recognises either, so the stream can hold a mix of both while
+  producers are switched over (config.WIRE_FORMAT).
+
+Why a second message type?
+  An order stream that can only add orders forces every cancel to go
+  around the engine, straight at the book keys — racing the matcher
+  and costing the producer an extra round-trip. CancelReplace puts
+  cancels on the stream too: the engine applies them in stream order,
+  between the orders that came before and after, like any exchange.
+  decode_message tells the two apart by the "type" field.
 """
 
 from __future__ import annotations
 
+import itertools
+import json
+import os
+import secrets
+import struct
 import time
-import uuid
 from dataclasses import dataclass, field
 from enum import StrEnum
 
+from src.config import DEFAULT_SYMBOL, PRICE_SCALE, QTY_SCALE
+
 
 class Side(StrEnum):
     BID = "bid"   # buy order — willing to pay UP TO price
@@ -31,7 +79,69 @@ class OrderType(StrEnum):
     MARKET = "market"  # execute immediately at best available price
 
 
-@dataclass(frozen=True)
+class MessageType(StrEnum):
+    ORDER = "order"        # a new order (entries without a type field)
+    CANCEL = "cancel"      # pull resting orders
+    REPLACE = "replace"    # pull resting orders, then enter new ones — as one step
+
+
+# ── Fixed point ──────────────────────────────────────────────────
+
+def to_ticks(price: float) -> int:
+    """A price in currency units → the nearest whole tick (99.5 → 9950)."""
+    return round(price * PRICE_SCALE)
+
+
+def to_lots(qty: float) -> int:
+    """A quantity in units → the nearest whole lot (2.5 → 25)."""
+    return round(qty * QTY_SCALE)
+
+
+def from_ticks(ticks: int) -> float:
+    """Ticks → currency units, for display and for the float mid."""
+    return ticks / PRICE_SCALE
+
+
+def from_lots(lots: int) -> float:
+    """Lots → units, for display."""
+    return lots / QTY_SCALE
+
+
+# ── Ids ──────────────────────────────────────────────────────────
+#
+# 53 bits: a random 21-bit prefix per process, then a 32-bit counter.
+# 53 so an id survives being a JSON number in a browser or a double
+# in Lua. The prefix is redrawn in a forked child, which would
+# otherwise continue its parent's sequence.
+
+_ID_COUNTER_BITS = 32
+
+
+def _reset_ids() -> None:
+    global _ids
+    _ids = itertools.count(secrets.randbits(53 - _ID_COUNTER_BITS) << _ID_COUNTER_BITS)
+
+
+def next_id() -> int:
+    """A fresh order / trade id: unique, and increasing within this process."""
+    return next(_ids)
+
+
+_reset_ids()
+os.register_at_fork(after_in_child=_reset_ids)
+
+
+# ── Packed wire layout ───────────────────────────────────────────
+# Little-endian, 33-byte fixed head + two length-prefixed strings:
+#   u8 flags | u64 order_id | i64 price (ticks) | i64 qty (lots) | f64 timestamp
+#   | u8 len, trader_id | u8 len, symbol
+PACKED_FIELD  = b"o"
+_PACKED_HEAD  = struct.Struct("<BQqqd")
+_FLAG_ASK     = 0x01   # clear = BID
+_FLAG_MARKET  = 0x02   # clear = LIMIT; price ticks are 0 and ignored
+
+
+@dataclass(slots=True)
 class Order:
     """
     A single order in the system.
@@ -40,35 +150,48 @@ class Order:
       All of them. Redis stores everything as strings, so we convert
       on the way in (to_stream_dict) and on the way out (from_stream_dict).
 
-    price: float | None
-      None only for MARKET orders. The engine handles this specially —
-      a market order crosses at whatever the best opposing price is.
+    price: int | None
+      In ticks. None only for MARKET orders. The engine handles this
+      specially — a market order crosses at whatever the best opposing
+      price is.
+
+    qty: int
+      In lots, and the *open* quantity: the book decrements it as the
+      order fills (see "Why is Order mutable?" above).
+
+    symbol: str
+      Which instrument's book this order belongs to. Picks the stream
+      and key namespace (config.keys_for). Stream entries written
+      before symbols existed decode as DEFAULT_SYMBOL.
     """
-    order_id: str
+    order_id: int
     trader_id: str
     side: Side
     order_type: OrderType
-    price: float | None   # None = market order
-    qty: float
+    price: int | None     # ticks; None = market order
+    qty: int              # lots still open
     timestamp: float = field(default_factory=time.time)
+    symbol: str = DEFAULT_SYMBOL
 
     @classmethod
     def create(
         cls,
         trader_id: str,
         side: Side,
-        qty: float,
-        price: float | None = None,
+        qty: int,
+        price: int | None = None,
         order_type: OrderType = OrderType.LIMIT,
+        symbol: str = DEFAULT_SYMBOL,
     ) -> Order:
-        """Factory — auto-generates order_id and timestamp."""
+        """Factory — auto-generates order_id and timestamp. qty in lots, price in ticks."""
         return cls(
-            order_id=str(uuid.uuid4())[:8],
+            order_id=next_id(),
             trader_id=trader_id,
             side=side,
             order_type=order_type,
             price=price,
             qty=qty,
+            symbol=symbol,
         )
 
     def to_stream_dict(self) -> dict[str, str]:
@@ -76,62 +199,208 @@ class Order:
         Serialize to a flat dict of strings for XADD.
 
         Redis Streams store fields as key-value string pairs.
-        XADD orders:stream '*' side bid price 100.5 qty 10.0 ...
+        XADD orders:stream '*' side bid price 10050 qty 100 ...
                                   ^   ^    ^    ^      ^   ^
                                   field   value pairs, all strings
+                                  (price in ticks, qty in lots)
         """
         return {
-            "order_id":   self.order_id,
+            "order_id":   str(self.order_id),
             "trader_id":  self.trader_id,
             "side":       self.side.value,
             "order_type": self.order_type.value,
             "price":      str(self.price) if self.price is not None else "market",
             "qty":        str(self.qty),
             "timestamp":  str(self.timestamp),
+            "symbol":     self.symbol,
         }
 
+    def to_packed(self) -> bytes:
+        """
+        Binary encoding (layout above). Raises struct.error if the
+        order doesn't fit it (a negative id, a trader_id or symbol of
+        256 bytes or more).
+        """
+        flags = _FLAG_ASK if self.side == Side.ASK else 0
+        if self.price is None:
+            flags |= _FLAG_MARKET
+
+        trader = self.trader_id.encode()
+        symbol = self.symbol.encode()
+        if len(trader) > 255 or len(symbol) > 255:
+            raise struct.error("trader_id and symbol must be under 256 bytes")
+        return b"".join((
+            _PACKED_HEAD.pack(flags, self.order_id, self.price or 0, self.qty, self.timestamp),
+            bytes((len(trader),)), trader,
+            bytes((len(symbol),)), symbol,
+        ))
+
+    def to_packed_dict(self) -> dict[bytes, bytes] | dict[str, str]:
+        """
+        XADD fields for the packed format: {b"o": to_packed()}.
+
+        Orders that can't be packed (see to_packed) fall back to
+        to_stream_dict — the reader handles both.
+        """
+        try:
+            return {PACKED_FIELD: self.to_packed()}
+        except struct.error:
+            return self.to_stream_dict()
+
+    @classmethod
+    def from_packed(cls, buf: bytes) -> Order:
+        """Inverse of to_packed."""
+        flags, order_id, ticks, qty, timestamp = _PACKED_HEAD.unpack_from(buf)
+        pos = _PACKED_HEAD.size
+        end = pos + 1 + buf[pos]
+        trader_id = buf[pos + 1:end].decode()
+        symbol = buf[end + 1:end + 1 + buf[end]].decode()
+        market = flags & _FLAG_MARKET
+        return cls(
+            order_id=   order_id,
+            trader_id=  trader_id,
+            side=       Side.ASK if flags & _FLAG_ASK else Side.BID,
+            order_type= OrderType.MARKET if market else OrderType.LIMIT,
+            price=      None if market else ticks,
+            qty=        qty,
+            timestamp=  timestamp,
+            symbol=     symbol,
+        )
+
     @classmethod
     def from_stream_dict(cls, data: dict[bytes, bytes]) -> Order:
         """
         Deserialize from the dict redis-py gives us after XREAD.
 
         redis-py returns bytes by default, so we decode everything.
-        The 'price' field is special: "market" → None, else float.
+        int() parses the bytes directly. The 'price' field is special:
+        "market" → None, else ticks. A packed entry (single b"o" field)
+        is handed to from_packed.
         """
-        price_raw = data[b"price"].decode()
+        packed = data.get(PACKED_FIELD)
+        if packed is not None:
+            return cls.from_packed(packed)
+        price_raw = data[b"price"]
         return cls(
-            order_id=   data[b"order_id"].decode(),
+            order_id=   int(data[b"order_id"]),
             trader_id=  data[b"trader_id"].decode(),
             side=       Side(data[b"side"].decode()),
             order_type= OrderType(data[b"order_type"].decode()),
-            price=      None if price_raw == "market" else float(price_raw),
-            qty=        float(data[b"qty"]),
+            price=      None if price_raw == b"market" else int(price_raw),
+            qty=        int(data[b"qty"]),
+            timestamp=  float(data[b"timestamp"]),
+            symbol=     data[b"symbol"].decode() if b"symbol" in data else DEFAULT_SYMBOL,
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class CancelReplace:
+    """
+    A CANCEL or REPLACE message: pull some of the trader's resting
+    orders, then (REPLACE) enter new ones — one stream entry, applied
+    by the engine as one step.
+
+    cancel_ids are only order ids: the engine knows where each resting
+    order sits (LocalBook's index, or order:<id> in Redis). Ids that
+    are no longer resting — filled, already cancelled — or that belong
+    to another trader are ignored.
+
+    orders are the new legs, matched in sequence after the cancels. A
+    market maker's requote is one REPLACE: cancel last cycle's bid and
+    ask, enter this cycle's. Every leg must share the message's
+    trader_id and symbol (it lives on that symbol's stream).
+    """
+    trader_id: str
+    cancel_ids: tuple[int, ...] = ()
+    orders: tuple[Order, ...] = ()
+    timestamp: float = field(default_factory=time.time)
+    symbol: str = DEFAULT_SYMBOL
+
+    def __post_init__(self) -> None:
+        for order in self.orders:
+            if order.trader_id != self.trader_id or order.symbol != self.symbol:
+                raise ValueError(
+                    f"leg {order.order_id} is {order.trader_id}/{order.symbol}, "
+                    f"message is {self.trader_id}/{self.symbol}"
+                )
+
+    @property
+    def type(self) -> MessageType:
+        return MessageType.REPLACE if self.orders else MessageType.CANCEL
+
+    def to_stream_dict(self) -> dict[str, str]:
+        """
+        Flat string fields for XADD. The legs are nested as a JSON list
+        of their own to_stream_dict()s; there's no packed layout, so
+        WIRE_FORMAT doesn't apply (book.publish_order).
+
+        XADD orders:stream * type replace trader_id market-maker ...
+                             cancel 5120000000001,5120000000002 orders [{...},{...}]
+        """
+        return {
+            "type":      self.type.value,
+            "trader_id": self.trader_id,
+            "cancel":    ",".join(map(str, self.cancel_ids)),
+            "orders":    json.dumps([order.to_stream_dict() for order in self.orders]),
+            "timestamp": str(self.timestamp),
+            "symbol":    self.symbol,
+        }
+
+    @classmethod
+    def from_stream_dict(cls, data: dict[bytes, bytes]) -> CancelReplace:
+        cancel = data.get(b"cancel", b"")
+        legs = json.loads(data.get(b"orders", b"[]"))
+        return cls(
+            trader_id=  data[b"trader_id"].decode(),
+            cancel_ids= tuple(map(int, cancel.split(b","))) if cancel else (),
+            orders=     tuple(
+                Order.from_stream_dict({k.encode(): v.encode() for k, v in leg.items()})
+                for leg in legs
+            ),
             timestamp=  float(data[b"timestamp"]),
+            symbol=     data[b"symbol"].decode(),
         )
 
 
-@dataclass
+# Anything the engine reads off an orders stream.
+Message = Order | CancelReplace
+
+
+def decode_message(data: dict[bytes, bytes]) -> Message:
+    """Stream entry fields → Order or CancelReplace, by the "type" field."""
+    kind = data.get(b"type")
+    if kind is None or kind == b"order":
+        return Order.from_stream_dict(data)
+    return CancelReplace.from_stream_dict(data)
+
+
+@dataclass(slots=True)
 class Trade:
     """
     A matched trade — produced by the matching engine when a bid
     crosses an ask.
 
     Why NOT frozen?
-      Trades are created once and never read back from Redis in this
-      phase — they're published to Pub/Sub and stored in a hash.
-      No need for immutability here.
+      Trades are created once and never read back as Trade objects —
+      they're published to Pub/Sub and appended to the trades:tape
+      stream, and readers of either get plain dicts. No need for
+      immutability here.
+
+    price and qty are ticks and lots, like Order's — also on the tape
+    and trades:channel. Viewers scale them for display.
     """
-    trade_id: str
-    bid_order_id: str
-    ask_order_id: str
+    trade_id: int
+    bid_order_id: int
+    ask_order_id: int
     buyer_id: str
     seller_id: str
-    price: float    # always the resting order's price (maker price)
-    qty: float
+    price: int      # always the resting order's price (maker price)
+    qty: int
     timestamp: float = field(default_factory=time.time)
+    symbol: str = DEFAULT_SYMBOL
 
     @classmethod
-    def create(cls, bid: Order, ask: Order, qty: float) -> Trade:
+    def create(cls, bid: Order, ask: Order, qty: int, price: int | None = None) -> Trade:
         """
         The matched price is always the *maker* (resting) order's price.
 
@@ -139,28 +408,32 @@ class Trade:
         waiting. The taker arrived and crossed. The trade clears at the
         price the maker was advertising.
 
-        In our case: whichever order had the earlier timestamp is the maker.
+        The matchers know which order rested and pass its price; without
+        one, whichever order had the earlier timestamp is the maker.
         """
-        maker = bid if bid.timestamp < ask.timestamp else ask
+        if price is None:
+            price = (bid if bid.timestamp < ask.timestamp else ask).price
         return cls(
-            trade_id=     str(uuid.uuid4())[:8],
+            trade_id=     next_id(),
             bid_order_id= bid.order_id,
             ask_order_id= ask.order_id,
             buyer_id=     bid.trader_id,
             seller_id=    ask.trader_id,
-            price=        maker.price,  # type: ignore[arg-type]
+            price=        price,  # type: ignore[arg-type]
             qty=          qty,
+            symbol=       bid.symbol,
         )
 
     def to_hash_dict(self) -> dict[str, str]:
-        """Serialize for HSET into trades:latest hash."""
+        """Serialize as flat string fields — one trades:tape stream entry."""
         return {
-            "trade_id":     self.trade_id,
-            "bid_order_id": self.bid_order_id,
-            "ask_order_id": self.ask_order_id,
+            "trade_id":     str(self.trade_id),
+            "bid_order_id": str(self.bid_order_id),
+            "ask_order_id": str(self.ask_order_id),
             "buyer_id":     self.buyer_id,
             "seller_id":    self.seller_id,
             "price":        str(self.price),
             "qty":          str(self.qty),
             "timestamp":    str(self.timestamp),
+            "symbol":       self.symbol,
         }
\ No newline at end of file
@@ -2,64 +2,157 @@
 Abstract base class for all producers.
 
 Every producer shares the same skeleton:
-  - holds a Redis connection
-  - knows the current mid price (read from Redis)
+  - holds a Redis client (its own, or one shared by the process)
+  - knows the current mid price (kept in Redis, cached locally)
   - implements generate_orders() — the behavioral logic
   - runs in an async loop via run()
 
 WHY READ MID PRICE FROM REDIS?
 ────────────────────────────────
 All three producers need a shared reference price to quote around.
-We store it in Redis (book:mid) so every producer sees the same
+We store it in Redis (book:mid, or book:mid:<SYMBOL> — each producer
+trades exactly one symbol) so every producer sees the same
 value — even if you later run producers in separate processes.
 This is the "single source of truth" pattern. If each producer
 tracked its own mid price internally, they'd drift apart and
 produce unrealistic order flow.
 
 The matching engine updates book:mid every time a trade executes.
-Producers poll it at the start of each cycle. So price discovery
+Producers read it at the start of each cycle. So price discovery
 is real — trades move the mid, producers react to the new mid.
+
+Reading it doesn't cost a round-trip, though: every write is also
+PUBLISHed, and a MidPriceCache (producers/mid_cache.py) shared by
+all producers in the process keeps the latest value. Without one
+(self.mids is None) get_mid_price falls back to a plain GET.
+
+SEEDED, SIDE-EFFECT-FREE REPLAYS
+──────────────────────────────────
+Producers draw every random number from self.rng, and every
+interaction with the outside world goes through one small method:
+
+  get_mid_price / set_mid_price   read (cache) / write + publish book:mid
+  make_order                      Order.create (fresh id + timestamp;
+                                  qty in lots, price in ticks)
+  send / send_many                XADD (orders and CANCEL / REPLACE messages)
+
+run() uses the Redis versions. benchmarks/matching.py passes a seeded
+random.Random and overrides the rest, so the same behavioral logic
+produces the same order flow every time without touching Redis.
+src/sim/ overrides them the same way but keeps run() itself: on its
+virtual-clock event loop, asyncio.sleep(self.interval) takes no time.
+
+ONE ROUND TRIP PER CYCLE
+─────────────────────────
+A cycle's messages go out together: send_many queues one XADD per
+message on a non-transactional pipeline and awaits the lot once, so
+a strategy that emits k orders per cycle pays one round trip, not k.
+(The built-in ones emit at most one message per cycle — the market
+maker's quotes travel as a single REPLACE — so for them this costs
+nothing extra; it's there for strategies that quote more.) The
+pipeline runs on one connection, so the stream sees a cycle's
+messages in list order.
+
+No MULTI: the messages are independent, and an engine may read the
+first one before the second lands without harm.
+
+SHARED CLIENT
+──────────────
+run_producers.py sets self.r to one client per process, over a small
+BlockingConnectionPool (config.get_pooled_async_redis), before run().
+Producers sleep most of the time, so a few sockets serve all of them.
+A producer started without one opens (and later closes) its own.
 """
 
 from __future__ import annotations
 
 import asyncio
+import random
 from abc import ABC, abstractmethod
 
 import redis.asyncio as aioredis
 
-from src.config import INITIAL_MID_PRICE, MID_PRICE_KEY, get_async_redis
-from src.consumer.book import publish_order
-from src.models import Order
+from src.config import DEFAULT_SYMBOL, INITIAL_MID_PRICE, get_async_redis, keys_for
+from src.consumer.book import publish_order, queue_mid, queue_publish_order
+from src.models import Message, Order, OrderType, Side
+from src.producers.mid_cache import MidPriceCache
 
 
 class BaseProducer(ABC):
-    def __init__(self, trader_id: str, interval: float):
+    def __init__(
+        self,
+        trader_id: str,
+        interval: float,
+        symbol: str = DEFAULT_SYMBOL,
+        rng: random.Random | None = None,
+    ):
         """
         trader_id : identifies this producer in trade records
         interval  : seconds between order generation cycles
+        symbol    : the instrument this producer trades
+        rng       : source of randomness (seed it for reproducible flow)
         """
         self.trader_id = trader_id
         self.interval  = interval
-        self.r: aioredis.Redis | None = None
+        self.symbol    = symbol
+        self.keys      = keys_for(symbol)
+        self.rng       = rng or random.Random()
+        self.r: aioredis.Redis | None = None     # set by run_producers.py (shared)
+        self.mids: MidPriceCache | None = None   # set by run_producers.py
 
     async def get_mid_price(self) -> float:
         """
-        Read current mid price from Redis.
+        Current mid price: from the shared cache if there is one,
+        otherwise read from Redis.
         Falls back to INITIAL_MID_PRICE if not set yet.
         """
-        val = await self.r.get(MID_PRICE_KEY)
+        if self.mids is not None:
+            return self.mids.get(self.symbol)
+        val = await self.r.get(self.keys.mid)
         return float(val) if val else INITIAL_MID_PRICE
 
-    async def send(self, order: Order) -> None:
-        """Publish one order to the stream."""
+    async def set_mid_price(self, mid: float) -> None:
+        """Write + announce a new mid price for every producer on this symbol."""
+        pipe = self.r.pipeline()
+        queue_mid(pipe, self.symbol, mid)
+        await pipe.execute()
+
+    def make_order(
+        self,
+        side: Side,
+        qty: int,
+        price: int | None = None,
+        order_type: OrderType = OrderType.LIMIT,
+    ) -> Order:
+        """
+        A new order from this trader on this symbol. Strategies think in
+        floats; they hand over to_lots(qty) and to_ticks(price), which
+        is where a price lands on the tick grid.
+        """
+        return Order.create(self.trader_id, side, qty=qty, price=price,
+                            order_type=order_type, symbol=self.symbol)
+
+    async def send(self, order: Message) -> None:
+        """Publish one order (or CANCEL / REPLACE message) to the stream."""
         await publish_order(self.r, order)
 
+    async def send_many(self, orders: list[Message]) -> None:
+        """Publish a cycle's messages, in order, in one round trip."""
+        if len(orders) == 1:
+            await self.send(orders[0])
+        elif orders:
+            pipe = self.r.pipeline(transaction=False)
+            for order in orders:
+                queue_publish_order(pipe, order)
+            await pipe.execute()
+
     @abstractmethod
-    async def generate_orders(self, mid: float) -> list[Order]:
+    async def generate_orders(self, mid: float) -> list[Message]:
         """
         Given the current mid price, return orders to send this cycle.
         Each subclass implements its own behavioral logic here.
+        Cancels are messages too (models.CancelReplace) — nothing
+        touches the book except through the stream.
         """
         ...
 
@@ -68,24 +161,26 @@ class BaseProducer(ABC):
         Main loop. Runs forever until cancelled.
 
         Each cycle:
-          1. Read mid price
+          1. Read mid price (local cache, or GET)
           2. Generate orders (subclass logic)
-          3. Publish each order to the stream
+          3. Publish them to the stream (send_many: one round trip)
           4. Sleep for interval
 
         asyncio.CancelledError is the clean shutdown signal —
         we let it propagate so the gather() in run_producers.py
         can shut everything down gracefully.
         """
-        self.r = get_async_redis()
-        print(f"[{self.trader_id}] starting, interval={self.interval}s")
+        owns_client = self.r is None
+        if owns_client:
+            self.r = get_async_redis()
+        print(f"[{self.trader_id}] starting on {self.symbol}, interval={self.interval}s")
         try:
             while True:
                 mid = await self.get_mid_price()
                 orders = await self.generate_orders(mid)
-                for order in orders:
-                    await self.send(order)
+                await self.send_many(orders)
                 await asyncio.sleep(self.interval)
         except asyncio.CancelledError:
             print(f"[{self.trader_id}] shutting down")
-            await self.r.aclose()
\ No newline at end of file
+            if owns_client:
+                await self.r.aclose()
\ No newline at end of file
@@ -0,0 +1,194 @@
+"""
+Open-loop load generation — thousands of traders at a fixed aggregate rate.
+
+WHY NOT JUST RUN MORE PRODUCERS?
+─────────────────────────────────
+run_producers.py is a *closed* loop: each producer sends, awaits the
+XADD, sleeps, and only then sends again. If Redis or the engine slows
+down, the producers slow down with it — the offered load quietly drops
+exactly when the system is struggling, and the measured latency stays
+flattering. Real clients don't wait for you.
+
+An open-loop generator fixes the schedule up front: order i is due at
+t0 + i / rate, whatever happened to order i-1. If a round-trip stalls,
+the orders that fell due meanwhile are sent as soon as it returns —
+as a backlog, in bigger batches — and the schedule keeps ticking.
+
+COORDINATED OMISSION
+─────────────────────
+Timing each send from when it actually left ("service time") hides
+the stall: the orders that should have gone out during it are simply
+not measured while it lasts, then measured as fast once it clears.
+That's coordinated omission — the generator co-operates with the
+system under test to omit its worst moments.
+
+So latency is measured from each order's *intended* send time, not
+from when the generator got to it: an order due 40 ms ago that is
+acknowledged now took 40 ms, however quick its own XADD was. Both
+numbers are reported; the gap between them is the omission. Orders
+also carry the intended time as their timestamp, which makes the
+engine's end_to_end_latency_us histogram (src/metrics.py) corrected
+in the same way.
+
+PIPELINED BATCHES
+──────────────────
+Every pass sends everything that is due — up to `batch` orders — as
+one non-transactional pipeline of XADDs, so a high rate costs one
+round-trip per batch rather than per order.
+
+TRADERS
+────────
+The traders are the real MarketMaker / TrendFollower / NoiseTrader
+classes (6 noise : 3 market maker : 1 trend follower) with their
+Redis side effects rerouted: mids come from the process's
+MidPriceCache (pushed, like run_producers.py) and their own GBM steps
+stay private. Market-maker requotes are sent as the REPLACE messages
+they are, so the engine sees realistic cancel traffic too. Each due order is taken from the next trader in
+turn. Traders and the rate are split evenly across processes.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+
+from src.config import get_async_redis
+from src.consumer.book import queue_publish_order
+from src.metrics import Histogram
+from src.models import Order, OrderType, next_id
+from src.producers.base import BaseProducer
+from src.producers.market_maker import MarketMaker
+from src.producers.mid_cache import MidPriceCache
+from src.producers.noise_trader import NoiseTrader
+from src.producers.trend_follower import TrendFollower
+
+# Out of every 10 traders: 6 noise traders, 3 market makers, 1 trend follower
+TRADER_MIX = [NoiseTrader] * 6 + [MarketMaker] * 3 + [TrendFollower]
+
+
+@dataclass
+class LoadResult:
+    """One worker process's outcome; merged by run_loadgen.py."""
+    sent: int
+    elapsed: float
+    max_behind: float     # worst lag of a batch behind its schedule, seconds
+    corrected: Histogram  # µs from intended send time to XADD acknowledged
+    service: Histogram    # µs from actual send to XADD acknowledged
+
+
+class Clock:
+    """The intended send time of the order being generated (wall clock)."""
+    due_at: float = 0.0
+
+
+class LoadTrader:
+    """Mixin: a producer whose reads come from a cache and whose writes go nowhere."""
+
+    clock: Clock
+
+    async def set_mid_price(self, mid: float) -> None:
+        pass
+
+    def make_order(self, side, qty, price=None, order_type=OrderType.LIMIT) -> Order:
+        return Order(
+            order_id=  next_id(),
+            trader_id= self.trader_id,
+            side=      side,
+            order_type=order_type,
+            price=     price,
+            qty=       qty,
+            timestamp= self.clock.due_at,
+            symbol=    self.symbol,
+        )
+
+
+def make_traders(
+    count: int,
+    symbols: list[str],
+    worker: int,
+    seed: int,
+    mids: MidPriceCache,
+    clock: Clock,
+) -> list[BaseProducer]:
+    classes = {cls: type(f"Load{cls.__name__}", (LoadTrader, cls), {}) for cls in TRADER_MIX}
+    traders = []
+    for i in range(count):
+        base = TRADER_MIX[i % len(TRADER_MIX)]
+        trader = classes[base](
+            trader_id=f"load-{base.__name__.lower()}-{worker}-{i}",
+            symbol=symbols[i % len(symbols)],
+            rng=random.Random(f"{seed}:{worker}:{i}"),
+        )
+        trader.mids, trader.clock = mids, clock
+        traders.append(trader)
+    return traders
+
+
+async def generate_load(
+    rate: float,
+    duration: float,
+    traders: int,
+    symbols: list[str],
+    batch: int = 256,
+    worker: int = 0,
+    seed: int = 0,
+) -> LoadResult:
+    """
+    Publish rate × duration orders on an open-loop schedule.
+
+    Intended times are on the monotonic clock (start + i / rate); the
+    matching wall-clock instant goes into Order.timestamp.
+    """
+    r = get_async_redis()
+    mids = MidPriceCache(symbols)
+    clock = Clock()
+    population = make_traders(traders, symbols, worker, seed, mids, clock)
+    corrected = Histogram("corrected_us", "intended send → XADD acknowledged")
+    service = Histogram("service_us", "actual send → XADD acknowledged")
+    listener = asyncio.create_task(mids.run())
+    await mids.ready.wait()
+
+    total = int(rate * duration)
+    start = time.perf_counter()
+    wall_start = time.time()
+    sent = next_trader = 0
+    max_behind = 0.0
+    try:
+        while sent < total:
+            now = time.perf_counter()
+            due = min(total, int((now - start) * rate) + 1)
+            if due <= sent:
+                await asyncio.sleep(start + sent / rate - now)
+                continue
+
+            pipe = r.pipeline(transaction=False)
+            intended: list[float] = []
+            while len(intended) < min(due - sent, batch):
+                t = start + (sent + len(intended)) / rate
+                clock.due_at = wall_start + (t - start)
+                trader = population[next_trader % len(population)]
+                next_trader += 1
+                for order in await trader.generate_orders(await trader.get_mid_price()):
+                    queue_publish_order(pipe, order)
+                    intended.append(t)
+
+            sent_at = time.perf_counter()
+            max_behind = max(max_behind, sent_at - intended[0])
+            await pipe.execute()
+            acked_at = time.perf_counter()
+            for t in intended:
+                corrected.record((acked_at - t) * 1e6)
+                service.record((acked_at - sent_at) * 1e6)
+            sent += len(intended)
+    finally:
+        listener.cancel()
+        await r.aclose()
+
+    return LoadResult(sent, time.perf_counter() - start, max_behind, corrected, service)
+
+
+def run_worker(args: tuple) -> LoadResult:
+    """Process-pool entry point: one event loop per process."""
+    return asyncio.run(generate_load(*args))
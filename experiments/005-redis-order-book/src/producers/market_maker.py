@@ -10,7 +10,7 @@ view; they just want volume and tight spreads.
 
 BEHAVIOR
 ─────────
-Every cycle:
+Every cycle, ONE stream message (a REPLACE, models.CancelReplace):
   1. Cancel all own resting orders (quote refresh)
   2. Quote new BID at (mid - half_spread)
   3. Quote new ASK at (mid + half_spread)
@@ -25,10 +25,15 @@ it off immediately (this is called "being picked off" or "adverse
 selection"). Real MMs cancel and requote hundreds of times per
 second precisely to avoid this.
 
-We track resting order IDs in self._resting. Before each cycle we
-ZREM + DEL every ID we placed last cycle, then place fresh quotes.
-This keeps the book clean — only the current cycle's MM orders
-are ever live.
+We remember the IDs we quoted last cycle, and this cycle's REPLACE
+names them as its cancels. The engine applies it in stream order:
+pull the old quotes (if they haven't filled meanwhile), then enter
+the new ones — so only the current cycle's MM orders are ever live.
+
+This used to be two cancel calls straight at the book keys plus two
+XADDs. Going around the engine raced with matching (the engine could
+be halfway through filling a quote as it vanished) and cost extra
+round-trips every cycle; one message costs one XADD and can't race.
 
 QUOTE CANCELLATION vs SELF-TRADE PREVENTION
 ─────────────────────────────────────────────
@@ -37,9 +42,11 @@ These solve different problems:
   Quote cancellation    — prevents stale orders sitting in the book
 
 Both are needed. STP alone means stale quotes rest forever,
-blocking liquidity for other traders. Cancellation alone without
-STP means a brief race window where new quote crosses old quote.
-Together they're clean.
+blocking liquidity for other traders. A REPLACE removes the old
+quotes before its new ones match, so the two never meet — but it
+only cancels what it names. A restarted market maker has forgotten
+its previous IDs, and STP is what keeps its fresh quotes from
+trading with the ones it left behind.
 
 PARAMETERS
 ───────────
@@ -53,8 +60,8 @@ from __future__ import annotations
 
 import random
 
-from src.config import BIDS_KEY, ASKS_KEY, ORDER_DATA_PREFIX
-from src.models import Order, OrderType, Side
+from src.config import DEFAULT_SYMBOL
+from src.models import CancelReplace, Message, Side, to_lots, to_ticks
 from src.producers.base import BaseProducer
 
 
@@ -65,62 +72,42 @@ class MarketMaker(BaseProducer):
         spread_bps: float = 50.0,
         base_qty: float = 8.0,
         interval: float = 0.4,
+        symbol: str = DEFAULT_SYMBOL,
+        rng: random.Random | None = None,
     ):
-        super().__init__(trader_id, interval)
+        super().__init__(trader_id, interval, symbol, rng)
         self.spread_bps = spread_bps
         self.base_qty   = base_qty
         # Track IDs of our own resting orders so we can cancel them
-        self._resting_bid_id: str | None = None
-        self._resting_ask_id: str | None = None
-
-    async def _cancel_resting(self) -> None:
-        """
-        Remove our previous cycle's quotes from the book.
-
-        ZREM book:bids <order_id>   — removes from sorted set
-        DEL  order:<order_id>        — removes the hash
-
-        We pipeline both sides together — 4 commands, 1 round-trip.
-        If an order was already filled by the engine, ZREM and DEL
-        are no-ops (Redis ignores missing keys), so this is safe.
-        """
-        if not self._resting_bid_id and not self._resting_ask_id:
-            return
-
-        pipe = self.r.pipeline()
-        if self._resting_bid_id:
-            pipe.zrem(BIDS_KEY, self._resting_bid_id)
-            pipe.delete(f"{ORDER_DATA_PREFIX}{self._resting_bid_id}")
-        if self._resting_ask_id:
-            pipe.zrem(ASKS_KEY, self._resting_ask_id)
-            pipe.delete(f"{ORDER_DATA_PREFIX}{self._resting_ask_id}")
-        await pipe.execute()
-
-        self._resting_bid_id = None
-        self._resting_ask_id = None
-
-    async def generate_orders(self, mid: float) -> list[Order]:
-        # Cancel stale quotes before placing fresh ones
-        await self._cancel_resting()
+        self._resting_bid_id: int | None = None
+        self._resting_ask_id: int | None = None
 
+    async def generate_orders(self, mid: float) -> list[Message]:
         # Add a small random jitter to the spread each cycle —
         # simulates the MM adjusting to perceived volatility
-        spread_jitter = random.uniform(0.8, 1.4)
+        spread_jitter = self.rng.uniform(0.8, 1.4)
         half_spread   = mid * (self.spread_bps / 10_000) * spread_jitter
 
-        bid_price = round(mid - half_spread, 2)
-        ask_price = round(mid + half_spread, 2)
+        bid_price = to_ticks(mid - half_spread)
+        ask_price = to_ticks(mid + half_spread)
+
+        qty_bid = to_lots(self.base_qty * self.rng.uniform(0.5, 1.5))
+        qty_ask = to_lots(self.base_qty * self.rng.uniform(0.5, 1.5))
 
-        qty_bid = round(self.base_qty * random.uniform(0.5, 1.5), 1)
-        qty_ask = round(self.base_qty * random.uniform(0.5, 1.5), 1)
+        bid = self.make_order(Side.BID, qty=qty_bid, price=bid_price)
+        ask = self.make_order(Side.ASK, qty=qty_ask, price=ask_price)
 
-        bid = Order.create(self.trader_id, Side.BID, qty=qty_bid,
-                           price=bid_price, order_type=OrderType.LIMIT)
-        ask = Order.create(self.trader_id, Side.ASK, qty=qty_ask,
-                           price=ask_price, order_type=OrderType.LIMIT)
+        # Cancel stale quotes and place fresh ones — one atomic message
+        requote = CancelReplace(
+            trader_id=  self.trader_id,
+            cancel_ids= tuple(i for i in (self._resting_bid_id, self._resting_ask_id) if i is not None),
+            orders=     (bid, ask),
+            timestamp=  bid.timestamp,
+            symbol=     self.symbol,
+        )
 
         # Remember these IDs for cancellation next cycle
         self._resting_bid_id = bid.order_id
         self._resting_ask_id = ask.order_id
 
-        return [bid, ask]
\ No newline at end of file
+        return [requote]
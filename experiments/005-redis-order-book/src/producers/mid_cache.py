@@ -0,0 +1,96 @@
+"""
+Process-local mid prices, pushed by Redis instead of polled.
+
+WHY NOT GET book:mid EVERY CYCLE?
+──────────────────────────────────
+Every producer used to start each cycle with GET book:mid. With three
+producers per symbol that's noise; with thousands of simulated traders
+it's one round-trip per trader per cycle, almost all of them returning
+the value the previous trader just read. The mid changes when the
+noise trader steps its GBM or the engine prints a trade — far less
+often than it is read.
+
+So whoever writes the mid also announces it (book.queue_mid: SET +
+PUBLISH on mid:channel, in one MULTI), and each process keeps one
+subscriber connection that copies every announcement into a dict.
+Reading the mid is then a dict lookup: zero round-trips, however many
+producers share the process.
+
+WHY PUB/SUB AND NOT RESP3 CLIENT-SIDE CACHING?
+───────────────────────────────────────────────
+Client-side caching (CLIENT TRACKING) would do the same job for GET
+itself: the server remembers which keys a connection read and sends
+an invalidation when they change. But redis-py only offers it on its
+sync client, the producers are asyncio, and an invalidation still
+costs one GET to learn the new value. A mid price is one float — the
+message can simply carry it.
+
+SEEDING WITHOUT A GAP
+──────────────────────
+Pub/Sub has no history: a subscriber only hears what is published
+after it subscribes. So the cache subscribes first, waits until Redis
+confirms the subscriptions, and only then MGETs the current values.
+Anything published after the MGET arrives as a message; anything
+published before it is already in the MGET's answer. On a dropped
+connection it does the same again.
+"""
+
+from __future__ import annotations
+
+import asyncio
+
+import redis.asyncio as aioredis
+
+from src.config import INITIAL_MID_PRICE, get_async_redis, keys_for
+
+
+class MidPriceCache:
+    """
+    symbol → latest mid price, for every producer in this process.
+
+    Start run() as a task (it runs until cancelled), await ready
+    before trusting the values, then call get() as often as you like.
+    """
+
+    def __init__(self, symbols: list[str]):
+        self.symbols = list(symbols)
+        self.mids: dict[str, float] = {}
+        self.updates = 0                       # messages applied so far
+        self.ready = asyncio.Event()
+        self._by_channel = {keys_for(s).mid_channel.encode(): s for s in self.symbols}
+
+    def get(self, symbol: str) -> float:
+        """Latest known mid, INITIAL_MID_PRICE if nobody has set one yet."""
+        return self.mids.get(symbol, INITIAL_MID_PRICE)
+
+    async def run(self) -> None:
+        while True:
+            r = get_async_redis()
+            pubsub = r.pubsub()
+            try:
+                await self._subscribe(pubsub)
+                await self._seed(r)
+                self.ready.set()
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self.mids[self._by_channel[message["channel"]]] = float(message["data"])
+                        self.updates += 1
+            except aioredis.ConnectionError as e:
+                print(f"[mid-cache] connection lost ({e}), resubscribing in 1s")
+                await asyncio.sleep(1.0)
+            finally:
+                await pubsub.aclose()
+                await r.aclose()
+
+    async def _subscribe(self, pubsub: aioredis.client.PubSub) -> None:
+        """SUBSCRIBE and wait for every confirmation (see SEEDING WITHOUT A GAP)."""
+        await pubsub.subscribe(*self._by_channel)
+        confirmed = 0
+        while confirmed < len(self._by_channel):
+            message = await pubsub.get_message(timeout=1.0)
+            if message and message["type"] == "subscribe":
+                confirmed += 1
+
+    async def _seed(self, r: aioredis.Redis) -> None:
+        values = await r.mget([keys_for(s).mid for s in self.symbols])
+        self.mids.update({s: float(v) for s, v in zip(self.symbols, values) if v})
@@ -34,8 +34,9 @@ We use:
   σ = 0.002 (0.2% vol per step — realistic for a liquid stock)
   dt = interval (time between steps)
 
-The noise trader writes the new mid price to book:mid after each
-step. All other producers read this. So GBM drives the whole market.
+The noise trader writes the new mid price to its symbol's book:mid
+key after each step and publishes it on mid:channel, which is how the
+other producers' caches hear of it. So GBM drives the whole market.
 
 WHY THE NOISE TRADER OWNS THE PRICE PROCESS?
 ──────────────────────────────────────────────
@@ -57,10 +58,8 @@ from __future__ import annotations
 import math
 import random
 
-import redis.asyncio as aioredis
-
-from src.config import INITIAL_MID_PRICE, MID_PRICE_KEY
-from src.models import Order, OrderType, Side
+from src.config import DEFAULT_SYMBOL, INITIAL_MID_PRICE
+from src.models import Order, OrderType, Side, to_lots, to_ticks
 from src.producers.base import BaseProducer
 
 
@@ -72,8 +71,10 @@ class NoiseTrader(BaseProducer):
         sigma: float    = 0.002,
         base_qty: float = 5.0,
         interval: float = 0.6,
+        symbol: str     = DEFAULT_SYMBOL,
+        rng: random.Random | None = None,
     ):
-        super().__init__(trader_id, interval)
+        super().__init__(trader_id, interval, symbol, rng)
         self.mu       = mu
         self.sigma    = sigma
         self.base_qty = base_qty
@@ -90,7 +91,7 @@ class NoiseTrader(BaseProducer):
         from your stochastic calc course: it's the difference between
         the arithmetic and geometric mean in continuous time.
         """
-        Z   = random.gauss(0, 1)
+        Z   = self.rng.gauss(0, 1)
         dt  = self.interval
         log_return = (self.mu - 0.5 * self.sigma**2) * dt + self.sigma * math.sqrt(dt) * Z
         self._mid  = round(self._mid * math.exp(log_return), 4)
@@ -99,28 +100,25 @@ class NoiseTrader(BaseProducer):
     async def generate_orders(self, mid: float) -> list[Order]:
         # Step the GBM price process and write new mid to Redis
         new_mid = self._gbm_step(self.interval)
-        await self.r.set(MID_PRICE_KEY, str(new_mid))
+        await self.set_mid_price(new_mid)
 
         # Random side
-        side = random.choice([Side.BID, Side.ASK])
+        side = self.rng.choice([Side.BID, Side.ASK])
 
         # 15% chance of a market order — adds urgency/realism
-        is_market = random.random() < 0.15
+        is_market = self.rng.random() < 0.15
 
         if is_market:
-            return [Order.create(
-                self.trader_id, side,
-                qty=round(self.base_qty * random.uniform(0.5, 1.5), 1),
+            return [self.make_order(
+                side,
+                qty=to_lots(self.base_qty * self.rng.uniform(0.5, 1.5)),
                 order_type=OrderType.MARKET,
             )]
 
         # Limit order: price randomly distributed around mid
         # Wider distribution than MM (±2% vs MM's ±0.5%)
-        offset = new_mid * random.uniform(-0.02, 0.02)
-        price  = round(new_mid + offset, 2)
-        qty    = round(self.base_qty * random.uniform(0.5, 2.0), 1)
-
-        return [Order.create(
-            self.trader_id, side, qty=qty,
-            price=price, order_type=OrderType.LIMIT,
-        )]
\ No newline at end of file
+        offset = new_mid * self.rng.uniform(-0.02, 0.02)
+        price  = to_ticks(new_mid + offset)
+        qty    = to_lots(self.base_qty * self.rng.uniform(0.5, 2.0))
+
+        return [self.make_order(side, qty=qty, price=price)]
\ No newline at end of file
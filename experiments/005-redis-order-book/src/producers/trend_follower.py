@@ -39,7 +39,8 @@ from __future__ import annotations
 import random
 from collections import deque
 
-from src.models import Order, OrderType, Side
+from src.config import DEFAULT_SYMBOL
+from src.models import Order, Side, to_lots, to_ticks
 from src.producers.base import BaseProducer
 
 
@@ -52,8 +53,10 @@ class TrendFollower(BaseProducer):
         aggression: float = 30.0,   # bps through mid
         base_qty: float = 12.0,
         interval: float = 1.2,
+        symbol: str     = DEFAULT_SYMBOL,
+        rng: random.Random | None = None,
     ):
-        super().__init__(trader_id, interval)
+        super().__init__(trader_id, interval, symbol, rng)
         self.window     = window
         self.threshold  = threshold
         self.aggression = aggression
@@ -75,15 +78,13 @@ class TrendFollower(BaseProducer):
 
         # Price aggressively through mid to ensure immediate execution
         through = mid * (self.aggression / 10_000)
-        qty     = round(self.base_qty * random.uniform(0.8, 1.3), 1)
+        qty     = to_lots(self.base_qty * self.rng.uniform(0.8, 1.3))
 
         if momentum > 0:
             # Uptrend — buy aggressively
-            price = round(mid + through, 2)
-            return [Order.create(self.trader_id, Side.BID, qty=qty,
-                                 price=price, order_type=OrderType.LIMIT)]
+            price = to_ticks(mid + through)
+            return [self.make_order(Side.BID, qty=qty, price=price)]
         else:
             # Downtrend — sell aggressively
-            price = round(mid - through, 2)
-            return [Order.create(self.trader_id, Side.ASK, qty=qty,
-                                 price=price, order_type=OrderType.LIMIT)]
\ No newline at end of file
+            price = to_ticks(mid - through)
+            return [self.make_order(Side.ASK, qty=qty, price=price)]
\ No newline at end of file
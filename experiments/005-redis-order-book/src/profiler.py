@@ -0,0 +1,234 @@
+"""
+On-demand sampling profiler for a running engine.
+
+    kill -USR1 <engine pid>                          # PROFILE_SECONDS of samples
+    redis-cli PUBLISH profile:engine 30              # every engine, 30s
+    redis-cli PUBLISH profile:engine:engine-1 5      # just that consumer
+
+WHY SAMPLING?
+──────────────
+cProfile traces: a hook runs on every Python call and return. The
+engine makes millions of small calls (decode, match, queue), so
+tracing slows it two- or threefold — and a profile of an engine
+running at a third of its speed answers a different question. It also
+has to be switched on at start-up, and the slow-down we want to
+explain happens an hour later under load.
+
+A sampler looks instead of tracing. PROFILE_HZ times a second it reads
+the loop thread's current stack and counts it; a function that shows
+up in 30% of the samples spent ~30% of the time there. Between samples
+the engine runs untouched. And when nobody asked for a profile there
+is no sampler at all — only the signal handler and one idle Pub/Sub
+connection, neither of which costs anything until it fires.
+
+WHY A THREAD?
+──────────────
+The classic sampler is a SIGPROF timer, but CPython runs Python signal
+handlers on the main thread between bytecodes — inside the very loop
+we're watching. A separate thread can read any thread's frames with
+sys._current_frames() and stays out of the loop's way. It does need
+the GIL for each sample, and a thread asking for it waits up to the
+switch interval (5ms), so rates past ~200 Hz aren't honoured; 100 Hz
+over ten seconds is a thousand samples, plenty for a flame graph.
+
+TWO VIEWS
+──────────
+  <consumer>-<time>.cpu.folded     where the loop thread was: one line
+                                   per distinct stack, root first.
+                                   Time blocked in select() shows up
+                                   as select — the loop had nothing
+                                   to run.
+  <consumer>-<time>.await.folded   where every task was parked: each
+                                   task's chain of awaiting coroutines
+                                   (metrics_loop;export_metrics;...;
+                                   Future), or [running] for the one
+                                   on the CPU.
+
+The CPU view says what the matching costs; the await view says what
+each task is waiting for — a Redis round-trip, the engine lock, a
+sleep — which a CPU profile can't show, since waiting isn't on any
+stack. Both are in the "collapsed stack" format flamegraph.pl, inferno
+and speedscope.app read directly. A top-ten of the await view, as a
+share of wall time, is printed when sampling stops.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from types import FrameType
+
+import redis.asyncio as aioredis
+
+from src.config import (
+    PROFILE_CHANNEL, PROFILE_DIR, PROFILE_HZ, PROFILE_SECONDS, get_async_redis,
+)
+
+
+class SamplingProfiler:
+    """
+    Samples the thread that called start() — the event loop's — for
+    `seconds`, then writes both views to `directory`. One run at a
+    time: start() while sampling is a no-op that returns False.
+    """
+
+    def __init__(self, name: str, directory: str | Path = PROFILE_DIR, hz: int = PROFILE_HZ):
+        self.name = name
+        self.directory = Path(directory)
+        self.hz = max(hz, 1)
+        self.last: tuple[Path, Path] | None = None   # files of the last finished run
+        self._thread: threading.Thread | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds: float = PROFILE_SECONDS) -> bool:
+        """Begin sampling the calling loop. Must be called on the loop's thread."""
+        if self.running:
+            print("[profiler] already sampling, ignored")
+            return False
+        loop = asyncio.get_running_loop()
+        self._thread = threading.Thread(
+            target=self._sample,
+            args=(threading.get_ident(), loop, seconds),
+            name=f"profiler-{self.name}",
+            daemon=True,
+        )
+        print(f"[profiler] sampling {self.name} for {seconds:g}s at {self.hz} Hz")
+        self._thread.start()
+        return True
+
+    def _sample(self, thread_id: int, loop: asyncio.AbstractEventLoop, seconds: float) -> None:
+        stacks: Counter[str] = Counter()
+        awaits: Counter[str] = Counter()
+        samples = 0
+        interval = 1.0 / self.hz
+        started = next_at = time.monotonic()
+        while time.monotonic() < started + seconds:
+            frame = sys._current_frames().get(thread_id)
+            if frame is None:                       # the loop's thread has exited
+                break
+            stacks[";".join(frame_chain(frame))] += 1
+            del frame
+            running = asyncio.current_task(loop)
+            for task in asyncio.all_tasks(loop):
+                chain = await_chain(task.get_coro())
+                if task is running:
+                    chain.append("[running]")
+                awaits[";".join(chain)] += 1
+            samples += 1
+            next_at += interval
+            time.sleep(max(0.0, next_at - time.monotonic()))
+        self.last = self._dump(stacks, awaits, samples, time.monotonic() - started)
+
+    def _dump(self, stacks: Counter, awaits: Counter, samples: int, elapsed: float) -> tuple[Path, Path]:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        stem = f"{self.name}-{time.strftime('%Y%m%d-%H%M%S')}"
+        cpu, waits = self.directory / f"{stem}.cpu.folded", self.directory / f"{stem}.await.folded"
+        for path, counts in ((cpu, stacks), (waits, awaits)):
+            path.write_text("".join(f"{stack} {n}\n" for stack, n in counts.most_common()))
+
+        print(f"[profiler] {samples} samples in {elapsed:.1f}s → {cpu}, {waits}")
+        for share, task, leaf in await_breakdown(awaits, samples)[:10]:
+            print(f"[profiler]   {share:6.1%}  {task} … {leaf}")
+        return cpu, waits
+
+
+# ── Stacks ───────────────────────────────────────────────────────
+
+def frame_chain(frame: FrameType | None) -> list[str]:
+    """Root-first labels of a thread's stack: "qualname (file.py)"."""
+    labels = []
+    while frame is not None:
+        labels.append(_label(frame.f_code))
+        frame = frame.f_back
+    labels.reverse()
+    return labels
+
+
+def await_chain(awaitable) -> list[str]:
+    """
+    Follow a suspended coroutine down what it awaits: coroutine →
+    coroutine → ... → the Future (or Task) at the bottom. The chain
+    stops early at an `async for` step (async_generator_asend hides
+    its generator), so run_batches' wait for XREADGROUP ends there.
+    """
+    labels = []
+    while awaitable is not None:
+        code = (getattr(awaitable, "cr_code", None) or getattr(awaitable, "ag_code", None)
+                or getattr(awaitable, "gi_code", None))
+        if code is None:
+            labels.append(type(awaitable).__name__)
+            break
+        labels.append(_label(code))
+        awaitable = (getattr(awaitable, "cr_await", None) or getattr(awaitable, "ag_await", None)
+                     or getattr(awaitable, "gi_yieldfrom", None))
+    return labels
+
+
+def await_breakdown(awaits: Counter, samples: int) -> list[tuple[float, str, str]]:
+    """
+    (share of wall time, task, what it waited in), largest first. A
+    task is named by its root coroutine, a wait by the last coroutine
+    above the Future — the frame that actually said `await`.
+    """
+    totals: Counter[tuple[str, str]] = Counter()
+    for chain, n in awaits.items():
+        labels = chain.split(";")
+        coroutines = [label for label in labels if label.endswith(")")]
+        leaf = "[running]" if labels[-1] == "[running]" else (coroutines or labels)[-1]
+        totals[labels[0], leaf] += n
+    return [(n / max(samples, 1), task, leaf) for (task, leaf), n in totals.most_common()]
+
+
+def _label(code) -> str:
+    return f"{code.co_qualname} ({os.path.basename(code.co_filename)})"
+
+
+# ── Triggers ─────────────────────────────────────────────────────
+
+def install_signal(profiler: SamplingProfiler, seconds: float = PROFILE_SECONDS) -> bool:
+    """SIGUSR1 → profiler.start(seconds). False where the loop can't take signals (Windows)."""
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGUSR1, profiler.start, seconds)
+    except (NotImplementedError, AttributeError, RuntimeError):
+        return False
+    return True
+
+
+async def listen_for_requests(profiler: SamplingProfiler, consumer: str) -> None:
+    """
+    Background task: PUBLISH <seconds> on PROFILE_CHANNEL (every engine)
+    or PROFILE_CHANNEL:<consumer> (one) starts a run. An empty or
+    unparsable message means PROFILE_SECONDS.
+    """
+    channels = [PROFILE_CHANNEL, f"{PROFILE_CHANNEL}:{consumer}"]
+    while True:
+        r = get_async_redis()
+        pubsub = r.pubsub()
+        try:
+            await pubsub.subscribe(*channels)
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    profiler.start(_seconds(message["data"]))
+        except aioredis.ConnectionError as e:
+            print(f"[profiler] connection lost ({e}), resubscribing in 1s")
+            await asyncio.sleep(1.0)
+        finally:
+            await pubsub.aclose()
+            await r.aclose()
+
+
+def _seconds(data: bytes | str) -> float:
+    try:
+        seconds = float(data)
+    except (TypeError, ValueError):
+        return PROFILE_SECONDS
+    return seconds if seconds > 0 else PROFILE_SECONDS
@@ -0,0 +1,177 @@
+"""
+Discrete-event market simulation: the real producers, the in-process
+engine, a virtual clock — no Redis.
+
+WHAT RUNS
+──────────
+One MarketMaker, TrendFollower and NoiseTrader per symbol, exactly as
+run_producers.py builds them, each running its own BaseProducer.run
+loop on a VirtualClockLoop (sim/clock.py). Their outside world is
+rerouted, like benchmarks/matching.py's replays, through the methods
+base.py keeps for it:
+
+  get_mid_price / set_mid_price   the market's mid for the symbol
+  make_order                      ids from a counter, timestamps from
+                                  the virtual clock
+  send / send_many                straight into the symbol's LocalBook —
+                                  the memory engine's matcher
+
+The engine is in the loop, unlike in the benchmark: every trade moves
+the mid to its price, as engine.commit_orders does via queue_trade, so
+the trend follower chases what actually traded and the market maker
+quotes around it. The noise trader's GBM still drives its own path.
+
+REPRODUCIBLE
+─────────────
+Every source of variation is pinned: each producer draws from its own
+random.Random seeded by (seed, symbol, role), order and trade ids come
+from the market's counter, timestamps from the virtual clock, and the
+loop's interleaving is deterministic. The same seed and duration give
+the same trades, field for field; SimMarket.digest() is a CRC of the
+whole tape to compare runs by.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import random
+import zlib
+from dataclasses import dataclass, field
+
+from src.config import INITIAL_MID_PRICE
+from src.consumer.local_book import LocalBook
+from src.models import Message, Order, OrderType, Side, Trade, from_ticks
+from src.producers.base import BaseProducer
+from src.producers.market_maker import MarketMaker
+from src.producers.noise_trader import NoiseTrader
+from src.producers.trend_follower import TrendFollower
+
+# The roster run_producers.py starts per symbol (its parameters are the classes' defaults)
+ROLES = (MarketMaker, TrendFollower, NoiseTrader)
+
+
+@dataclass
+class SymbolStats:
+    messages: int = 0
+    trades: int = 0
+    volume: int = 0                         # lots
+    high: int | None = None                 # ticks
+    low: int | None = None
+    last: int | None = None
+
+
+@dataclass
+class SimMarket:
+    """Books, mids, ids and the tape of one simulation."""
+    symbols: list[str]
+    books: dict[str, LocalBook] = field(init=False)
+    mids: dict[str, float] = field(init=False)
+    stats: dict[str, SymbolStats] = field(init=False)
+    tape: list[Trade] = field(default_factory=list)
+    keep_tape: bool = True
+
+    def __post_init__(self) -> None:
+        self.books = {s: LocalBook(s) for s in self.symbols}
+        self.mids = {s: INITIAL_MID_PRICE for s in self.symbols}
+        self.stats = {s: SymbolStats() for s in self.symbols}
+        self._ids = itertools.count(1)
+        self._seq = 0
+        self._crc = 0
+
+    def now(self) -> float:
+        return asyncio.get_running_loop().time()
+
+    def new_order(
+        self,
+        trader_id: str,
+        symbol: str,
+        side: Side,
+        qty: int,
+        price: int | None,
+        order_type: OrderType,
+    ) -> Order:
+        # Producers that wake at the same virtual instant still get
+        # strictly increasing timestamps, in the order they ran.
+        self._seq += 1
+        return Order(
+            order_id=  next(self._ids),
+            trader_id= trader_id,
+            side=      side,
+            order_type=order_type,
+            price=     price,
+            qty=       qty,
+            timestamp= self.now() + self._seq * 1e-9,
+            symbol=    symbol,
+        )
+
+    def submit(self, message: Message) -> list[Trade]:
+        """What the memory engine does with one stream entry, minus Redis."""
+        book = self.books[message.symbol]
+        trades = book.apply(message)
+        book.drain_changes()
+        book.drain_levels()
+
+        stats = self.stats[message.symbol]
+        stats.messages += 1
+        for trade in trades:
+            trade.trade_id = next(self._ids)
+            trade.timestamp = message.timestamp
+            stats.trades += 1
+            stats.volume += trade.qty
+            stats.high = max(stats.high or trade.price, trade.price)
+            stats.low = min(stats.low or trade.price, trade.price)
+            stats.last = trade.price
+            self._crc = zlib.crc32(repr(trade).encode(), self._crc)
+        if trades:
+            self.mids[message.symbol] = from_ticks(trades[-1].price)
+            if self.keep_tape:
+                self.tape.extend(trades)
+        return trades
+
+    def digest(self) -> str:
+        return f"{self._crc:08x}"
+
+
+class Simulated:
+    """Mixin: a producer whose market is a SimMarket."""
+
+    market: SimMarket
+
+    async def get_mid_price(self) -> float:
+        return self.market.mids[self.symbol]
+
+    async def set_mid_price(self, mid: float) -> None:
+        self.market.mids[self.symbol] = mid
+
+    def make_order(self, side, qty, price=None, order_type=OrderType.LIMIT) -> Order:
+        return self.market.new_order(self.trader_id, self.symbol, side, qty, price, order_type)
+
+    async def send(self, order: Message) -> None:
+        self.market.submit(order)
+
+    async def send_many(self, orders: list[Message]) -> None:
+        for order in orders:
+            self.market.submit(order)
+
+
+def simulated(producer_cls: type[BaseProducer], market: SimMarket, symbol: str, seed: int) -> BaseProducer:
+    cls = type(f"Simulated{producer_cls.__name__}", (Simulated, producer_cls), {})
+    producer = cls(symbol=symbol, rng=random.Random(f"{seed}:{symbol}:{producer_cls.__name__}"))
+    producer.market = market
+    return producer
+
+
+async def simulate(market: SimMarket, duration: float, seed: int = 0) -> None:
+    """
+    Run every role on every symbol for `duration` seconds of the running
+    loop's time — virtual on a VirtualClockLoop, real on any other.
+    """
+    producers = [simulated(role, market, symbol, seed) for symbol in market.symbols for role in ROLES]
+    tasks = [asyncio.create_task(p.run()) for p in producers]
+    try:
+        await asyncio.sleep(duration)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
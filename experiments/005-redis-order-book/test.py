@@ -19,7 +19,7 @@ import sys
 sys.path.insert(0, ".")
 
 from src.config import get_async_redis, STREAM_KEY, BIDS_KEY, ASKS_KEY
-from src.models import Order, Side, OrderType
+from src.models import Order, Side, OrderType, from_lots, from_ticks, to_lots, to_ticks
 from src.consumer.book import (
     publish_order,
     read_orders_simple,
@@ -46,18 +46,18 @@ async def main():
     print("📤  Publishing orders to stream...")
 
     orders = [
-        Order.create("market-maker", Side.BID, qty=10.0, price=99.5),
-        Order.create("market-maker", Side.BID, qty=5.0,  price=99.0),
-        Order.create("market-maker", Side.ASK, qty=10.0, price=100.5),
-        Order.create("market-maker", Side.ASK, qty=5.0,  price=101.0),
-        Order.create("trend-follow", Side.BID, qty=3.0,  price=99.8),
+        Order.create("market-maker", Side.BID, qty=to_lots(10.0), price=to_ticks(99.5)),
+        Order.create("market-maker", Side.BID, qty=to_lots(5.0),  price=to_ticks(99.0)),
+        Order.create("market-maker", Side.ASK, qty=to_lots(10.0), price=to_ticks(100.5)),
+        Order.create("market-maker", Side.ASK, qty=to_lots(5.0),  price=to_ticks(101.0)),
+        Order.create("trend-follow", Side.BID, qty=to_lots(3.0),  price=to_ticks(99.8)),
     ]
 
     stream_ids = []
     for order in orders:
         sid = await publish_order(r, order)
         stream_ids.append(sid)
-        print(f"   XADD → {sid}  |  {order.side.value:3s}  {order.qty:5.1f} @ {order.price}")
+        print(f"   XADD → {sid}  |  {order.side.value:3s}  {from_lots(order.qty):5.1f} @ {from_ticks(order.price)}")
 
     print(f"\n✅  {len(orders)} orders written to stream '{STREAM_KEY}'\n")
 
@@ -69,7 +69,7 @@ async def main():
     print(f"✅  Read back {len(read_back)} orders. Cursor now: {cursor}\n")
 
     for sid, order in read_back:
-        print(f"   {sid}  |  {order.side.value:3s}  {order.qty:5.1f} @ {order.price}  trader={order.trader_id}")
+        print(f"   {sid}  |  {order.side.value:3s}  {from_lots(order.qty):5.1f} @ {from_ticks(order.price)}  trader={order.trader_id}")
 
     # ── Add to book (sorted sets) ────────────────────────────────
     print("\n📚  Adding limit orders to book (ZADD)...")
@@ -78,16 +78,16 @@ async def main():
     print(f"✅  Book populated\n")
 
     # ── Read book state ──────────────────────────────────────────
-    best_bid = await get_best_bid(r)
+    best_bid = await get_best_bid(r)   # ticks
     best_ask = await get_best_ask(r)
     spread   = (best_ask - best_bid) if (best_bid and best_ask) else None
 
-    print(f"   Best bid : {best_bid}")
-    print(f"   Best ask : {best_ask}")
-    print(f"   Spread   : {spread:.2f}" if spread else "   Spread  : N/A")
+    print(f"   Best bid : {from_ticks(best_bid)}")
+    print(f"   Best ask : {from_ticks(best_ask)}")
+    print(f"   Spread   : {from_ticks(spread):.2f}" if spread else "   Spread  : N/A")
 
-    assert best_bid == 99.8, f"Expected 99.8, got {best_bid}"
-    assert best_ask == 100.5, f"Expected 100.5, got {best_ask}"
+    assert best_bid == to_ticks(99.8), f"Expected 9980 ticks, got {best_bid}"
+    assert best_ask == to_ticks(100.5), f"Expected 10050 ticks, got {best_ask}"
     print("\n✅  Best bid/ask correct\n")
 
     # ── Book snapshot ────────────────────────────────────────────
@@ -96,10 +96,10 @@ async def main():
     print("─" * 40)
     print(f"  {'ASKS':^36}")
     for oid, price in reversed(asks):
-        print(f"  {'':>18}  {price:>8.2f}  {oid}")
+        print(f"  {'':>18}  {from_ticks(price):>8.2f}  {oid}")
     print(f"  {'--- spread ---':^40}")
     for oid, price in bids:
-        print(f"  {oid}  {price:>8.2f}")
+        print(f"  {oid:>18}  {from_ticks(price):>8.2f}")
     print(f"  {'BIDS':^36}")
     print("─" * 40)
 
@@ -0,0 +1,11 @@
+"""Shared fixtures. Tests that need Redis get a fresh in-process fakeredis server."""
+
+import fakeredis
+import pytest
+
+
+@pytest.fixture
+async def r():
+    client = fakeredis.FakeAsyncRedis(server=fakeredis.FakeServer())
+    yield client
+    await client.aclose()
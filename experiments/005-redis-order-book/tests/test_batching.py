@@ -0,0 +1,46 @@
+"""AdaptiveBatchSize: grow with the backlog, decay when it drains."""
+
+import pytest
+
+from src.consumer.batching import AdaptiveBatchSize
+
+
+def test_starts_at_minimum_and_rejects_bad_bounds():
+    assert AdaptiveBatchSize(10, 500).size == 10
+    with pytest.raises(ValueError):
+        AdaptiveBatchSize(0, 10)
+    with pytest.raises(ValueError):
+        AdaptiveBatchSize(20, 10)
+
+
+def test_full_read_asks_for_lag_and_sizes_to_it():
+    sizer = AdaptiveBatchSize(10, 500)
+
+    assert sizer.observe_read(10)
+    sizer.observe_lag(240)
+    assert sizer.size == 240
+
+    sizer.observe_lag(10_000)
+    assert sizer.size == 500
+    sizer.observe_lag(0)
+    assert sizer.size == 10
+
+
+def test_short_reads_halve_toward_minimum():
+    sizer = AdaptiveBatchSize(10, 500)
+    sizer.observe_lag(400)
+
+    assert not sizer.observe_read(3)
+    assert sizer.size == 200
+    for _ in range(10):
+        sizer.observe_read(0)
+    assert sizer.size == 10
+
+
+def test_unknown_lag_doubles_up_to_maximum():
+    sizer = AdaptiveBatchSize(10, 50)
+
+    for expected in (20, 40, 50, 50):
+        assert sizer.observe_read(sizer.size)
+        sizer.observe_lag(None)
+        assert sizer.size == expected
@@ -0,0 +1,70 @@
+"""CANCEL / REPLACE in redis mode: the same outcome LocalBook gives, L2 depth included."""
+
+from src.consumer.book import cancel_own, load_resting_orders
+from src.consumer.depth import get_l2_snapshot
+from src.consumer.engine import apply_message
+from src.consumer.local_book import LocalBook
+from src.models import CancelReplace, Order, OrderType, Side
+
+
+def order(order_id, side, price, qty, trader="mm"):
+    return Order(
+        order_id=   order_id,
+        trader_id=  trader,
+        side=       side,
+        order_type= OrderType.LIMIT,
+        price=      price,
+        qty=        qty,
+        timestamp=  float(order_id),
+        symbol=     "SIM",
+    )
+
+
+async def resting(r):
+    return [(o.order_id, o.side, o.price, o.qty) for o in await load_resting_orders(r, "SIM")]
+
+
+async def test_requote_pulls_own_orders_then_matches_the_new_legs(r):
+    for o in (order(1, Side.BID, 99, 5), order(2, Side.ASK, 101, 5), order(3, Side.ASK, 100, 5, trader="other")):
+        assert await apply_message(r, o) == []
+
+    trades = await apply_message(r, CancelReplace(
+        "mm", cancel_ids=(1, 2, 3), symbol="SIM",
+        orders=(order(4, Side.BID, 100, 2), order(5, Side.ASK, 102, 5)),
+    ))
+
+    # 3 belongs to someone else: not cancelled, and the new bid trades with it
+    assert [(t.bid_order_id, t.ask_order_id, t.qty) for t in trades] == [(4, 3, 2)]
+    assert await resting(r) == [(3, Side.ASK, 100, 3), (5, Side.ASK, 102, 5)]
+    assert await get_l2_snapshot(r, 10, "SIM") == ([], [(100, 3), (102, 5)])
+
+
+def requotes():
+    return [
+        order(1, Side.BID, 99, 5), order(2, Side.ASK, 101, 5), order(3, Side.BID, 98, 4, trader="other"),
+        CancelReplace("mm", cancel_ids=(1,), symbol="SIM", orders=(order(4, Side.BID, 100, 5),)),
+        order(5, Side.ASK, 99, 7, trader="other"),
+        CancelReplace("mm", cancel_ids=(2, 4), symbol="SIM"),
+    ]
+
+
+async def test_same_result_as_the_local_book(r):
+    book = LocalBook("SIM")
+
+    # Separate copies: LocalBook keeps (and fills) the Order objects it rests
+    for local, message in zip(requotes(), requotes()):
+        expected = [(t.bid_order_id, t.ask_order_id, t.price, t.qty) for t in book.apply(local)]
+        trades = await apply_message(r, message)
+        assert [(t.bid_order_id, t.ask_order_id, t.price, t.qty) for t in trades] == expected
+
+    local = [(o.order_id, o.side, o.price, o.qty) for side in (Side.BID, Side.ASK) for o in book.resting(side)]
+    assert sorted(await resting(r)) == sorted(local)
+
+
+async def test_cancel_ignores_other_traders_and_unknown_ids(r):
+    await apply_message(r, order(1, Side.BID, 99, 5, trader="other"))
+
+    assert await cancel_own(r, "mm", (1, 42), "SIM") == 0
+    assert await cancel_own(r, "other", (1,), "SIM") == 1
+    assert await resting(r) == []
+    assert await get_l2_snapshot(r, 10, "SIM") == ([], [])
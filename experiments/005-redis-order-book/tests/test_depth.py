@@ -0,0 +1,50 @@
+"""L2 depth writers: EVALSHA only, and NOSCRIPT inside a MULTI repaired, not half-applied."""
+
+from src.config import keys_for
+from src.consumer.depth import (
+    LEVEL_DELTA_SCRIPT, LEVEL_DELTA_SHA, LEVEL_SET_SHA, execute_pipeline, get_l2_snapshot, load_depth_scripts,
+    queue_level_delta, queue_level_total,
+)
+
+KEYS = keys_for("SIM")
+
+
+async def test_sha_is_what_script_load_returns(r):
+    assert await r.script_load(LEVEL_DELTA_SCRIPT) == LEVEL_DELTA_SHA
+
+
+async def test_updates_queue_the_sha_not_the_body(r):
+    pipe = r.pipeline()
+    queue_level_delta(pipe, "SIM", "bid", 100, 5)
+    queue_level_total(pipe, "SIM", "ask", 101, 3)
+
+    assert [args[:2] for args, _ in pipe.command_stack] == [("EVALSHA", LEVEL_DELTA_SHA), ("EVALSHA", LEVEL_SET_SHA)]
+    assert all(len(str(arg)) < 100 for args, _ in pipe.command_stack for arg in args)
+    await pipe.reset()
+
+
+async def test_noscript_in_a_multi_resends_just_the_level_updates(r):
+    await load_depth_scripts(r)
+    await r.script_flush()
+
+    pipe = r.pipeline()
+    pipe.set(KEYS.mid, "1.0")
+    queue_level_delta(pipe, "SIM", "bid", 100, 5)
+    queue_level_total(pipe, "SIM", "ask", 101, 3)
+    queue_level_total(pipe, "SIM", "ask", 101, 7)   # resent in order: the last total wins
+    queue_level_delta(pipe, "SIM", "bid", 100, -2)
+    await execute_pipeline(r, pipe)
+
+    assert await r.get(KEYS.mid) == b"1.0"
+    assert await get_l2_snapshot(r, 10, "SIM") == ([(100, 3)], [(101, 7)])
+    assert await r.xlen(KEYS.md) == 4
+
+
+async def test_l2_snapshot_loads_its_script_once_flushed(r):
+    pipe = r.pipeline()
+    queue_level_delta(pipe, "SIM", "ask", 101, 4)
+    await execute_pipeline(r, pipe)
+    await get_l2_snapshot(r, 10, "SIM")
+    await r.script_flush()
+
+    assert await get_l2_snapshot(r, 10, "SIM") == ([], [(101, 4)])
@@ -0,0 +1,139 @@
+"""Engine batches against fakeredis: one bad entry must not cost the rest their trades."""
+
+import pytest
+import redis.asyncio as aioredis
+
+from src.config import CONSUMER_GROUP, keys_for
+from src.consumer import engine
+from src.consumer.book import add_to_book, load_resting_orders, publish_order
+from src.consumer.engine import (
+    EngineContext, apply_pending, commit_until_landed, ensure_consumer_group,
+    get_crossable_orders, process_batch, recover_failed_batch,
+)
+from src.consumer.lua_match import LuaMatcher
+from src.models import Order, OrderType, Side
+
+STREAM = keys_for("SIM").stream
+POISON = 2
+
+
+def order(order_id, side, price, qty, trader="t1"):
+    return Order(
+        order_id=   order_id,
+        trader_id=  trader,
+        side=       side,
+        order_type= OrderType.LIMIT,
+        price=      price,
+        qty=        qty,
+        timestamp=  float(order_id),
+        symbol=     "SIM",
+    )
+
+
+@pytest.fixture
+def poisoned(monkeypatch):
+    """Matching order POISON raises — in redis mode after its XACK, like a real bug would."""
+    real = engine.apply_message
+
+    async def apply_message(r, message):
+        if getattr(message, "order_id", None) == POISON:
+            raise RuntimeError("poisoned")
+        return await real(r, message)
+
+    monkeypatch.setattr(engine, "apply_message", apply_message)
+
+
+async def delivered(r, messages):
+    """XADD the messages and read them into our PEL, as XREADGROUP would hand them out."""
+    await ensure_consumer_group(r, ["SIM"])
+    for message in messages:
+        await publish_order(r, message)
+    ((_, entries),) = await r.xreadgroup(CONSUMER_GROUP, "engine-test", {STREAM: ">"})
+    return [(stream_id.decode(), message) for (stream_id, _), message in zip(entries, messages)]
+
+
+async def pending(r):
+    return (await r.xpending(STREAM, CONSUMER_GROUP))["pending"]
+
+
+async def test_redis_mode_commits_the_entries_around_a_failure(r, poisoned):
+    ctx = EngineContext(r, "engine-test", ["SIM"])
+    batch = await delivered(r, [
+        order(1, Side.ASK, 100, 5), order(POISON, Side.BID, 99, 1), order(3, Side.BID, 100, 2, trader="t2"),
+    ])
+
+    per_order = await process_batch(ctx, batch)
+
+    assert [[t.qty for t in trades] for trades in per_order] == [[], [], [2]]
+    assert await r.xlen(keys_for("SIM").trades) == 1
+    assert [(o.order_id, o.qty) for o in await load_resting_orders(r, "SIM")] == [(1, 3)]
+    assert await pending(r) == 0
+    assert (ctx.metrics.counters["errors_total"], ctx.metrics.counters["orders_total"]) == (1, 2)
+
+
+async def test_lua_mode_commits_the_scripts_that_succeeded(r):
+    ctx = EngineContext(r, "engine-test", ["SIM"], lua=LuaMatcher(r))
+    # No price on a limit order: its script fails where it would rest (ZADD nil)
+    batch = await delivered(r, [
+        order(1, Side.ASK, 100, 5), order(POISON, Side.ASK, None, 1, trader="t3"),
+        order(3, Side.BID, 100, 2, trader="t2"),
+    ])
+
+    per_order = await process_batch(ctx, batch)
+
+    assert [[t.qty for t in trades] for trades in per_order] == [[], [], [2]]
+    assert await r.xlen(keys_for("SIM").trades) == 1
+    assert await pending(r) == 0
+    assert (ctx.metrics.counters["errors_total"], ctx.metrics.counters["orders_total"]) == (1, 2)
+
+
+async def test_failed_batch_is_retried_without_reapplying_acked_entries(r):
+    ctx = EngineContext(r, "engine-test", ["SIM"])
+    batch = await delivered(r, [
+        order(1, Side.ASK, 100, 5), order(2, Side.BID, 100, 2, trader="t2"), order(3, Side.BID, 100, 1, trader="t2"),
+    ])
+    # The connection drops after the first two were acked and applied
+    for stream_id, message in batch[:2]:
+        await apply_pending(r, stream_id, message)
+
+    await recover_failed_batch(ctx, batch, aioredis.ConnectionError("dropped"))
+
+    assert [(o.order_id, o.qty) for o in await load_resting_orders(r, "SIM")] == [(1, 2)]
+    assert await r.xlen(keys_for("SIM").trades) == 1
+    assert await pending(r) == 0
+
+
+@pytest.mark.parametrize("landed", [False, True])
+async def test_commit_until_landed_retries_only_what_did_not_land(r, monkeypatch, landed):
+    await engine.apply_message(r, order(1, Side.ASK, 100, 5))
+    ((stream_id, bid),) = await delivered(r, [order(2, Side.BID, 100, 2, trader="t2")])
+    trades = await apply_pending(r, stream_id, bid)
+    real, calls = engine.commit_orders, []
+
+    async def commit_orders(*args, **kwargs):
+        calls.append(args)
+        if len(calls) == 1 and landed:
+            await real(*args, **kwargs)   # EXEC ran, then the reply was lost
+        if len(calls) == 1:
+            raise aioredis.ConnectionError("dropped")
+        await real(*args, **kwargs)
+
+    monkeypatch.setattr(engine, "commit_orders", commit_orders)
+    await commit_until_landed(r, "engine-test", trades)
+
+    assert len(calls) == (1 if landed else 2)
+    assert await r.xlen(keys_for("SIM").trades) == 1
+
+
+async def test_crossable_orders_finish_the_boundary_level_and_skip_empty_orders(r):
+    for resting in (order(10, Side.ASK, 100, 1), order(12, Side.ASK, 101, 1),
+                    order(11, Side.ASK, 101, 1), order(13, Side.ASK, 102, 1)):
+        await add_to_book(r, resting)
+    market = Order(order_id=20, trader_id="t2", side=Side.BID, order_type=OrderType.MARKET,
+                   price=None, qty=2, timestamp=20.0, symbol="SIM")
+
+    crossable = await get_crossable_orders(r, market, page_size=2)
+
+    assert [o.order_id for o in crossable] == [10, 11, 12]
+    market.qty = 0
+    assert await get_crossable_orders(r, market, page_size=2) == []
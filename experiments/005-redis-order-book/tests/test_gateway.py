@@ -0,0 +1,80 @@
+"""Gateway fan-out: bounded trade buffers, one rendering per seq, and the ?depth= bounds."""
+
+import asyncio
+import json
+
+import pytest
+
+from src.config import GATEWAY_MAX_DEPTH, GATEWAY_TRADE_BUFFER
+from src.consumer.market_data import MdEvent, MdSnapshot
+from src.gateway.hub import MarketHub
+from src.gateway.server import handle
+
+
+@pytest.fixture
+def hub():
+    hub = MarketHub(["SIM"])
+    bids = {10_000 - tick: 10 for tick in range(100)}
+    asks = {10_001 + tick: 10 for tick in range(100)}
+    hub.replicas["SIM"].load(MdSnapshot(7, bids, asks, 100.005))
+    return hub
+
+
+def trade(seq):
+    return MdEvent(seq, "trade", {"price": "10000", "qty": "10", "trade_id": str(seq)})
+
+
+async def test_slow_client_keeps_only_the_newest_trades(hub):
+    sub = hub.subscribe("SIM", 5)
+    sub.dirty.clear()
+
+    await hub._dispatch(None, "SIM", [trade(seq) for seq in range(8, 8 + GATEWAY_TRADE_BUFFER + 20)])
+
+    trades, skipped = sub.take_trades()
+    assert sub.dirty.is_set()
+    assert (len(trades), skipped) == (GATEWAY_TRADE_BUFFER, 20)
+    assert trades[-1]["trade_id"] == str(7 + GATEWAY_TRADE_BUFFER + 20)
+    assert sub.take_trades() == ([], 0)
+
+
+async def test_book_is_rendered_once_per_seq_and_depth(hub):
+    seq, first = hub.book_payload("SIM", 3)
+    assert hub.book_payload("SIM", 3)[1] is first
+
+    await hub._dispatch(None, "SIM", [MdEvent(8, "delete", {"side": "bid", "price": "10000"})])
+
+    seq_after, book = hub.book_payload("SIM", 3)
+    assert (seq, seq_after) == (7, 8)
+    assert [price for price, _ in json.loads(book)["bids"]] == [99.99, 99.98, 99.97]
+
+
+async def test_hub_clamps_depth(hub):
+    assert hub.subscribe("SIM", 10_000).depth == GATEWAY_MAX_DEPTH
+    assert len(json.loads(hub.book_payload("SIM", 10_000)[1])["asks"]) == GATEWAY_MAX_DEPTH
+    assert len(json.loads(hub.book_payload("SIM", -3)[1])["asks"]) == 1
+
+
+async def get(hub, target):
+    server = await asyncio.start_server(lambda rd, wr: handle(hub, rd, wr), "127.0.0.1", 0)
+    async with server:
+        reader, writer = await asyncio.open_connection(*server.sockets[0].getsockname())
+        writer.write(f"GET {target} HTTP/1.1\r\nHost: test\r\n\r\n".encode())
+        response = await reader.read()
+        writer.close()
+    head, _, body = response.decode().partition("\r\n\r\n")
+    return int(head.split(" ")[1]), body
+
+
+@pytest.mark.parametrize("depth", ["0", "-1", str(GATEWAY_MAX_DEPTH + 1), "ten", "1e3"])
+async def test_out_of_range_depth_is_a_400(hub, depth):
+    status, body = await get(hub, f"/snapshot?symbol=SIM&depth={depth}")
+
+    assert status == 400
+    assert str(GATEWAY_MAX_DEPTH) in body
+
+
+async def test_snapshot_honours_a_valid_depth(hub):
+    status, body = await get(hub, f"/snapshot?symbol=SIM&depth={GATEWAY_MAX_DEPTH}")
+
+    assert status == 200
+    assert len(json.loads(body)["bids"]) == GATEWAY_MAX_DEPTH
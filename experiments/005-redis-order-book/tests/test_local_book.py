@@ -0,0 +1,173 @@
+"""LocalBook matching: price-time priority, STP, cancel/replace, the change log."""
+
+from src.consumer.local_book import ChangeKind, LocalBook
+from src.models import CancelReplace, Order, OrderType, Side
+
+
+def order(order_id, side, price, qty, trader="t1", order_type=OrderType.LIMIT):
+    return Order(
+        order_id=   order_id,
+        trader_id=  trader,
+        side=       side,
+        order_type= order_type,
+        price=      price,
+        qty=        qty,
+        timestamp=  float(order_id),
+        symbol=     "SIM",
+    )
+
+
+def resting(book, side):
+    return [(o.order_id, o.price, o.qty) for o in book.resting(side)]
+
+
+# ── Price-time priority ──────────────────────────────────────────
+
+def test_best_price_fills_first():
+    book = LocalBook("SIM")
+    book.apply(order(1, Side.ASK, 102, 5))
+    book.apply(order(2, Side.ASK, 100, 5))
+    book.apply(order(3, Side.ASK, 101, 5))
+
+    trades = book.apply(order(4, Side.BID, 102, 12, trader="t2"))
+
+    assert [(t.ask_order_id, t.price, t.qty) for t in trades] == [(2, 100, 5), (3, 101, 5), (1, 102, 2)]
+    assert resting(book, Side.ASK) == [(1, 102, 3)]
+    assert resting(book, Side.BID) == []
+
+
+def test_earliest_order_fills_first_within_a_level():
+    book = LocalBook("SIM")
+    for order_id in (1, 2, 3):
+        book.apply(order(order_id, Side.BID, 100, 4))
+
+    trades = book.apply(order(4, Side.ASK, 100, 6, trader="t2"))
+
+    assert [(t.bid_order_id, t.qty) for t in trades] == [(1, 4), (2, 2)]
+    assert resting(book, Side.BID) == [(2, 100, 2), (3, 100, 4)]
+
+
+def test_trades_clear_at_the_maker_price():
+    book = LocalBook("SIM")
+    book.apply(order(1, Side.BID, 105, 5))
+
+    (trade,) = book.apply(order(2, Side.ASK, 100, 5, trader="t2"))
+
+    assert trade.price == 105
+    assert (trade.buyer_id, trade.seller_id) == ("t1", "t2")
+
+
+def test_limit_remainder_rests_and_limit_price_bounds_the_walk():
+    book = LocalBook("SIM")
+    book.apply(order(1, Side.ASK, 100, 3))
+    book.apply(order(2, Side.ASK, 103, 3))
+
+    trades = book.apply(order(3, Side.BID, 101, 10, trader="t2"))
+
+    assert [t.qty for t in trades] == [3]
+    assert resting(book, Side.BID) == [(3, 101, 7)]
+    assert book.best_bid() == 101 and book.best_ask() == 103
+
+
+def test_market_remainder_is_dropped():
+    book = LocalBook("SIM")
+    book.apply(order(1, Side.ASK, 100, 3))
+
+    trades = book.apply(order(2, Side.BID, None, 10, trader="t2", order_type=OrderType.MARKET))
+
+    assert [t.qty for t in trades] == [3]
+    assert len(book) == 0
+
+
+# ── Self-trade prevention ────────────────────────────────────────
+
+def test_own_orders_are_skipped_and_keep_their_place():
+    book = LocalBook("SIM")
+    book.apply(order(1, Side.ASK, 100, 5, trader="mm"))
+    book.apply(order(2, Side.ASK, 100, 5, trader="other"))
+    book.apply(order(3, Side.ASK, 101, 5, trader="other"))
+
+    trades = book.apply(order(4, Side.BID, 101, 8, trader="mm"))
+
+    assert all(t.seller_id == "other" for t in trades)
+    assert [(t.ask_order_id, t.qty) for t in trades] == [(2, 5), (3, 3)]
+    assert resting(book, Side.ASK) == [(1, 100, 5), (3, 101, 2)]
+
+
+def test_crossing_only_own_orders_rests_without_trading():
+    book = LocalBook("SIM")
+    book.apply(order(1, Side.ASK, 100, 5, trader="mm"))
+
+    assert book.apply(order(2, Side.BID, 100, 5, trader="mm")) == []
+    assert resting(book, Side.BID) == [(2, 100, 5)]
+
+
+# ── Cancel / replace ─────────────────────────────────────────────
+
+def test_cancel_replace_pulls_own_orders_then_matches_new_legs():
+    book = LocalBook("SIM")
+    book.apply(order(1, Side.BID, 99, 5, trader="mm"))
+    book.apply(order(2, Side.ASK, 101, 5, trader="mm"))
+    book.apply(order(3, Side.ASK, 100, 5, trader="other"))
+
+    trades = book.apply(CancelReplace(
+        "mm", cancel_ids=(1, 2, 3), symbol="SIM",
+        orders=(order(4, Side.BID, 100, 2, trader="mm"), order(5, Side.ASK, 102, 5, trader="mm")),
+    ))
+
+    # 3 belongs to someone else: not cancelled, and the new bid trades with it
+    assert [(t.bid_order_id, t.ask_order_id, t.qty) for t in trades] == [(4, 3, 2)]
+    assert resting(book, Side.BID) == []
+    assert resting(book, Side.ASK) == [(3, 100, 3), (5, 102, 5)]
+
+
+def test_cancel_of_unknown_or_filled_order_is_a_no_op():
+    book = LocalBook("SIM")
+    book.apply(order(1, Side.ASK, 100, 5))
+    book.apply(order(2, Side.BID, 100, 5, trader="t2"))
+
+    assert book.apply(CancelReplace("t1", cancel_ids=(1, 99), symbol="SIM")) == []
+    assert book.remove(1) is None
+    assert len(book) == 0
+
+
+# ── Changes + levels (what the Redis projection replays) ─────────
+
+def test_changes_keep_the_qty_they_were_made_with():
+    book = LocalBook("SIM")
+    book.apply(order(1, Side.BID, 100, 5))
+    book.apply(order(2, Side.ASK, 100, 2, trader="t2"))
+    changes = book.drain_changes()
+
+    # A later fill must not rewrite what the earlier changes say
+    book.apply(order(3, Side.ASK, 100, 3, trader="t2"))
+
+    assert [(c.kind, c.order.order_id, c.qty) for c in changes] == [
+        (ChangeKind.ADD, 1, 5), (ChangeKind.UPDATE, 1, 3),
+    ]
+    assert [(c.kind, c.qty) for c in book.drain_changes()] == [(ChangeKind.REMOVE, 0)]
+
+
+def test_drain_levels_reports_touched_totals_once():
+    book = LocalBook("SIM")
+    book.apply(order(1, Side.BID, 100, 5))
+    book.apply(order(2, Side.BID, 100, 3))
+    book.apply(order(3, Side.ASK, 100, 6, trader="t2"))
+
+    assert [(level.side, level.price, level.qty) for level in book.drain_levels()] == [(Side.BID, 100, 2)]
+    assert book.drain_levels() == []
+
+    book.remove(2)
+    assert [(level.price, level.qty) for level in book.drain_levels()] == [(100, 0)]
+    assert book.depth(Side.BID) == []
+
+
+def test_drain_levels_come_out_in_first_touch_order():
+    book = LocalBook("SIM")
+    for order_id, side, price in [(1, Side.ASK, 105), (2, Side.BID, 97), (3, Side.ASK, 103),
+                                  (4, Side.BID, 99), (5, Side.ASK, 105)]:
+        book.apply(order(order_id, side, price, 1))
+
+    assert [(level.side, level.price) for level in book.drain_levels()] == [
+        (Side.ASK, 105), (Side.BID, 97), (Side.ASK, 103), (Side.BID, 99),
+    ]
@@ -0,0 +1,106 @@
+"""MATCH_SCRIPT via LuaMatcher: the same trades as LocalBook, acked once, reloaded after a flush."""
+
+from src.config import CONSUMER_GROUP, keys_for
+from src.consumer.book import load_resting_orders, publish_order
+from src.consumer.depth import get_l2_snapshot
+from src.consumer.engine import ensure_consumer_group
+from src.consumer.local_book import LocalBook
+from src.consumer.lua_match import LuaMatcher
+from src.models import CancelReplace, Order, OrderType, Side
+
+
+def order(order_id, side, price, qty, trader="t1", order_type=OrderType.LIMIT):
+    return Order(
+        order_id=   order_id,
+        trader_id=  trader,
+        side=       side,
+        order_type= order_type,
+        price=      price,
+        qty=        qty,
+        timestamp=  float(order_id),
+        symbol=     "SIM",
+    )
+
+
+def session():
+    """Price-time priority, STP, a partial fill, a market sweep and a requote."""
+    return [
+        order(1, Side.ASK, 101, 5), order(2, Side.ASK, 100, 3), order(3, Side.ASK, 100, 4, trader="t2"),
+        order(4, Side.BID, 100, 5, trader="t2"),
+        order(5, Side.BID, 98, 6, trader="mm"), order(6, Side.ASK, 103, 6, trader="mm"),
+        order(7, Side.BID, None, 4, trader="t3", order_type=OrderType.MARKET),
+        CancelReplace("mm", cancel_ids=(5, 6), symbol="SIM", orders=(
+            order(8, Side.BID, 99, 2, trader="mm"), order(9, Side.ASK, 101, 2, trader="mm"),
+        )),
+        order(10, Side.ASK, 97, 3, trader="t3"),
+    ]
+
+
+def fills(trades):
+    return [(t.bid_order_id, t.ask_order_id, t.price, t.qty) for t in trades]
+
+
+def local_result():
+    book = LocalBook("SIM")
+    per_order = [fills(book.apply(message)) for message in session()]
+    resting = [(o.order_id, o.side, o.price, o.qty) for side in (Side.BID, Side.ASK) for o in book.resting(side)]
+    return per_order, sorted(resting), (book.depth(Side.BID), book.depth(Side.ASK))
+
+
+async def lua_resting(r):
+    return sorted((o.order_id, o.side, o.price, o.qty) for o in await load_resting_orders(r, "SIM"))
+
+
+async def test_match_gives_the_local_book_result(r):
+    lua = LuaMatcher(r)
+    expected_fills, expected_resting, (bids, asks) = local_result()
+
+    assert [fills(await lua.match(message)) for message in session()] == expected_fills
+    assert await lua_resting(r) == expected_resting
+    assert await get_l2_snapshot(r, 10, "SIM") == (bids, asks)
+
+
+async def test_match_many_is_match_in_one_round_trip(r):
+    expected_fills, expected_resting, _ = local_result()
+
+    assert [fills(trades) for trades in await LuaMatcher(r).match_many(session())] == expected_fills
+    assert await lua_resting(r) == expected_resting
+
+
+async def test_an_entry_is_matched_once(r):
+    lua = LuaMatcher(r)
+    await ensure_consumer_group(r, ["SIM"])
+    await lua.match(order(1, Side.ASK, 100, 5))
+    stream = keys_for("SIM").stream
+    await publish_order(r, order(2, Side.BID, 100, 2, trader="t2"))
+    ((_, ((stream_id, _),)),) = await r.xreadgroup(CONSUMER_GROUP, "engine-test", {stream: ">"})
+
+    first = await lua.match(order(2, Side.BID, 100, 2, trader="t2"), stream_id.decode())
+    again = await lua.match(order(2, Side.BID, 100, 2, trader="t2"), stream_id.decode())
+
+    assert (fills(first), again) == ([(2, 1, 100, 2)], [])
+    assert (await r.xpending(stream, CONSUMER_GROUP))["pending"] == 0
+    assert await lua_resting(r) == [(1, Side.ASK, 100, 3)]
+
+
+async def test_script_is_reloaded_after_a_flush(r):
+    lua = LuaMatcher(r)
+    await lua.match(order(1, Side.ASK, 100, 5))
+    await r.script_flush()
+
+    assert fills(await lua.match(order(2, Side.BID, 100, 1, trader="t2"))) == [(2, 1, 100, 1)]
+    await r.script_flush()
+    assert fills((await lua.match_many([order(3, Side.BID, 100, 1, trader="t2")]))[0]) == [(3, 1, 100, 1)]
+
+
+async def test_a_failing_script_keeps_the_other_scripts_trades(r):
+    # A limit order with no price fails where it would rest: ZADD gets a nil score
+    broken = order(2, Side.ASK, None, 1, trader="t3")
+
+    results = await LuaMatcher(r).match_many([
+        order(1, Side.ASK, 100, 5), broken, order(3, Side.BID, 100, 2, trader="t2"),
+    ])
+
+    assert isinstance(results[1], Exception)
+    assert (fills(results[0]), fills(results[2])) == ([], [(3, 1, 100, 2)])
+    assert await lua_resting(r) == [(1, Side.ASK, 100, 3)]
@@ -0,0 +1,102 @@
+"""BookReplica: applying the md feed in sequence, gaps, resets, resync."""
+
+from src.consumer.market_data import (
+    BookReplica, MdEvent, MdSnapshot, get_md_snapshot, md_head, queue_md_event, seq_of,
+)
+
+
+def event(seq, kind, **fields):
+    return MdEvent(seq, kind, {k: str(v) for k, v in fields.items()})
+
+
+def loaded(seq=10, bids=None, asks=None, mid=100.0):
+    replica = BookReplica("SIM")
+    replica.load(MdSnapshot(seq, bids or {100: 5}, asks or {101: 4}, mid))
+    return replica
+
+
+def test_seq_is_the_stream_id_sequence():
+    assert seq_of(b"0-42") == 42
+    assert seq_of("0-1") == 1
+
+
+def test_events_in_sequence_update_the_levels():
+    replica = loaded()
+
+    assert replica.apply(event(11, "add", side="bid", price=99, qty=3))
+    assert replica.apply(event(12, "modify", side="ask", price=101, qty=1))
+    assert replica.apply(event(13, "delete", side="bid", price=100))
+    assert replica.apply(event(14, "mid", price=100.5))
+    assert replica.apply(event(15, "trade", price=101, qty=3))
+
+    assert (replica.bids, replica.asks, replica.mid, replica.seq) == ({99: 3}, {101: 1}, 100.5, 15)
+
+
+def test_seq_going_backwards_is_a_reset():
+    replica = loaded(seq=10)
+
+    assert not replica.apply(event(1, "add", side="bid", price=98, qty=1))
+    assert not replica.apply(event(10, "delete", side="bid", price=100))
+    assert replica.gaps == 2
+    assert replica.bids == {100: 5} and replica.seq == 10
+
+
+def test_stream_ending_before_our_seq_is_a_reset():
+    replica = loaded(seq=10)
+
+    assert not replica.behind(10) and not replica.behind(12)
+    assert replica.behind(3)
+    assert replica.gaps == 1
+
+
+def test_gap_is_reported_and_leaves_the_replica_untouched():
+    replica = loaded(seq=10)
+
+    assert not replica.apply(event(12, "add", side="bid", price=98, qty=1))
+    assert replica.gaps == 1
+    assert replica.bids == {100: 5} and replica.seq == 10
+
+
+def test_resync_after_a_gap_continues_from_the_new_snapshot():
+    replica = loaded(seq=10)
+    assert not replica.apply(event(12, "add", side="bid", price=98, qty=1))
+
+    replica.load(MdSnapshot(12, {100: 5, 98: 1}, {101: 4}, 100.0))
+
+    assert replica.apply(event(13, "delete", side="bid", price=98))
+    assert replica.bids == {100: 5} and replica.seq == 13
+
+
+def test_nothing_applies_before_the_first_load():
+    replica = BookReplica("SIM")
+
+    assert not replica.apply(event(1, "add", side="bid", price=100, qty=1))
+    assert replica.bids == {}
+
+
+def test_clear_drops_every_level():
+    replica = loaded(bids={100: 5, 99: 5})
+
+    assert replica.apply(event(11, "clear"))
+    assert replica.apply(event(12, "add", side="bid", price=99, qty=5))
+
+    assert (replica.bids, replica.asks) == ({99: 5}, {})
+
+
+async def test_flushdb_shows_up_as_a_stream_behind_the_replica(r):
+    for _ in range(5):
+        pipe = r.pipeline()
+        queue_md_event(pipe, "SIM", "mid", {"price": "100.0"})
+        await pipe.execute()
+    replica = BookReplica("SIM")
+    replica.load(await get_md_snapshot(r, "SIM"))
+    assert replica.seq == await md_head(r, "SIM") == 5
+
+    await r.flushdb()
+    pipe = r.pipeline()
+    queue_md_event(pipe, "SIM", "mid", {"price": "101.0"})
+    await pipe.execute()
+
+    assert replica.behind(await md_head(r, "SIM"))
+    replica.load(await get_md_snapshot(r, "SIM"))
+    assert replica.seq == 1 and not replica.behind(1)
@@ -0,0 +1,88 @@
+"""Histogram accuracy and the Metrics / SampledLog registry."""
+
+import io
+import json
+
+import pytest
+
+from src.metrics import Histogram, Metrics, SampledLog
+
+
+def test_small_values_are_exact():
+    h = Histogram("h", "")
+    for value in range(64):
+        h.record(value)
+
+    assert h.percentile(0.5) == 31
+    assert h.percentile(1.0) == 63
+    assert (h.count, h.total, h.max) == (64, sum(range(64)), 63)
+
+
+@pytest.mark.parametrize("value", [100, 1_234, 98_765, 5_000_000, 3_600_000_000])
+def test_large_values_are_within_one_bucket(value):
+    h = Histogram("h", "")
+    h.record(value)
+    h.record(value + 1)
+
+    # Buckets are at most 1/32 of their value wide; reports clamp to max
+    assert value <= h.percentile(0.5) <= value * (1 + 1 / 32)
+    assert h.percentile(1.0) == value + 1
+
+
+def test_percentiles_follow_the_distribution():
+    h = Histogram("h", "")
+    for value in range(1, 10_001):
+        h.record(value)
+
+    for q in (0.5, 0.9, 0.99):
+        assert abs(h.percentile(q) - q * 10_000) <= q * 10_000 / 32
+
+
+def test_negative_samples_clamp_to_zero_and_empty_is_zero():
+    h = Histogram("h", "")
+    assert h.percentile(0.99) == 0
+
+    h.record(-5)
+    assert (h.count, h.max, h.percentile(0.5)) == (1, 0, 0)
+
+
+def test_merge_adds_samples():
+    a, b = Histogram("h", ""), Histogram("h", "")
+    for value in range(100):
+        a.record(value)
+        b.record(value + 1000)
+
+    a.merge(b)
+
+    assert a.count == 200
+    assert a.max == 1099
+    assert a.percentile(0.25) < 100 <= 1000 <= a.percentile(0.75)
+
+
+def test_prometheus_rendering_and_hash():
+    m = Metrics("engine-1")
+    m.inc("orders_total", 3)
+    m.set("stream_lag", 7)
+    m.set("pel_pending", None)
+    m.histogram("match_latency_us", "Match latency.").record(250)
+
+    text = m.render_prometheus()
+    fields = m.to_hash()
+
+    assert 'engine_orders_total{consumer="engine-1"} 3' in text
+    assert 'engine_stream_lag{consumer="engine-1"} 7' in text
+    assert "pel_pending" not in text
+    assert 'engine_match_latency_us_count{consumer="engine-1"} 1' in text
+    assert fields["orders_total"] == "3"
+    assert fields["match_latency_us:max"] == "250"
+
+
+def test_sampled_log_keeps_first_and_every_nth():
+    out = io.StringIO()
+    log = SampledLog("engine", every=3, flush_after=3600, out=out)
+    for i in range(7):
+        log.event("trade", i=i)
+    log.flush()
+
+    lines = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [(line["i"], line["n"]) for line in lines] == [(0, 1), (3, 4), (6, 7)]
@@ -0,0 +1,136 @@
+"""BookStore: snapshot + journal round-trips, corruption, rollback, skipped entries."""
+
+import pytest
+
+from src.consumer.local_book import LocalBook
+from src.consumer.persistence import BookStore, format_stream_id, parse_stream_id
+from src.models import CancelReplace, Order, OrderType, Side
+
+
+def order(order_id, side, price, qty, trader="t1"):
+    return Order(order_id, trader, side, OrderType.LIMIT, price, qty, float(order_id), "SIM")
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = BookStore("SIM", tmp_path)
+    yield store
+    store.close()
+
+
+def book_state(book):
+    return [
+        (o.order_id, o.trader_id, o.side, o.price, o.qty, o.timestamp)
+        for side in (Side.BID, Side.ASK) for o in book.resting(side)
+    ]
+
+
+def sample_book():
+    book = LocalBook("SIM")
+    for o in (order(1, Side.BID, 99, 5), order(2, Side.BID, 99, 3, "t2"), order(3, Side.ASK, 101, 7)):
+        book.apply(o)
+    return book
+
+
+def test_stream_ids_compare_numerically():
+    assert parse_stream_id("1715000000000-3") == (1715000000000, 3)
+    assert parse_stream_id(b"10-0") > parse_stream_id("9-99")
+    assert format_stream_id((5, 2)) == "5-2"
+
+
+def test_snapshot_round_trip_keeps_queue_order_and_last_id(store, tmp_path):
+    book = sample_book()
+    store.applied(["100-0", "100-2"])
+    store.snapshot(book)
+
+    loaded = BookStore("SIM", tmp_path)
+    restored, replay = loaded.load()
+
+    assert book_state(restored) == book_state(book)
+    assert loaded.last_id == (100, 2)
+    assert replay == []
+
+
+def test_journal_replays_only_entries_after_the_snapshot(store, tmp_path):
+    store.applied(["5-0"])
+    store.snapshot(sample_book())
+    replace = CancelReplace("t1", cancel_ids=(1,), orders=(order(9, Side.ASK, 100, 2),), timestamp=7.5, symbol="SIM")
+    store.append([("4-0", order(7, Side.BID, 98, 1)), ("6-0", order(8, Side.BID, 97, 1)), ("6-1", replace)])
+
+    _, replay = BookStore("SIM", tmp_path).load()
+
+    assert [stream_id for stream_id, _ in replay] == ["6-0", "6-1"]
+    assert replay[0][1] == order(8, Side.BID, 97, 1)
+    assert replay[1][1] == replace
+
+
+def test_long_trader_ids_and_big_requotes_round_trip(store, tmp_path):
+    trader = "desk-" + "x" * 300
+    legs = tuple(order(1000 + i, Side.BID, 90 + i % 5, 1, trader) for i in range(300))
+    replace = CancelReplace(trader, cancel_ids=tuple(range(1, 301)), orders=legs, timestamp=2.5, symbol="SIM")
+    book = LocalBook("SIM")
+    book.apply(order(1, Side.ASK, 120, 4, trader))
+    store.snapshot(book)
+    store.append([("1-0", replace)])
+
+    restored, replay = BookStore("SIM", tmp_path).load()
+
+    assert book_state(restored) == book_state(book)
+    assert replay == [("1-0", replace)]
+
+
+def test_corrupt_snapshot_is_ignored(store, tmp_path):
+    store.snapshot(sample_book())
+    data = bytearray(store.snapshot_path.read_bytes())
+    data[30] ^= 0xFF
+    store.snapshot_path.write_bytes(bytes(data))
+
+    assert BookStore("SIM", tmp_path).load() is None
+
+
+def test_torn_journal_record_ends_the_replay(store, tmp_path):
+    store.snapshot(LocalBook("SIM"))
+    store.append([("1-0", order(1, Side.BID, 99, 1)), ("2-0", order(2, Side.BID, 99, 1))])
+    data = store.journal_path.read_bytes()
+    store.journal_path.write_bytes(data[:-3])
+
+    _, replay = BookStore("SIM", tmp_path).load()
+
+    assert [stream_id for stream_id, _ in replay] == ["1-0"]
+
+
+def test_rollback_drops_the_failed_batch(store, tmp_path):
+    store.snapshot(LocalBook("SIM"))
+    store.append([("1-0", order(1, Side.BID, 99, 1))])
+    mark = store.append([("2-0", order(2, Side.BID, 99, 1)), ("3-0", order(3, Side.BID, 99, 1))])
+    store.rollback(mark)
+    store.append([("4-0", order(4, Side.BID, 99, 1))])
+
+    _, replay = BookStore("SIM", tmp_path).load()
+
+    assert [stream_id for stream_id, _ in replay] == ["1-0", "4-0"]
+
+
+def test_snapshot_empties_the_journal(store, tmp_path):
+    store.append([("1-0", order(1, Side.BID, 99, 1))])
+    store.applied(["1-0"])
+    store.snapshot(LocalBook("SIM"))
+
+    assert store.journal_path.stat().st_size == 0
+
+
+def test_skipped_entries_stay_new_across_a_snapshot(store, tmp_path):
+    store.skip("3-0")
+    store.applied(["4-0", "5-0"])
+    assert store.is_new("3-0") and not store.is_new("4-0") and store.is_new("6-0")
+
+    store.snapshot(LocalBook("SIM"))
+    loaded = BookStore("SIM", tmp_path)
+    loaded.load()
+
+    assert loaded.skipped == {(3, 0)}
+    assert loaded.is_new("3-0")
+
+    loaded.applied(["3-0"])
+    assert not loaded.is_new("3-0")
+    assert loaded.last_id == (5, 0)
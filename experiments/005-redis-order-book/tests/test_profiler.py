@@ -0,0 +1,80 @@
+"""Sampling profiler: stack and await chains, the breakdown, and a real run's folded files."""
+
+import asyncio
+import sys
+from collections import Counter
+
+from src.config import PROFILE_SECONDS
+from src.profiler import (
+    SamplingProfiler, _seconds, await_breakdown, await_chain, frame_chain,
+)
+
+
+def test_frame_chain_is_root_first():
+    def inner():
+        return frame_chain(sys._getframe())
+
+    chain = inner()
+
+    assert chain[-1] == "test_frame_chain_is_root_first.<locals>.inner (test_profiler.py)"
+    assert chain[-2] == "test_frame_chain_is_root_first (test_profiler.py)"
+
+
+async def test_await_chain_follows_a_parked_task_down_to_its_future():
+    parked = asyncio.get_running_loop().create_future()
+
+    async def wait_for_reply():
+        await parked
+
+    async def handler():
+        await wait_for_reply()
+
+    task = asyncio.create_task(handler())
+    await asyncio.sleep(0)
+
+    chain = [label.split(" ")[0].rsplit(".", 1)[-1] for label in await_chain(task.get_coro())]
+    assert chain[:2] == ["handler", "wait_for_reply"]
+    assert chain[2].startswith("Future") and len(chain) == 3     # FutureIter under C asyncio
+    parked.set_result(None)
+    await task
+
+
+def test_await_breakdown_groups_by_task_and_leaf():
+    awaits = Counter({
+        "run (a.py);commit (a.py);execute (r.py);Future": 6,
+        "run (a.py);commit (a.py);Future": 2,
+        "metrics (m.py);sleep (tasks.py);Future": 1,
+        "run (a.py);[running]": 1,
+    })
+
+    assert await_breakdown(awaits, 10) == [
+        (0.6, "run (a.py)", "execute (r.py)"),
+        (0.2, "run (a.py)", "commit (a.py)"),
+        (0.1, "metrics (m.py)", "sleep (tasks.py)"),
+        (0.1, "run (a.py)", "[running]"),
+    ]
+
+
+def test_request_payload_parsing():
+    assert _seconds(b"2.5") == 2.5
+    for junk in (b"", b"soon", b"-3", None):
+        assert _seconds(junk) == PROFILE_SECONDS
+
+
+async def test_a_run_writes_both_views(tmp_path):
+    profiler = SamplingProfiler("engine-test", tmp_path, hz=200)
+
+    async def parked_forever():
+        await asyncio.Event().wait()
+
+    waiter = asyncio.create_task(parked_forever())
+    assert profiler.start(0.2)
+    assert not profiler.start(0.2)              # one run at a time
+    while profiler.running:
+        await asyncio.sleep(0.02)
+    waiter.cancel()
+
+    cpu, waits = profiler.last
+    assert cpu.read_text() and cpu.name.endswith(".cpu.folded")
+    assert "parked_forever" in waits.read_text()
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in waits.read_text().splitlines())
@@ -0,0 +1,34 @@
+"""shard_for: stable, in range, and a partition of the symbols."""
+
+import subprocess
+import sys
+import zlib
+from pathlib import Path
+
+from src.consumer.router import shard_for, symbols_for_shard
+
+SYMBOLS = ["AAPL", "MSFT", "GOOG", "AMZN", "TSLA", "NVDA", "META", "SIM"]
+
+
+def test_shard_is_crc32_of_the_symbol():
+    for symbol in SYMBOLS:
+        assert shard_for(symbol, 4) == zlib.crc32(symbol.encode()) % 4
+        assert 0 <= shard_for(symbol, 3) < 3
+    assert {shard_for(symbol, 1) for symbol in SYMBOLS} == {0}
+
+
+def test_shards_partition_the_symbols():
+    shards = [symbols_for_shard(SYMBOLS, shard, 3) for shard in range(3)]
+
+    assert sorted(s for shard in shards for s in shard) == sorted(SYMBOLS)
+    assert all(symbols_for_shard(SYMBOLS, shard, 3) == shards[shard] for shard in range(3))
+
+
+def test_same_answer_under_another_hash_seed():
+    code = "from src.consumer.router import shard_for; print([shard_for(s, 5) for s in %r])" % SYMBOLS
+    out = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True,
+        env={"PYTHONHASHSEED": "12345"}, cwd=Path(__file__).parents[1],
+    ).stdout
+
+    assert out.strip() == str([shard_for(symbol, 5) for symbol in SYMBOLS])
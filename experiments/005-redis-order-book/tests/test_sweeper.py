@@ -0,0 +1,68 @@
+"""Sweeper: reclaim half-missing orders, repair the levels they skewed, leave live ones alone."""
+
+from src.config import ORDER_DATA_PREFIX, keys_for
+from src.consumer.book import add_to_book, load_resting_orders
+from src.consumer.sweeper import Sweeper, parse_level_key
+from src.models import Order, OrderType, Side
+
+KEYS = keys_for("SIM")
+
+
+def order(order_id, side, price, qty):
+    return Order(order_id, "t1", side, OrderType.LIMIT, price, qty, float(order_id), "SIM")
+
+
+async def damaged_book(r):
+    """Four live orders, one stale book entry, one orphan record, one qty-only fragment."""
+    for resting in (order(1, Side.BID, 100, 5), order(2, Side.BID, 100, 3),
+                    order(3, Side.ASK, 101, 4), order(4, Side.ASK, 102, 2),
+                    order(5, Side.BID, 99, 6), order(6, Side.ASK, 101, 1)):
+        await add_to_book(r, resting)
+    await r.delete(f"{ORDER_DATA_PREFIX}5")                    # stale: member, no record
+    await r.zrem(KEYS.book("ask"), "6")                       # orphan: record, no member
+    await r.hset(f"{ORDER_DATA_PREFIX}7", "qty", "9")         # fragment: a lone HSET qty
+
+
+async def test_sweep_removes_both_halves_and_repairs_levels(r):
+    await damaged_book(r)
+
+    report = await Sweeper(r, ["SIM"], rate=0, batch=2).sweep()
+
+    assert (report.stale_entries, report.orphan_records, report.levels_repaired) == (1, 2, 2)
+    assert report.entries == 5 and report.records == 6
+    assert await r.zrange(KEYS.book("bid"), 0, -1) == [b"1", b"2"]
+    assert not await r.exists(f"{ORDER_DATA_PREFIX}6", f"{ORDER_DATA_PREFIX}7")
+    assert await r.hgetall(KEYS.depth("bid")) == {b"100": b"8"}
+    assert await r.hgetall(KEYS.depth("ask")) == {b"101": b"4", b"102": b"2"}
+    assert sorted(o.order_id for o in await load_resting_orders(r, "SIM")) == [1, 2, 3, 4]
+
+
+async def test_second_pass_finds_nothing(r):
+    await damaged_book(r)
+    sweeper = Sweeper(r, ["SIM"], rate=0)
+    sweeper.total.add(await sweeper.sweep())
+
+    again = await sweeper.sweep()
+    sweeper.total.add(again)
+
+    assert (again.stale_entries, again.orphan_records, again.levels_repaired) == (0, 0, 0)
+    assert (sweeper.total.stale_entries, sweeper.total.orphan_records) == (1, 2)
+
+
+async def test_pacing_spends_the_rate_budget(r, monkeypatch):
+    slept = []
+
+    async def sleep(seconds):
+        slept.append(seconds)
+
+    monkeypatch.setattr("src.consumer.sweeper.asyncio.sleep", sleep)
+    await damaged_book(r)
+
+    report = await Sweeper(r, ["SIM"], rate=100, batch=200).sweep()
+
+    assert sum(slept) >= (report.entries + report.records) / 100
+
+
+def test_level_keys_parse_with_and_without_a_symbol():
+    assert parse_level_key("book:orders:bid:10050") == ("SIM", "bid", 10050)
+    assert parse_level_key("book:orders:AAPL:ask:9990") == ("AAPL", "ask", 9990)
@@ -0,0 +1,57 @@
+"""Packed and text stream entries decode to the same Order, and can share a stream."""
+
+import pytest
+
+from src.config import keys_for
+from src.consumer import book
+from src.consumer.book import publish_order
+from src.models import PACKED_FIELD, CancelReplace, Order, OrderType, Side, decode_message
+
+ORDERS = [
+    Order(5_120_000_000_001, "mm-1", Side.BID, OrderType.LIMIT, 10_050, 30, 1.25, "SIM"),
+    Order(5_120_000_000_002, "mm-2", Side.ASK, OrderType.LIMIT, 9_990, 7, 2.5, "AAPL"),
+    Order(5_120_000_000_003, "taker", Side.BID, OrderType.MARKET, None, 12, 3.75, "SIM"),
+    Order(5_120_000_000_004, "taker", Side.ASK, OrderType.MARKET, None, 1, 4.0, "SIM"),
+]
+
+
+def as_read(fields):
+    """The fields as XREAD hands them back: bytes keys and values."""
+    return {
+        (k if isinstance(k, bytes) else k.encode()): (v if isinstance(v, bytes) else v.encode())
+        for k, v in fields.items()
+    }
+
+
+@pytest.mark.parametrize("order", ORDERS, ids=lambda o: f"{o.side.value}-{o.order_type.value}")
+def test_both_formats_round_trip(order):
+    packed = order.to_packed_dict()
+
+    assert list(packed) == [PACKED_FIELD]
+    assert decode_message(as_read(packed)) == order
+    assert decode_message(as_read(order.to_stream_dict())) == order
+
+
+def test_orders_that_do_not_fit_fall_back_to_text():
+    long_trader = Order(1, "t" * 256, Side.BID, OrderType.LIMIT, 100, 1, 1.0, "SIM")
+    negative_id = Order(-1, "t1", Side.BID, OrderType.LIMIT, 100, 1, 1.0, "SIM")
+
+    for order in (long_trader, negative_id):
+        fields = order.to_packed_dict()
+        assert PACKED_FIELD not in fields
+        assert decode_message(as_read(fields)) == order
+
+
+async def test_stream_can_mix_formats(r, monkeypatch):
+    replace = CancelReplace("mm-1", (ORDERS[0].order_id,), (ORDERS[0],), 5.0, "SIM")
+    sent = [ORDERS[0], replace, ORDERS[2]]
+    monkeypatch.setattr(book, "WIRE_FORMAT", "text")
+    await publish_order(r, sent[0])
+    monkeypatch.setattr(book, "WIRE_FORMAT", "packed")
+    for message in sent[1:]:
+        await publish_order(r, message)
+
+    entries = await r.xrange(keys_for("SIM").stream)
+
+    assert [list(fields)[0] == PACKED_FIELD for _, fields in entries] == [False, False, True]
+    assert [decode_message(fields) for _, fields in entries] == sent